@@ -38,6 +38,39 @@ ALLOWED_HOSTS = ['olaish.pythonanywhere.com','127.0.0.1']
 
 CHAPA_SECRET_KEY = os.environ.get('CHAPA_SECRET_KEY')
 CHAPA_PUBLIC_KEY = os.environ.get('CHAPA_PUBLIC_KEY')
+
+# Overrides for the Chapa HTTP client (listings.services.ChapaService).
+# Keys left out keep the defaults in listings.services.DEFAULT_CHAPA_HTTP,
+# e.g. {'POOL_MAXSIZE': 32} for a worker running 32 threads.
+CHAPA_HTTP = {}
+if os.environ.get('CHAPA_BASE_URL'):
+  CHAPA_HTTP['BASE_URL'] = os.environ['CHAPA_BASE_URL']
+
+# When True, PaymentViewSet.initiate/verify queue the Chapa call as a Celery
+# task and answer 202; clients poll the payment's status action. Needs a
+# running worker and CELERY_BROKER_URL. A queued call not finished within
+# the claim timeout (seconds) may be queued again.
+PAYMENT_GATEWAY_ASYNC = os.environ.get('PAYMENT_GATEWAY_ASYNC') == 'True'
+PAYMENT_GATEWAY_CLAIM_TIMEOUT = 120
+
+# Chapa webhook deliveries (PaymentViewSet.webhook). Only deliveries whose
+# x-chapa-signature is the HMAC of the body with SECRET (the secret hash set
+# on the Chapa dashboard) are accepted; without SECRET all are refused.
+# Processed events are deleted after RETENTION_DAYS by
+# listings.tasks.prune_payment_webhooks.
+PAYMENT_WEBHOOKS = {
+  'SECRET': os.environ.get('CHAPA_WEBHOOK_SECRET'),
+  'RETENTION_DAYS': 7,
+}
+
+# listings.tasks.reconcile_pending_payments: re-verifies pending payments
+# with Chapa and applies the result in bulk
+PAYMENT_RECONCILIATION = {
+  'GRACE_MINUTES': 15,     # Leave checkouts younger than this alone
+  'EXPIRE_HOURS': 24,      # Cancel checkouts still pending at Chapa after this
+  'CHUNK_SIZE': 1000,      # Payments read and updated per batch
+  'WORKERS': 8,            # Concurrent verify calls
+}
 # Application definition
 
 INSTALLED_APPS = [
@@ -78,6 +111,18 @@ REST_FRAMEWORK = {
         'rest_framework_simplejwt.authentication.JWTAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
+  # orjson-backed when installed (see requirements.txt), else a stdlib
+  # fallback byte-identical to JSONRenderer;
+  # listings.renderers.PythonJSONRenderer/PythonJSONParser force the fallback
+  'DEFAULT_RENDERER_CLASSES': [
+    'listings.renderers.FastJSONRenderer',
+    'rest_framework.renderers.BrowsableAPIRenderer',
+  ],
+  'DEFAULT_PARSER_CLASSES': [
+    'listings.renderers.FastJSONParser',
+    'rest_framework.parsers.FormParser',
+    'rest_framework.parsers.MultiPartParser',
+  ],
   # 'EXCEPTION_HANDLER': 'listings.utils.custom_ratelimit_exception_handler',
 }
 
@@ -98,6 +143,30 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Batched RequestLog writes from RequestLoggingMiddleware
+REQUEST_LOG_BUFFER = {
+    'MAX_SIZE': 10000,       # Entries held in memory before new ones are dropped
+    'BATCH_SIZE': 500,       # Flush as soon as this many entries are pending
+    'FLUSH_INTERVAL': 5,     # ...or after this many seconds
+}
+
+# RequestLog rows older than DAYS are moved to gzip JSONL files in ARCHIVE_DIR
+# (unset: ~/.alx_travel_app/archives/request_logs, outside the source tree)
+REQUEST_LOG_RETENTION = {
+    'DAYS': 30,
+    'ARCHIVE_DIR': os.environ.get('REQUEST_LOG_ARCHIVE_DIR'),
+    'CHUNK_SIZE': 5000,      # Rows archived and deleted per transaction
+}
+
+# Listing ?q= search: 'fts5' (SQLite), 'inverted' (portable index table) or 'auto'
+LISTING_SEARCH_BACKEND = 'auto'
+
+# Offline place-name lookup (CSV: name,latitude,longitude) used to geocode listings on save
+GEOCODER_GAZETTEER = BASE_DIR / 'listings' / 'data' / 'gazetteer.csv'
+
+# Seconds between BlockedIP version checks in RequestLoggingMiddleware
+BLOCKED_IP_REFRESH_INTERVAL = 5
+
 # RATELIMIT_VIEW = 'listings.views.rate_limiting_error'
 CORS_ALLOW_ALL_ORIGINS = True
 
@@ -127,6 +196,22 @@ WSGI_APPLICATION = 'alx_travel_app.wsgi.application'
 # CELERY_RESULT_SERIALIZER = 'json'
 # CELERY_TIMEZONE = 'UTC'
 
+# Local memory needs no extra services but is per process; with several
+# workers use django.core.cache.backends.filebased.FileBasedCache or Redis
+# so listing invalidations reach every worker.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'alx-travel-app',
+    },
+}
+
+# Rendered ListingViewSet list/detail responses
+LISTING_RESPONSE_CACHE = {
+    'ALIAS': 'default',
+    'TIMEOUT': 300,
+}
+
 # CACHES = {
     # 'default': {
         # 'BACKEND': 'django_redis.cache.RedisCache',
@@ -152,9 +237,35 @@ WSGI_APPLICATION = 'alx_travel_app.wsgi.application'
   # 'flag-suspicious-ips-hourly': {
     # 'task': 'listings.tasks.flag_suspicious_ips',
     # 'schedule': crontab(minute=0),
+# },
+  # 'detect-anomalous-ips-hourly': {
+    # 'task': 'listings.tasks.detect_anomalous_ips',
+    # 'schedule': crontab(minute=5),
+# },
+  # 'archive-expired-request-logs-daily': {
+    # 'task': 'listings.tasks.archive_expired_request_logs',
+    # 'schedule': crontab(minute=30, hour=3),
+# },
+  # 'reconcile-pending-payments': {
+    # 'task': 'listings.tasks.reconcile_pending_payments',
+    # 'schedule': crontab(minute='*/30'),
 # },
 # }
 
+# Webhook events are applied by the view (or a task it queues); this run
+# sweeps up any left in the inbox and prunes processed ones (run
+# `celery -A alx_travel_app beat` next to a worker)
+CELERY_BEAT_SCHEDULE = {
+  'apply-payment-webhooks': {
+    'task': 'listings.tasks.apply_payment_webhooks',
+    'schedule': timedelta(seconds=30),
+  },
+  'prune-payment-webhooks-daily': {
+    'task': 'listings.tasks.prune_payment_webhooks',
+    'schedule': crontab(minute=45, hour=3),
+  },
+}
+
 # Email Backend Configuration Prod
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 EMAIL_HOST = 'smtp.sendgrid.net'
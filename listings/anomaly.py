@@ -0,0 +1,130 @@
+import logging
+from itertools import islice
+
+import numpy as np
+
+from .models import RequestLog
+
+
+logger = logging.getLogger(__name__)
+
+FEATURES = ['request_count', 'unique_paths', 'mean_gap', 'std_gap', 'min_gap']
+
+
+def _group_features(ips, timestamps, path_hashes, window_seconds):
+  """
+  Per-IP feature rows for rows that are sorted by ``(ip_address, timestamp)``
+  and contain only complete IP groups.
+  """
+  n = len(ips)
+  is_start = np.ones(n, dtype=bool)
+  is_start[1:] = ips[1:] != ips[:-1]
+  group = np.cumsum(is_start) - 1
+  groups = int(group[-1]) + 1
+
+  request_count = np.bincount(group, minlength=groups).astype(np.float64)
+
+  pairs = np.unique(np.stack([group, path_hashes]), axis=1)
+  unique_paths = np.bincount(pairs[0], minlength=groups).astype(np.float64)
+
+  # Gaps between consecutive requests from the same IP
+  same_ip = ~is_start[1:]
+  gaps = np.diff(timestamps)[same_ip]
+  gap_group = group[1:][same_ip]
+  gap_count = np.bincount(gap_group, minlength=groups)
+  gap_sum = np.bincount(gap_group, weights=gaps, minlength=groups)
+  gap_sumsq = np.bincount(gap_group, weights=gaps * gaps, minlength=groups)
+  min_gap = np.full(groups, float(window_seconds))
+  np.minimum.at(min_gap, gap_group, gaps)
+
+  has_gaps = gap_count > 0
+  mean_gap = np.full(groups, float(window_seconds))
+  mean_gap[has_gaps] = gap_sum[has_gaps] / gap_count[has_gaps]
+  std_gap = np.zeros(groups)
+  std_gap[has_gaps] = np.sqrt(np.maximum(gap_sumsq[has_gaps] / gap_count[has_gaps] - mean_gap[has_gaps] ** 2, 0))
+
+  features = np.column_stack([
+    np.log1p(request_count), np.log1p(unique_paths), np.log1p(mean_gap), np.log1p(std_gap), np.log1p(min_gap),
+  ])
+  return ips[is_start], features
+
+
+def iter_ip_features(since, window_seconds, chunk_size=50000):
+  """
+  Yield ``(ips, features)`` array pairs for every IP seen since ``since``.
+
+  Rows are streamed in ``(ip_address, timestamp)`` order with a server-side
+  iterator and turned into NumPy arrays ``chunk_size`` rows at a time. Only
+  the last, possibly incomplete, IP group of a chunk is carried into the
+  next one. Memory stays bounded by the chunk size, not by the hour's
+  traffic.
+  """
+  rows = RequestLog.objects.filter(
+    timestamp__gte=since
+  ).order_by('ip_address', 'timestamp').values_list(
+    'ip_address', 'timestamp', 'path'
+  ).iterator(chunk_size=chunk_size)
+
+  carry = None
+  while True:
+    batch = list(islice(rows, chunk_size))
+    final = len(batch) < chunk_size
+
+    if batch:
+      ips = np.array([row[0] for row in batch], dtype=object)
+      timestamps = np.fromiter((row[1].timestamp() for row in batch), dtype=np.float64, count=len(batch))
+      path_hashes = np.fromiter((hash(row[2]) for row in batch), dtype=np.int64, count=len(batch))
+      if carry is not None:
+        ips = np.concatenate([carry[0], ips])
+        timestamps = np.concatenate([carry[1], timestamps])
+        path_hashes = np.concatenate([carry[2], path_hashes])
+    elif carry is not None:
+      ips, timestamps, path_hashes = carry
+    else:
+      return
+
+    if final:
+      yield _group_features(ips, timestamps, path_hashes, window_seconds)
+      return
+
+    tail = len(ips) - 1
+    while tail > 0 and ips[tail - 1] == ips[-1]:
+      tail -= 1
+    carry = (ips[tail:], timestamps[tail:], path_hashes[tail:])
+    if tail > 0:
+      yield _group_features(ips[:tail], timestamps[:tail], path_hashes[:tail], window_seconds)
+
+
+def find_anomalous_ips(since, window_seconds, contamination=0.01, chunk_size=50000, score_batch_size=10000):
+  """
+  Fit an IsolationForest on the per-IP features once, then score them in
+  batches. Returns a list of ``(ip_address, score)`` pairs for the IPs the
+  model predicts as anomalies.
+  """
+  # Imported here so only the worker running this task loads scikit-learn
+  from sklearn.ensemble import IsolationForest
+
+  ip_chunks, feature_chunks = [], []
+  for ips, features in iter_ip_features(since, window_seconds, chunk_size=chunk_size):
+    ip_chunks.append(ips)
+    feature_chunks.append(features)
+
+  if not feature_chunks:
+    return []
+  ips = np.concatenate(ip_chunks)
+  X = np.vstack(feature_chunks)
+  if len(X) < 2:
+    return []
+
+  model = IsolationForest(contamination=contamination, random_state=42)
+  model.fit(X)
+
+  anomalies = []
+  for start in range(0, len(X), score_batch_size):
+    batch = X[start:start + score_batch_size]
+    scores = model.decision_function(batch)
+    flagged = np.flatnonzero(scores < 0)
+    anomalies.extend((ips[start + i], float(scores[i])) for i in flagged)
+
+  logger.info(f"Scored {len(X)} IPs, {len(anomalies)} flagged as anomalies.")
+  return anomalies
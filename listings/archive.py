@@ -0,0 +1,98 @@
+import gzip
+import json
+import logging
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import RequestLog
+
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_FIELDS = ['id', 'ip_address', 'timestamp', 'path', 'is_routable', 'country', 'city']
+
+
+def default_archive_dir():
+  """
+  ``REQUEST_LOG_RETENTION['ARCHIVE_DIR']``, else a directory in the home of
+  the user running the task. Archives are kept outside the source tree, where
+  a deploy or ``git clean`` would remove them.
+  """
+  configured = getattr(settings, 'REQUEST_LOG_RETENTION', {}).get('ARCHIVE_DIR')
+  return Path(configured) if configured else Path.home() / '.alx_travel_app' / 'archives' / 'request_logs'
+
+
+def archive_path(archive_dir, day):
+  return Path(archive_dir) / f"request_logs-{day.isoformat()}.jsonl.gz"
+
+
+def archive_request_logs(cutoff, archive_dir, chunk_size=5000):
+  """
+  Move ``RequestLog`` rows older than ``cutoff`` into daily gzip JSONL files.
+
+  Rows are read in primary key order ``chunk_size`` at a time. Each chunk is
+  appended to the file for its day and then deleted in its own short
+  transaction. Locks are only held for one chunk, never for the whole
+  backlog. Rows put back by ``restore_request_logs`` are deleted without
+  being written again, since their archive already holds them. Returns the
+  number of rows archived.
+  """
+  Path(archive_dir).mkdir(parents=True, exist_ok=True)
+  last_pk, archived = 0, 0
+
+  while True:
+    rows = list(
+      RequestLog.objects.filter(timestamp__lt=cutoff, pk__gt=last_pk)
+      .order_by('pk').values(*ARCHIVE_FIELDS, 'restored')[:chunk_size]
+    )
+    if not rows:
+      break
+
+    by_day = defaultdict(list)
+    for row in rows:
+      if not row.pop('restored'):
+        by_day[row['timestamp'].date()].append(row)
+
+    # Each append adds a gzip member, and readers see one continuous stream
+    for day, day_rows in by_day.items():
+      with gzip.open(archive_path(archive_dir, day), 'at', encoding='utf-8') as archive:
+        for row in day_rows:
+          archive.write(json.dumps({**row, 'timestamp': row['timestamp'].isoformat()}) + '\n')
+
+    with transaction.atomic():
+      RequestLog.objects.filter(pk__in=[row['id'] for row in rows]).delete()
+
+    last_pk = rows[-1]['id']
+    archived += sum(len(day_rows) for day_rows in by_day.values())
+    logger.info(f"Archived {archived} request logs so far...")
+
+  return archived
+
+
+def restore_request_logs(path, batch_size=5000):
+  """
+  Stream an archive file back into ``RequestLog``. Rows keep their original
+  ids, so restoring the same archive twice does not duplicate them. They are
+  marked ``restored`` so the next archive run past the cutoff deletes them
+  without appending them to their archive again. Returns the number of rows
+  read.
+  """
+  restored, batch = 0, []
+  with gzip.open(path, 'rt', encoding='utf-8') as archive:
+    for line in archive:
+      row = json.loads(line)
+      row['timestamp'] = datetime.fromisoformat(row['timestamp'])
+      batch.append(RequestLog(**row, restored=True))
+      if len(batch) >= batch_size:
+        RequestLog.objects.bulk_create(batch, ignore_conflicts=True)
+        restored += len(batch)
+        batch = []
+
+  if batch:
+    RequestLog.objects.bulk_create(batch, ignore_conflicts=True)
+    restored += len(batch)
+  return restored
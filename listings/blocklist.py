@@ -0,0 +1,129 @@
+import ipaddress
+import threading
+import time
+
+from django.conf import settings
+from django.db.models import Count, Max
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import BlockedIP
+
+
+class PrefixTrie:
+  """
+  Binary trie of blocked networks for a single address family.
+
+  Each node is a ``[zero, one, terminal]`` list. A lookup walks the address
+  bits from the top until it reaches a terminal node (a blocked prefix) or a
+  missing child. That is at most ``max_prefixlen`` steps, however many
+  networks are loaded.
+  """
+
+  def __init__(self, max_prefixlen):
+    self.max_prefixlen = max_prefixlen
+    self._root = [None, None, False]
+
+  def insert(self, network):
+    network_bits = int(network.network_address)
+    node = self._root
+    for depth in range(network.prefixlen):
+      bit = (network_bits >> (self.max_prefixlen - 1 - depth)) & 1
+      if node[bit] is None:
+        node[bit] = [None, None, False]
+      node = node[bit]
+    node[2] = True
+
+  def contains(self, address):
+    bits = int(address)
+    node = self._root
+    for depth in range(self.max_prefixlen):
+      if node[2]:
+        return True
+      node = node[(bits >> (self.max_prefixlen - 1 - depth)) & 1]
+      if node is None:
+        return False
+    return node[2]
+
+
+class BlockedIPCache:
+  """
+  Per-process copy of the ``BlockedIP`` table for the request middleware.
+
+  Single hosts go in a set. CIDR ranges go in one ``PrefixTrie`` per address
+  family. Lookups issue no queries. At most once every ``refresh_interval``
+  seconds a lookup reads a ``(count, latest blocked_at)`` version stamp. The
+  table is reloaded only when that stamp has changed, which also catches
+  rows written by other processes such as the ``block_ip`` command. Saves
+  and deletes in this process invalidate the cache straight away.
+  """
+
+  def __init__(self, refresh_interval=5.0):
+    self.refresh_interval = refresh_interval
+    self._addresses = frozenset()
+    self._networks = {}
+    self._stamp = None
+    self._checked_at = None
+    self._lock = threading.Lock()
+
+  def is_blocked(self, ip_address):
+    self._maybe_refresh()
+    if ip_address in self._addresses:
+      return True
+    if not self._networks:
+      return False
+
+    try:
+      address = ipaddress.ip_address(ip_address)
+    except ValueError:
+      return False
+    trie = self._networks.get(address.version)
+    return trie is not None and trie.contains(address)
+
+  def invalidate(self):
+    self._checked_at = None
+
+  def _is_fresh(self):
+    checked_at = self._checked_at
+    return checked_at is not None and time.monotonic() - checked_at < self.refresh_interval
+
+  def _maybe_refresh(self):
+    if self._is_fresh():
+      return
+    with self._lock:
+      if self._is_fresh():
+        return
+      # Read the time before the queries so a write landing during the
+      # reload is picked up by the next poll instead of being missed.
+      checked_at = time.monotonic()
+      stamp = BlockedIP.objects.aggregate(count=Count('pk'), latest=Max('blocked_at'))
+      stamp = (stamp['count'], stamp['latest'])
+      if stamp != self._stamp:
+        self._load()
+        self._stamp = stamp
+      self._checked_at = checked_at
+
+  def _load(self):
+    addresses, networks = set(), {}
+    rows = BlockedIP.objects.values_list('ip_address', 'prefix_length').iterator(chunk_size=10000)
+    for ip_address, prefix_length in rows:
+      network = ipaddress.ip_network(f"{ip_address}/{prefix_length}", strict=False)
+      if network.prefixlen == network.max_prefixlen:
+        addresses.add(str(network.network_address))
+        continue
+      if network.version not in networks:
+        networks[network.version] = PrefixTrie(network.max_prefixlen)
+      networks[network.version].insert(network)
+
+    self._addresses = frozenset(addresses)
+    self._networks = networks
+
+
+blocked_ips = BlockedIPCache(
+  refresh_interval=getattr(settings, 'BLOCKED_IP_REFRESH_INTERVAL', 5.0),
+)
+
+
+@receiver([post_save, post_delete], sender=BlockedIP)
+def invalidate_blocked_ips(sender, **kwargs):
+  blocked_ips.invalidate()
@@ -0,0 +1,131 @@
+import atexit
+import logging
+import os
+import threading
+from collections import deque
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from .models import RequestCounter, RequestLog
+
+
+logger = logging.getLogger(__name__)
+
+
+class RequestLogBuffer:
+  """
+  In-process buffer that batches ``RequestLog`` rows into ``bulk_create`` calls
+  and folds each flushed batch into the ``RequestCounter`` buckets.
+
+  Requests only append to a bounded deque. A daemon thread writes the rows
+  when ``batch_size`` entries are pending or every ``flush_interval``
+  seconds, whichever is first. When the buffer is at ``max_size``, new
+  entries are dropped and counted. They do not block the request.
+  """
+
+  def __init__(self, max_size=10000, batch_size=500, flush_interval=5.0):
+    self.max_size = max_size
+    self.batch_size = batch_size
+    self.flush_interval = flush_interval
+    self.dropped = 0
+    self.flushed = 0
+    self.failed = 0
+    self.failed_batches = 0
+    self._entries = deque()
+    self._lock = threading.Lock()
+    self._flush_lock = threading.Lock()
+    self._wakeup = threading.Event()
+    self._worker = None
+    self._worker_pid = None
+
+  @classmethod
+  def from_settings(cls):
+    config = getattr(settings, 'REQUEST_LOG_BUFFER', {})
+    return cls(
+      max_size=config.get('MAX_SIZE', 10000),
+      batch_size=config.get('BATCH_SIZE', 500),
+      flush_interval=config.get('FLUSH_INTERVAL', 5.0),
+    )
+
+  def append(self, entry):
+    """
+    Queue a ``RequestLog`` instance. Returns False if it had to be dropped.
+    """
+    with self._lock:
+      if len(self._entries) >= self.max_size:
+        self.dropped += 1
+        return False
+      self._entries.append(entry)
+      pending = len(self._entries)
+
+    self._ensure_worker()
+    if pending >= self.batch_size:
+      self._wakeup.set()
+    return True
+
+  def flush(self):
+    """
+    Write every pending entry and return how many rows were inserted.
+    """
+    with self._flush_lock:
+      with self._lock:
+        batch = list(self._entries)
+        self._entries.clear()
+
+      if not batch:
+        return 0
+
+      try:
+        RequestLog.objects.bulk_create(batch, batch_size=self.batch_size)
+      except Exception as e:
+        self.failed += len(batch)
+        self.failed_batches += 1
+        logger.error(f"Failed to flush {len(batch)} request logs to DB: {e}")
+        return 0
+
+      self.flushed += len(batch)
+
+      try:
+        RequestCounter.objects.record(batch)
+      except Exception as e:
+        self.failed_batches += 1
+        logger.error(f"Failed to update request counters for {len(batch)} logs: {e}")
+
+      return len(batch)
+
+  def stats(self):
+    return {
+      'pending': len(self._entries),
+      'flushed': self.flushed,
+      'dropped': self.dropped,
+      'failed': self.failed,
+      'failed_batches': self.failed_batches,
+    }
+
+  def _ensure_worker(self):
+    # Threads do not survive a fork, so a pre-forked worker starts its own.
+    if self._worker_pid == os.getpid() and self._worker is not None and self._worker.is_alive():
+      return
+    with self._lock:
+      if self._worker_pid == os.getpid() and self._worker is not None and self._worker.is_alive():
+        return
+      self._worker = threading.Thread(target=self._run, name='request-log-flusher', daemon=True)
+      self._worker_pid = os.getpid()
+      self._worker.start()
+
+  def _run(self):
+    while True:
+      self._wakeup.wait(self.flush_interval)
+      self._wakeup.clear()
+      # No request cycle runs on this thread, so nothing else replaces a
+      # connection the server dropped or one past CONN_MAX_AGE
+      close_old_connections()
+      try:
+        self.flush()
+      finally:
+        close_old_connections()
+
+
+request_log_buffer = RequestLogBuffer.from_settings()
+atexit.register(request_log_buffer.flush)
@@ -0,0 +1,113 @@
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils.http import parse_http_date_safe
+
+from .conditional import not_modified
+
+
+class ListingResponseCache:
+  """
+  Rendered JSON bodies of listing list and detail responses.
+
+  Keys embed generation counters. Every list page shares the ``list``
+  generation, and each listing's detail response has its own. A write to a
+  listing bumps the ``list`` generation and that listing's generation once
+  the transaction commits, so stale entries are never read again and simply
+  expire. Entries store the body bytes with the response's ``ETag`` and
+  ``Last-Modified``, so a hit is answered without touching the database or
+  the serializer, and a matching conditional request gets a bodyless 304.
+
+  Use a shared backend (file-based, Redis) when several worker processes
+  serve the API. A local-memory cache only sees invalidations from its own
+  process.
+  """
+
+  def __init__(self, prefix='listings'):
+    self.prefix = prefix
+
+  @property
+  def options(self):
+    return getattr(settings, 'LISTING_RESPONSE_CACHE', {})
+
+  @property
+  def cache(self):
+    return caches[self.options.get('ALIAS', 'default')]
+
+  def generation(self, scope):
+    key = f'{self.prefix}:generation:{scope}'
+    value = self.cache.get(key)
+    if value is None:
+      self.cache.add(key, 1, timeout=None)
+      value = self.cache.get(key, 1)
+    return value
+
+  def _bump(self, scopes):
+    for scope in scopes:
+      key = f'{self.prefix}:generation:{scope}'
+      try:
+        self.cache.incr(key)
+      except ValueError:
+        self.cache.set(key, 2, timeout=None)
+
+  def invalidate(self, pks=()):
+    """
+    Drop the list pages and the detail responses of ``pks`` once the
+    current transaction commits.
+    """
+    scopes = ['list'] + [f'detail:{pk}' for pk in pks]
+    transaction.on_commit(lambda: self._bump(scopes))
+
+  def key(self, request, scope):
+    """
+    Cache key for ``request`` in ``scope``. Pagination links are absolute,
+    so the scheme and host are part of the key along with the sorted query
+    parameters and the negotiated media type.
+    """
+    params = sorted((name, value) for name in request.query_params for value in request.query_params.getlist(name))
+    raw = repr((request.scheme, request.get_host(), request.path, params, request.accepted_media_type))
+    digest = hashlib.sha1(raw.encode('utf-8')).hexdigest()
+    return f'{self.prefix}:{scope}:{self.generation(scope)}:{digest}'
+
+  def respond(self, request, key):
+    """
+    A response served from the cache, or ``None`` on a miss.
+    """
+    cached = self.cache.get(key)
+    if cached is None:
+      return None
+
+    headers, content_type, content = cached
+    last_modified = parse_http_date_safe(headers.get('Last-Modified', ''))
+    response = not_modified(request, headers['ETag'], last_modified)
+    if response is None:
+      response = HttpResponse(content, content_type=content_type)
+    for name, value in headers.items():
+      response[name] = value
+    return response
+
+  def store(self, key, response):
+    """
+    Render ``response`` and keep its body and validators under ``key``.
+    Without an ``ETag`` from the view, one is derived from the body.
+    """
+    response.render()
+    if not response.has_header('ETag'):
+      response['ETag'] = f'"{hashlib.sha1(response.content).hexdigest()}"'
+    headers = {name: response[name] for name in ('ETag', 'Last-Modified') if response.has_header(name)}
+    self.cache.set(key, (headers, response['Content-Type'], response.content), self.options.get('TIMEOUT', 300))
+    return response
+
+
+listing_cache = ListingResponseCache()
+
+
+def detail_scope(pk):
+  try:
+    return f'detail:{uuid.UUID(str(pk))}'
+  except ValueError:
+    return None
@@ -0,0 +1,34 @@
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+
+def queryset_validators(queryset):
+  """
+  ``(etag, last_modified)`` for a listing queryset from one aggregate query
+  over the ``updated_at`` index. ``last_modified`` is a Unix timestamp, or
+  ``None`` for an empty queryset.
+
+  Any edit moves ``MAX(updated_at)``. A deletion lowers the count. So
+  either part changing means the response may differ.
+  """
+  stats = queryset.order_by().aggregate(last_modified=Max('updated_at'), count=Count('pk'))
+  if stats['last_modified'] is None:
+    return f'W/"{stats["count"]}-0"', None
+  stamp = stats['last_modified'].timestamp()
+  return f'W/"{stats["count"]}-{int(stamp * 1_000_000)}"', int(stamp)
+
+
+def validator_headers(etag, last_modified):
+  headers = {'ETag': etag}
+  if last_modified is not None:
+    headers['Last-Modified'] = http_date(last_modified)
+  return headers
+
+
+def not_modified(request, etag, last_modified=None):
+  """
+  The 304 (or 412) response for a request whose preconditions already hold,
+  else ``None``.
+  """
+  return get_conditional_response(request, etag=etag, last_modified=last_modified)
@@ -0,0 +1,32 @@
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+
+@contextmanager
+def locking_atomic(using=None):
+  """
+  ``transaction.atomic()`` for a section that locks rows with
+  ``select_for_update()`` and then writes to them.
+
+  SQLite ignores row locks, and a deferred transaction that reads before it
+  writes can fail to upgrade its lock under contention. There an outermost
+  block begins ``IMMEDIATE`` instead, taking the write lock up front, so
+  these sections serialize. Every other transaction keeps the default mode.
+  """
+  connection = connections[using or DEFAULT_DB_ALIAS]
+  if connection.vendor != 'sqlite' or connection.in_atomic_block:
+    with transaction.atomic(using=using):
+      yield
+    return
+
+  # The mode is read from settings on connect, so connect before overriding it
+  connection.ensure_connection()
+  mode = connection.transaction_mode
+  connection.transaction_mode = 'IMMEDIATE'
+  try:
+    with transaction.atomic(using=using):
+      connection.transaction_mode = mode
+      yield
+  finally:
+    connection.transaction_mode = mode
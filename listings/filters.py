@@ -0,0 +1,159 @@
+from collections import Counter
+
+from django.db.models import Case, Count, Exists, F, OuterRef, Q, Value, When
+from rest_framework import filters
+
+from .geo import nearest, within_radius
+from .models import ListingAmenity
+from .search import search_listings
+from .serializers import GeoQuerySerializer, ListingFilterSerializer
+
+
+PRICE_BUCKETS = [(0, 50), (50, 100), (100, 200), (200, 500), (500, None)]
+FACET_LIMIT = 50
+
+
+def price_bucket_label(low, high):
+  return f"{low}+" if high is None else f"{low}-{high}"
+
+
+class ListingFilterBackend(filters.BaseFilterBackend):
+  """
+  Server-side listing filters.
+
+  ``?type=Studio,Loft&min_price=&max_price=&num_bedrooms=&min_bedrooms=&location=&amenities=WiFi,Pool``
+
+  Multiple types match any of them. Multiple amenities must all be present.
+  Each amenity is an ``EXISTS`` probe on the ``ListingAmenity`` index.
+  """
+
+  def filter_queryset(self, request, queryset, view):
+    params = ListingFilterSerializer(data=request.query_params)
+    params.is_valid(raise_exception=True)
+    data = params.validated_data # type: ignore
+
+    if data.get('type'):
+      queryset = queryset.filter(type__in=data['type'])
+    if data.get('min_price') is not None:
+      queryset = queryset.filter(price__gte=data['min_price'])
+    if data.get('max_price') is not None:
+      queryset = queryset.filter(price__lte=data['max_price'])
+    if data.get('num_bedrooms') is not None:
+      queryset = queryset.filter(num_bedrooms=data['num_bedrooms'])
+    if data.get('min_bedrooms') is not None:
+      queryset = queryset.filter(num_bedrooms__gte=data['min_bedrooms'])
+    if data.get('location'):
+      queryset = queryset.filter(location=data['location'])
+    for amenity in data.get('amenities', []):
+      queryset = queryset.filter(Exists(
+        ListingAmenity.objects.filter(listing_id=OuterRef('pk'), name=amenity)
+      ))
+    return queryset
+
+
+def listing_facets(queryset):
+  """
+  Facet counts for ``queryset``.
+
+  Type, price bucket, bedroom and location counts come from a single
+  ``GROUP BY`` over those four columns, rolled up here. Amenity counts come
+  from one ``GROUP BY`` over the join to the amenity index.
+  """
+  bucket = Case(
+    *[
+      When(price__gte=low, then=Value(price_bucket_label(low, high))) if high is None
+      else When(price__gte=low, price__lt=high, then=Value(price_bucket_label(low, high)))
+      for low, high in PRICE_BUCKETS
+    ],
+    default=Value(price_bucket_label(*PRICE_BUCKETS[0])),
+  )
+  cells = queryset.order_by().annotate(price_bucket=bucket).values(
+    'type', 'num_bedrooms', 'location', 'price_bucket'
+  ).annotate(count=Count('pk'))
+
+  total = 0
+  types, prices, bedrooms, locations = Counter(), Counter(), Counter(), Counter()
+  for cell in cells:
+    total += cell['count']
+    types[cell['type']] += cell['count']
+    prices[cell['price_bucket']] += cell['count']
+    bedrooms[cell['num_bedrooms']] += cell['count']
+    locations[cell['location']] += cell['count']
+
+  # Joined from the listing side so the filtered queryset stays the outer query
+  amenities = queryset.order_by().filter(amenity_index__isnull=False).values(
+    name=F('amenity_index__name')
+  ).annotate(count=Count('pk')).order_by('-count', 'name')[:FACET_LIMIT]
+
+  def facet(counter, order=None):
+    items = sorted(counter.items(), key=order) if order else counter.most_common(FACET_LIMIT)
+    return [{'value': value, 'count': count} for value, count in items]
+
+  price_order = [price_bucket_label(low, high) for low, high in PRICE_BUCKETS]
+  return {
+    'count': total,
+    'type': facet(types),
+    'price': facet(prices, order=lambda item: price_order.index(item[0])),
+    'num_bedrooms': facet(bedrooms, order=lambda item: item[0]),
+    'location': facet(locations),
+    'amenities': [{'value': row['name'], 'count': row['count']} for row in amenities],
+  }
+
+
+class ListingSearchFilter(filters.BaseFilterBackend):
+  """
+  ``?q=`` full-text search over title, description and location. Results are
+  ordered by BM25 rank, best match first. See ``listings.search``.
+  """
+
+  search_param = 'q'
+
+  def filter_queryset(self, request, queryset, view):
+    query = request.query_params.get(self.search_param, '').strip()
+    if not query:
+      return queryset
+    return search_listings(queryset, query)
+
+
+class ListingGeoFilter(filters.BaseFilterBackend):
+  """
+  Proximity filters over geocoded listings.
+
+  ``?bbox=south,west,north,east`` keeps listings inside the box (a box with
+  west > east crosses the antimeridian). ``?lat=&lng=&radius_km=`` keeps
+  listings within the radius, nearest first. ``?lat=&lng=`` alone returns
+  the ``nearest_limit`` nearest listings. Point queries add ``distance_km``
+  to each result and take precedence over ``?q=`` rank for ordering.
+  """
+
+  nearest_limit = 100
+
+  @staticmethod
+  def is_ranked(request):
+    return 'lat' in request.query_params
+
+  def filter_queryset(self, request, queryset, view):
+    params = request.query_params
+    if not {'lat', 'lng', 'radius_km', 'bbox'} & set(params):
+      return queryset
+
+    query = GeoQuerySerializer(data=params)
+    query.is_valid(raise_exception=True)
+    data = query.validated_data # type: ignore
+
+    if data.get('bbox'):
+      south, west, north, east = data['bbox']
+      queryset = queryset.filter(latitude__range=(south, north))
+      if west <= east:
+        queryset = queryset.filter(longitude__range=(west, east))
+      else:
+        queryset = queryset.filter(Q(longitude__gte=west) | Q(longitude__lte=east))
+
+    if 'lat' not in data:
+      return queryset
+
+    if 'radius_km' in data:
+      queryset = within_radius(queryset, data['lat'], data['lng'], data['radius_km'])
+    else:
+      queryset = nearest(queryset, data['lat'], data['lng'], self.nearest_limit)
+    return queryset.order_by('distance_km', 'listing_id')
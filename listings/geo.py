@@ -0,0 +1,211 @@
+import csv
+import math
+from functools import lru_cache
+from pathlib import Path
+
+from django.conf import settings
+from django.db.models import ExpressionWrapper, FloatField, Q, Value
+from django.db.models.functions import ASin, Cos, Least, Power, Radians, Sin, Sqrt
+
+
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+GEOHASH_PRECISION = 9
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = 111.32
+
+# Finest precision probed first by nearest-neighbor search (~150 m cells)
+NEAREST_START_PRECISION = 7
+
+DEFAULT_GAZETTEER = Path(__file__).resolve().parent / 'data' / 'gazetteer.csv'
+
+
+def encode_geohash(latitude, longitude, precision=GEOHASH_PRECISION):
+  lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+  geohash, bits, bit_count, even = [], 0, 0, True
+  while len(geohash) < precision:
+    if even:
+      mid = (lon_range[0] + lon_range[1]) / 2
+      if longitude >= mid:
+        bits, lon_range[0] = (bits << 1) | 1, mid
+      else:
+        bits, lon_range[1] = bits << 1, mid
+    else:
+      mid = (lat_range[0] + lat_range[1]) / 2
+      if latitude >= mid:
+        bits, lat_range[0] = (bits << 1) | 1, mid
+      else:
+        bits, lat_range[1] = bits << 1, mid
+    even = not even
+    bit_count += 1
+    if bit_count == 5:
+      geohash.append(BASE32[bits])
+      bits, bit_count = 0, 0
+  return ''.join(geohash)
+
+
+def cell_size(precision):
+  """
+  ``(height, width)`` in degrees of a geohash cell at ``precision``.
+  """
+  lon_bits = math.ceil(5 * precision / 2)
+  lat_bits = math.floor(5 * precision / 2)
+  return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lon_bits
+
+
+def covered_radius_km(latitude, precision):
+  """
+  Radius around a point that is guaranteed to lie inside the 3x3 block of
+  cells centered on the point's cell: one full cell in every direction.
+  """
+  height, width = cell_size(precision)
+  return min(height * KM_PER_DEGREE, width * KM_PER_DEGREE * max(math.cos(math.radians(latitude)), 1e-6))
+
+
+def neighbor_cells(latitude, longitude, precision):
+  """
+  The point's geohash cell and its eight neighbors.
+  """
+  height, width = cell_size(precision)
+  cells = set()
+  for dy in (-1, 0, 1):
+    for dx in (-1, 0, 1):
+      lat = min(max(latitude + dy * height, -90.0), 90.0)
+      lon = (longitude + dx * width + 180.0) % 360.0 - 180.0
+      cells.add(encode_geohash(lat, lon, precision))
+  return cells
+
+
+def normalize_place(name):
+  return ' '.join((name or '').lower().replace(',', ' , ').split())
+
+
+@lru_cache(maxsize=None)
+def load_gazetteer(path):
+  """
+  Map normalized place names to ``(latitude, longitude)`` from a CSV file
+  with ``name,latitude,longitude`` columns.
+  """
+  places = {}
+  with open(path, newline='', encoding='utf-8') as gazetteer:
+    for row in csv.DictReader(gazetteer):
+      places[normalize_place(row['name'])] = (float(row['latitude']), float(row['longitude']))
+  return places
+
+
+def geocode(location):
+  """
+  Resolve a free-text location such as "Lagos, Nigeria" with the offline
+  gazetteer. It tries the full string first and then the part before the
+  first comma. Returns ``None`` when the place is unknown.
+  """
+  places = load_gazetteer(str(getattr(settings, 'GEOCODER_GAZETTEER', DEFAULT_GAZETTEER)))
+  name = normalize_place(location)
+  if name in places:
+    return places[name]
+  city = normalize_place((location or '').split(',')[0])
+  return places.get(city)
+
+
+def geocode_listing(listing):
+  """
+  Fill in a listing's coordinates from its location when none were given,
+  and keep its geohash in step with its coordinates.
+  """
+  if listing.latitude is None or listing.longitude is None:
+    coordinates = geocode(listing.location)
+    if coordinates is not None:
+      listing.latitude, listing.longitude = coordinates
+
+  if listing.latitude is not None and listing.longitude is not None:
+    listing.geohash = encode_geohash(listing.latitude, listing.longitude)
+  else:
+    listing.geohash = ''
+  return listing
+
+
+def cells_filter(cells):
+  """
+  Match rows whose geohash starts with any of ``cells``, written as range
+  comparisons so every cell is a seek on the ``geohash`` index.
+  """
+  condition = Q()
+  for cell in cells:
+    condition |= Q(geohash__gte=cell, geohash__lt=cell + '~')
+  return condition
+
+
+def distance_km(latitude, longitude):
+  """
+  Haversine distance in km from the point to each row's coordinates, as a
+  database expression.
+  """
+  lat, lon = math.radians(latitude), math.radians(longitude)
+  row_lat, row_lon = Radians('latitude'), Radians('longitude')
+  a = (
+    Power(Sin((row_lat - Value(lat)) / 2), 2)
+    + Value(math.cos(lat)) * Cos(row_lat) * Power(Sin((row_lon - Value(lon)) / 2), 2)
+  )
+  # Rounding can push sqrt(a) a hair past 1, outside asin's domain
+  return ExpressionWrapper(
+    Value(2 * EARTH_RADIUS_KM) * ASin(Least(Sqrt(a), Value(1.0))), output_field=FloatField()
+  )
+
+
+def _with_distance(queryset, latitude, longitude, cells=None):
+  candidates = queryset.exclude(geohash='')
+  if cells is not None:
+    candidates = candidates.filter(cells_filter(cells))
+  return candidates.annotate(distance_km=distance_km(latitude, longitude))
+
+
+def _nearest_first(queryset, limit):
+  """
+  The rows of ``queryset`` no farther than its ``limit``-th nearest, or
+  ``None`` when it has fewer rows. Filtering on that distance rather than
+  slicing keeps the result open to further filters and pagination.
+  """
+  farthest = list(queryset.order_by('distance_km').values_list('distance_km', flat=True)[limit - 1:limit])
+  if not farthest:
+    return None
+  return queryset.filter(distance_km__lte=farthest[0])
+
+
+def within_radius(queryset, latitude, longitude, radius_km):
+  """
+  Rows of ``queryset`` within ``radius_km`` of the point, annotated with
+  ``distance_km``.
+
+  Only the 3x3 block of geohash cells coarse enough to contain the whole
+  circle is read. Exact haversine distances are computed in the database
+  for those candidates alone.
+  """
+  precision = 0
+  for candidate in range(GEOHASH_PRECISION, 0, -1):
+    if covered_radius_km(latitude, candidate) >= radius_km:
+      precision = candidate
+      break
+
+  cells = neighbor_cells(latitude, longitude, precision) if precision else None
+  return _with_distance(queryset, latitude, longitude, cells).filter(distance_km__lte=radius_km)
+
+
+def nearest(queryset, latitude, longitude, limit):
+  """
+  The ``limit`` rows of ``queryset`` nearest to the point (more on a tie),
+  annotated with ``distance_km``.
+
+  The search starts with a small block of cells and widens it one geohash
+  level at a time. It stops once ``limit`` rows lie inside the radius the
+  block is guaranteed to cover, since nothing outside the block can be
+  closer than those. Only the last resort, a world-wide search, reads
+  every geocoded row.
+  """
+  for precision in range(NEAREST_START_PRECISION, 0, -1):
+    covered = covered_radius_km(latitude, precision)
+    hits = _with_distance(queryset, latitude, longitude, neighbor_cells(latitude, longitude, precision))
+    found = _nearest_first(hits.filter(distance_km__lte=covered), limit)
+    if found is not None:
+      return found
+  everything = _with_distance(queryset, latitude, longitude)
+  found = _nearest_first(everything, limit)
+  return everything if found is None else found
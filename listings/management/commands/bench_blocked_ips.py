@@ -0,0 +1,41 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandParser
+
+from listings.blocklist import BlockedIPCache
+from listings.models import BlockedIP
+
+
+class Command(BaseCommand):
+  help = 'Compares the per-request cost of the in-memory blocked IP lookup against a database query.'
+
+  def add_arguments(self, parser: CommandParser) -> None:
+    parser.add_argument('--lookups', type=int, default=10000, help='Number of lookups to time for each strategy.')
+
+  def handle(self, *args, **options):
+    lookups = options['lookups']
+    blocked = list(BlockedIP.objects.values_list('ip_address', flat=True)[:1000])
+    addresses = [
+      random.choice(blocked) if blocked and random.random() < 0.1
+      else f"{random.randint(1, 223)}.{random.randint(0, 255)}.{random.randint(0, 255)}.{random.randint(1, 254)}"
+      for _ in range(lookups)
+    ]
+
+    start = time.perf_counter()
+    for ip_address in addresses:
+      BlockedIP.objects.filter(ip_address=ip_address).exists()
+    query_cost = (time.perf_counter() - start) / lookups
+
+    cache = BlockedIPCache()
+    cache.is_blocked('0.0.0.0')
+    start = time.perf_counter()
+    for ip_address in addresses:
+      cache.is_blocked(ip_address)
+    cache_cost = (time.perf_counter() - start) / lookups
+
+    self.stdout.write(f"Blocked IPs loaded: {BlockedIP.objects.count()}")
+    self.stdout.write(f"Database exists() lookup: {query_cost * 1e6:.2f} us/request")
+    self.stdout.write(self.style.SUCCESS(
+      f"In-memory lookup: {cache_cost * 1e6:.2f} us/request ({query_cost / cache_cost:.0f}x faster)"
+    ))
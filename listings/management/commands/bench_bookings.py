@@ -0,0 +1,70 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from django.db import connection
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from listings.models import Listing, User
+from listings.views import BookingViewSet
+
+
+class Command(BaseCommand):
+  help = 'Fires parallel booking requests at BookingViewSet to check the overlap guard and measure throughput.'
+
+  def add_arguments(self, parser: CommandParser) -> None:
+    parser.add_argument('--workers', type=int, default=16, help='Number of concurrent booking requests.')
+    parser.add_argument('--listings', type=int, default=200, help='Listings to spread bookings across in the throughput run.')
+
+  def handle(self, *args, **options):
+    workers = options['workers']
+    tag = uuid.uuid4().hex[:8]
+    user = User.objects.create_user(username=f'bench-{tag}', email=f'bench-{tag}@example.com')
+    listings = Listing.objects.bulk_create([
+      Listing(user_id=user, title=f'Bench {tag} #{i}', description='Benchmark listing', price=100, location='Bench')
+      for i in range(options['listings'])
+    ])
+
+    try:
+      statuses = self.book(user, [listings[0]] * workers, workers, barrier=threading.Barrier(workers))
+      wins = statuses.count(201)
+      if wins != 1:
+        raise CommandError(f"Expected exactly one booking to win on a single listing, got {wins}: {statuses}")
+      self.stdout.write(self.style.SUCCESS(
+        f"Contention: {workers} parallel requests on one listing -> 1 created, {statuses.count(409)} conflicts."
+      ))
+
+      start = time.perf_counter()
+      statuses = self.book(user, listings[1:], workers)
+      elapsed = time.perf_counter() - start
+      self.stdout.write(self.style.SUCCESS(
+        f"Throughput: {statuses.count(201)}/{len(statuses)} bookings across {len(statuses)} listings "
+        f"in {elapsed:.2f}s ({len(statuses) / elapsed:.1f} bookings/s, {workers} workers)."
+      ))
+    finally:
+      user.delete()
+
+  def book(self, user, listings, workers, barrier=None):
+    view = BookingViewSet.as_view({'post': 'create'})
+    factory = APIRequestFactory()
+    start_date = date.today() + timedelta(days=30)
+
+    def submit(listing):
+      request = factory.post('/api/v1/bookings/', {
+        'listing_id': str(listing.listing_id),
+        'start_date': start_date.isoformat(),
+        'end_date': (start_date + timedelta(days=3)).isoformat(),
+      }, format='json')
+      force_authenticate(request, user=user)
+      try:
+        if barrier is not None:
+          barrier.wait()
+        return view(request).status_code
+      finally:
+        connection.close()
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+      return list(pool.map(submit, listings))
@@ -0,0 +1,107 @@
+import threading
+import time
+
+import requests
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+
+from listings.services import ChapaService, build_chapa_session, chapa_http_options
+
+from .chapa_stub import start_stub_server
+
+
+class Command(BaseCommand):
+  help = (
+    'Runs ChapaService against a local stub Chapa server: checks timeouts and retries, then compares '
+    'connections opened and calls/sec of per-call requests.get with the pooled session.'
+  )
+
+  def add_arguments(self, parser: CommandParser) -> None:
+    parser.add_argument('--calls', type=int, default=500, help='Verify calls per timed run.')
+    parser.add_argument('--threads', type=int, default=4, help='Concurrent callers per timed run.')
+    parser.add_argument('--certfile', help='Serve the stub over TLS with this certificate (PEM), to include TLS handshakes.')
+    parser.add_argument('--keyfile', help='Private key for --certfile.')
+
+  def handle(self, *args, **options):
+    server, base_url = start_stub_server(certfile=options['certfile'], keyfile=options['keyfile'])
+    verify = options['certfile'] or True
+    try:
+      self.check_behaviour(server, base_url, verify)
+      self.benchmark(server, base_url, verify, options['calls'], options['threads'])
+    finally:
+      server.shutdown()
+      server.server_close()
+
+  def service(self, base_url, verify, **overrides):
+    session = build_chapa_session({**chapa_http_options(), **overrides})
+    # Environment CA bundles and proxies would override the stub's settings
+    session.trust_env = False
+    session.verify = verify
+    service = ChapaService(session=session)
+    service.base_url = base_url
+    if 'READ_TIMEOUT' in overrides:
+      service.timeout = (service.timeout[0], overrides['READ_TIMEOUT'])
+    return service
+
+  def check_behaviour(self, server, base_url, verify):
+    service = self.service(base_url, verify, RETRY_BACKOFF=0.01, RETRY_JITTER=0.01, READ_TIMEOUT=0.5)
+
+    if not service.verify_payment('flaky-verify') or server.hits['flaky-verify'] != 3:
+      raise CommandError(f"verify was not retried through two 503s ({server.hits['flaky-verify']} attempts).")
+    payment_data = {
+      'amount': '100.00', 'email': 'guest@example.com', 'first_name': 'Ada', 'last_name': 'Obi',
+      'tx_ref': 'flaky-initialize', 'return_url': 'https://example.com/return',
+    }
+    if service.initialize_payment(payment_data) is not None or server.hits['flaky-initialize'] != 1:
+      raise CommandError(f"initialize was retried ({server.hits['flaky-initialize']} attempts); POST must be sent once.")
+
+    start = time.perf_counter()
+    result = service.verify_payment('slow-verify')
+    elapsed = time.perf_counter() - start
+    attempts = server.hits['slow-verify']
+    if result is not None or elapsed >= attempts * (service.timeout[1] + 0.5):
+      raise CommandError(f"verify waited {elapsed:.2f}s over {attempts} attempts for a stalled response instead of timing out.")
+    self.stdout.write(self.style.SUCCESS(
+      f"verify retried through 503s, initialize sent once, stalled verify gave up after {elapsed:.2f}s "
+      f"({attempts} attempts)."
+    ))
+
+  def run(self, calls, threads, verify_payment):
+    per_thread = calls // threads
+
+    def worker(index):
+      for i in range(per_thread):
+        if verify_payment(f'tx-{index}-{i}') is None:
+          raise CommandError('verify failed against the stub.')
+
+    workers = [threading.Thread(target=worker, args=(index,)) for index in range(threads)]
+    start = time.perf_counter()
+    for thread in workers:
+      thread.start()
+    for thread in workers:
+      thread.join()
+    return per_thread * threads, time.perf_counter() - start
+
+  def benchmark(self, server, base_url, verify, calls, threads):
+    service = self.service(base_url, verify)
+
+    no_proxy = {'http': None, 'https': None}
+
+    def unpooled(tx_ref):
+      # What ChapaService did before: module-level requests.get, new connection per call
+      response = requests.get(f'{base_url}/transaction/verify/{tx_ref}', headers=service.headers, verify=verify, proxies=no_proxy)
+      response.raise_for_status()
+      return response.json()
+
+    results = []
+    for label, verify_payment in [('requests.get', unpooled), ('pooled session', service.verify_payment)]:
+      server.connections = 0
+      done, elapsed = self.run(calls, threads, verify_payment)
+      results.append((label, done, elapsed, server.connections))
+      self.stdout.write(
+        f"{label}: {done} calls in {elapsed:.2f}s ({done / elapsed:,.0f} calls/s), {server.connections} connections opened"
+      )
+
+    (_, _, before, opened_before), (_, _, after, opened_after) = results
+    self.stdout.write(self.style.SUCCESS(
+      f"pooled session: {before / after:.1f}x faster, {opened_before - opened_after} fewer handshakes."
+    ))
@@ -0,0 +1,109 @@
+import io
+import time
+import uuid
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from listings.models import Booking, Listing, User
+from listings.renderers import JSON_BACKENDS, FastJSONParser, FastJSONRenderer
+from listings.serializers import BookingSerializer, ListingSerializer
+
+
+class Command(BaseCommand):
+  help = 'Compares JSONRenderer/JSONParser with each FastJSONRenderer/FastJSONParser backend on listing, booking and raw payloads.'
+
+  def add_arguments(self, parser: CommandParser) -> None:
+    parser.add_argument('--rows', type=int, default=1000, help='Objects per payload.')
+    parser.add_argument('--repeat', type=int, default=20, help='Timed runs per payload.')
+
+  def handle(self, *args, **options):
+    rows, repeat = options['rows'], options['repeat']
+    # Everything created here is rolled back at the end
+    with transaction.atomic():
+      self.seed(rows)
+      payloads = [
+        ('listings', ListingSerializer(list(Listing.objects.order_by('created_at', 'listing_id')[:rows]), many=True).data),
+        ('bookings', BookingSerializer(list(Booking.objects.order_by('start_date', 'booking_id')[:rows]), many=True).data),
+      ]
+      transaction.set_rollback(True)
+
+    now = timezone.now()
+    payloads.append(('raw', [
+      {'id': uuid.uuid4(), 'amount': Decimal('1499.50') + i, 'created_at': now, 'day': now.date(), 'tags': ['a', 'b']}
+      for i in range(rows)
+    ]))
+
+    for label, data in payloads:
+      self.compare(label, data, repeat)
+    self.check_non_finite()
+
+  def seed(self, count):
+    tag = uuid.uuid4().hex[:8]
+    user = User.objects.create_user(username=f'bench-{tag}', email=f'bench-{tag}@example.com')
+    listings = Listing.objects.bulk_create([
+      Listing(
+        user_id=user, title=f'Bench {tag} #{i}', description='Benchmark listing', price=Decimal('99.90') + i % 7,
+        location='Lagos, Nigeria', latitude=6.5 + i / 1e6, longitude=3.4, amenities=['WiFi', 'Pool'],
+      )
+      for i in range(count)
+    ])
+    start = date.today()
+    Booking.objects.bulk_create([
+      Booking(
+        listing_id=listing, user_id=user, start_date=start + timedelta(days=i % 365),
+        end_date=start + timedelta(days=i % 365 + 3), total_amount=Decimal('299.70'),
+      )
+      for i, listing in enumerate(listings)
+    ])
+
+  def timed(self, repeat, func, *args):
+    result = func(*args)
+    start = time.perf_counter()
+    for _ in range(repeat):
+      func(*args)
+    return result, (time.perf_counter() - start) / repeat
+
+  def compare(self, label, data, repeat):
+    expected, render_cost = self.timed(repeat, JSONRenderer().render, data)
+    parsed, parse_cost = self.timed(repeat, lambda: JSONParser().parse(io.BytesIO(expected)))
+
+    for name in JSON_BACKENDS:
+      renderer = type('BenchRenderer', (FastJSONRenderer,), {'backend': name})()
+      parser = type('BenchParser', (FastJSONParser,), {'backend': name})()
+      actual, fast_render_cost = self.timed(repeat, renderer.render, data)
+      reparsed, fast_parse_cost = self.timed(repeat, lambda: parser.parse(io.BytesIO(expected)))
+      if reparsed != parsed:
+        raise CommandError(f"{label}: {name} parser result differs from JSONParser.")
+      # Only the Python backend promises JSONRenderer's exact bytes; the
+      # others must still decode to the same data
+      if name == 'python' and actual != expected:
+        raise CommandError(f"{label}: {name} renderer output differs from JSONRenderer.")
+      if parser.parse(io.BytesIO(actual)) != parsed:
+        raise CommandError(f"{label}: {name} renderer output does not round-trip.")
+      identical = 'output identical' if actual == expected else 'output differs in formatting only'
+      self.stdout.write(self.style.SUCCESS(
+        f"{label} x{len(data)} [{name}]: render {render_cost * 1000:.2f} -> {fast_render_cost * 1000:.2f} ms "
+        f"({render_cost / fast_render_cost:.1f}x), parse {parse_cost * 1000:.2f} -> {fast_parse_cost * 1000:.2f} ms "
+        f"({parse_cost / fast_parse_cost:.1f}x), {identical}."
+      ))
+
+  def check_non_finite(self):
+    """
+    Every backend rejects NaN and infinities, as ``JSONRenderer`` does.
+    """
+    for value in (float('nan'), float('inf'), Decimal('-Infinity')):
+      data = [{'score': value, 'note': None}]
+      for name in JSON_BACKENDS:
+        renderer = type('BenchRenderer', (FastJSONRenderer,), {'backend': name})()
+        try:
+          renderer.render(data)
+        except ValueError:
+          continue
+        raise CommandError(f"{name} renderer accepted the non-finite value {value}.")
+    self.stdout.write(self.style.SUCCESS('Non-finite floats are rejected by every backend.'))
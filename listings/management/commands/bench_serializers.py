@@ -0,0 +1,69 @@
+import time
+import uuid
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from listings.models import Booking, Listing, User
+from listings.serializers import BookingSerializer, BookingValuesSerializer, ListingSerializer, ListingValuesSerializer
+
+
+class Command(BaseCommand):
+  help = 'Compares rows/sec of the ModelSerializer and values() fast path for listings and bookings, checking the JSON is byte-identical.'
+
+  def add_arguments(self, parser: CommandParser) -> None:
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000, 100000], help='Row counts to time.')
+
+  def handle(self, *args, **options):
+    sizes = sorted(options['rows'])
+    # Everything created here is rolled back at the end
+    with transaction.atomic():
+      self.seed(sizes[-1])
+      for label, queryset, serializer_class, values_serializer_class in [
+        ('listings', Listing.objects.order_by('created_at', 'listing_id'), ListingSerializer, ListingValuesSerializer),
+        ('bookings', Booking.objects.order_by('start_date', 'booking_id'), BookingSerializer, BookingValuesSerializer),
+      ]:
+        for size in sizes:
+          self.compare(label, queryset, size, serializer_class, values_serializer_class)
+      transaction.set_rollback(True)
+
+  def seed(self, count):
+    tag = uuid.uuid4().hex[:8]
+    user = User.objects.create_user(username=f'bench-{tag}', email=f'bench-{tag}@example.com')
+    listings = Listing.objects.bulk_create([
+      Listing(
+        user_id=user, title=f'Bench {tag} #{i}', description='Benchmark listing', price=Decimal('99.90') + i % 7,
+        location='Lagos, Nigeria', latitude=6.5 + i / 1e6, longitude=3.4, amenities=['WiFi', 'Pool'],
+      )
+      for i in range(count)
+    ], batch_size=5000)
+    start = date.today()
+    Booking.objects.bulk_create([
+      Booking(
+        listing_id=listing, user_id=user, start_date=start + timedelta(days=i % 365),
+        end_date=start + timedelta(days=i % 365 + 3), total_amount=Decimal('299.70'),
+      )
+      for i, listing in enumerate(listings)
+    ], batch_size=5000)
+
+  def compare(self, label, queryset, size, serializer_class, values_serializer_class):
+    renderer = JSONRenderer()
+
+    start = time.perf_counter()
+    expected = renderer.render(serializer_class(list(queryset[:size]), many=True).data)
+    serializer_cost = time.perf_counter() - start
+
+    start = time.perf_counter()
+    values_serializer = values_serializer_class()
+    actual = renderer.render(values_serializer.many(values_serializer.values(queryset)[:size]))
+    fast_cost = time.perf_counter() - start
+
+    if actual != expected:
+      raise CommandError(f"{label}: values() output differs from {serializer_class.__name__} at {size} rows.")
+    self.stdout.write(self.style.SUCCESS(
+      f"{label} x{size}: {serializer_class.__name__} {size / serializer_cost:,.0f} rows/s, "
+      f"values() {size / fast_cost:,.0f} rows/s ({serializer_cost / fast_cost:.1f}x), output identical."
+    ))
@@ -1,25 +1,73 @@
+import ipaddress
+import sys
+
 from django.core.management.base import BaseCommand, CommandError, CommandParser
-from django.db import IntegrityError
+from django.db import DatabaseError
 from listings.models import BlockedIP
 
 class Command(BaseCommand):
-  help = 'Adds a specified IP address to the BlockedIP model to deny future access.'
-  
+  help = (
+    'Adds IP addresses or CIDR networks to the BlockedIP model to deny future access. '
+    'Entries can be passed as arguments or streamed from a file (one per line, "-" for stdin).'
+  )
+
   def add_arguments(self, parser: CommandParser) -> None:
-    parser.add_argument('ip_address', type=str, help='The IP address to block.')
-    
-    
+    parser.add_argument('ip_address', nargs='*', type=str, help='IP addresses or CIDR networks to block.')
+    parser.add_argument('--file', dest='file', help='Read addresses from this file, or "-" for stdin.')
+    parser.add_argument('--batch-size', dest='batch_size', type=int, default=5000, help='Rows per INSERT batch.')
+
+
   def handle(self, *args, **options):
-    ip_address = options['ip_address']
-    
-    if BlockedIP.objects.filter(ip_address=ip_address).exists():
-      self.stdout.write(self.style.WARNING(f"IP address {ip_address} is already blocked."))
-      return
-    
+    if not options['ip_address'] and not options['file']:
+      raise CommandError("Provide at least one IP address or --file.")
+
+    batch_size = options['batch_size']
+    before = BlockedIP.objects.count()
+    batch, invalid = [], 0
+
+    for entry in self.read_entries(options):
+      try:
+        network = ipaddress.ip_network(entry, strict=False)
+      except ValueError:
+        invalid += 1
+        self.stderr.write(self.style.WARNING(f"Skipping invalid address or network: '{entry}'."))
+        continue
+
+      batch.append(BlockedIP(ip_address=str(network.network_address), prefix_length=network.prefixlen))
+      if len(batch) >= batch_size:
+        self.insert(batch)
+        batch = []
+
+    if batch:
+      self.insert(batch)
+
+    added = BlockedIP.objects.count() - before
+    self.stdout.write(self.style.SUCCESS(f"Successfully blocked {added} new address(es) or network(s)."))
+    if invalid:
+      self.stdout.write(self.style.WARNING(f"{invalid} invalid entr{'y was' if invalid == 1 else 'ies were'} skipped."))
+
+  def read_entries(self, options):
+    """
+    Yield entries one at a time so large threat feeds are never held in memory.
+    """
+    yield from options['ip_address']
+
+    if options['file']:
+      try:
+        stream = sys.stdin if options['file'] == '-' else open(options['file'])
+      except OSError as e:
+        raise CommandError(f"Could not read '{options['file']}': {e}")
+      try:
+        for line in stream:
+          entry = line.split('#', 1)[0].strip()
+          if entry:
+            yield entry
+      finally:
+        if stream is not sys.stdin:
+          stream.close()
+
+  def insert(self, batch):
     try:
-      BlockedIP.objects.create(ip_address=ip_address)
-      self.stdout.write(self.style.SUCCESS(f"Successfully blocked IP address: '{ip_address}'."))
-    except IntegrityError:
-      raise CommandError(f"IP address '{ip_address}' could not be added. It may be an invalid format or a database issue.")
-    except Exception as e:
-      raise CommandError(f"An unexpected error occurred: {e}")
\ No newline at end of file
+      BlockedIP.objects.bulk_create(batch, batch_size=len(batch), ignore_conflicts=True)
+    except DatabaseError as e:
+      raise CommandError(f"Blocked addresses could not be added: {e}")
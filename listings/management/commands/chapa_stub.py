@@ -0,0 +1,87 @@
+import json
+import ssl
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubChapaHandler(BaseHTTPRequestHandler):
+  """
+  Minimal Chapa API. Every request waits ``server.delay`` seconds.
+  ``flaky`` references fail with 503 twice before succeeding (always, for
+  initialize) and ``slow`` references also sleep ``server.slow_seconds``.
+  Verify reports ``failed`` and ``pending`` references as such.
+  """
+
+  protocol_version = 'HTTP/1.1'
+  # Headers and body are separate writes; avoid Nagle/delayed-ACK stalls on kept-alive sockets
+  disable_nagle_algorithm = True
+
+  def log_message(self, format, *args):
+    pass
+
+  def setup(self):
+    super().setup()
+    with self.server.lock:
+      self.server.connections += 1
+
+  def reply(self, status, body):
+    content = json.dumps(body).encode()
+    self.send_response(status)
+    self.send_header('Content-Type', 'application/json')
+    self.send_header('Content-Length', str(len(content)))
+    self.end_headers()
+    self.wfile.write(content)
+
+  def hit(self, tx_ref):
+    with self.server.lock:
+      self.server.hits[tx_ref] += 1
+      hits = self.server.hits[tx_ref]
+    time.sleep(self.server.delay + (self.server.slow_seconds if tx_ref.startswith('slow') else 0))
+    return hits
+
+  def do_GET(self):
+    tx_ref = self.path.rsplit('/', 1)[-1]
+    if self.hit(tx_ref) <= 2 and tx_ref.startswith('flaky'):
+      return self.reply(503, {'message': 'Service unavailable'})
+    gateway_status = next((status for status in ('failed', 'pending') if tx_ref.startswith(status)), 'success')
+    self.reply(200, {
+      'status': 'success',
+      'data': {'tx_ref': tx_ref, 'status': gateway_status, 'reference': f'ref-{tx_ref}', 'method': 'telebirr'},
+    })
+
+  def do_POST(self):
+    payload = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+    tx_ref = payload['tx_ref']
+    self.hit(tx_ref)
+    if tx_ref.startswith('flaky'):
+      return self.reply(503, {'message': 'Service unavailable'})
+    self.reply(200, {'status': 'success', 'data': {'checkout_url': f'https://checkout.example/{tx_ref}'}})
+
+
+def start_stub_server(delay=0, slow_seconds=5, certfile=None, keyfile=None):
+  """
+  Serve ``StubChapaHandler`` on a free local port from a daemon thread.
+  Returns the server and its Chapa-style base URL; call
+  ``server.shutdown()`` and ``server.server_close()`` when done.
+  """
+  server = ThreadingHTTPServer(('127.0.0.1', 0), StubChapaHandler)
+  server.daemon_threads = True
+  server.lock = threading.Lock()
+  server.connections = 0
+  server.hits = Counter()
+  server.delay = delay
+  server.slow_seconds = slow_seconds
+  # Stalled replies hit sockets the client already gave up on
+  server.handle_error = lambda request, client_address: None
+
+  scheme = 'http'
+  if certfile:
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(certfile, keyfile)
+    server.socket = context.wrap_socket(server.socket, server_side=True)
+    scheme = 'https'
+
+  threading.Thread(target=server.serve_forever, daemon=True).start()
+  return server, f'{scheme}://127.0.0.1:{server.server_address[1]}/v1'
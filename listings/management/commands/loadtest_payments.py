@@ -0,0 +1,128 @@
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from django.test import Client, override_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from listings.models import Booking, Listing, Payment, User
+from listings.services import reset_chapa_session
+
+from .chapa_stub import start_stub_server
+
+
+def percentile(values, fraction):
+  ordered = sorted(values)
+  return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] if ordered else 0
+
+
+class Command(BaseCommand):
+  help = (
+    'Load-tests PaymentViewSet.initiate against a deliberately slow local Chapa stub, first with the Chapa '
+    'call on the request thread and then through Celery tasks, while other API requests share the same '
+    'fixed pool of web threads. Runs an in-process Celery worker on an in-memory broker.'
+  )
+
+  def add_arguments(self, parser: CommandParser) -> None:
+    parser.add_argument('--payments', type=int, default=40, help='Initiate requests per mode.')
+    parser.add_argument('--probes', type=int, default=20, help='Other API requests sent behind them.')
+    parser.add_argument('--web-threads', type=int, default=4, help='Request threads, as in a gthread worker.')
+    parser.add_argument('--task-workers', type=int, default=8, help='Celery worker threads for the async mode.')
+    parser.add_argument('--delay', type=float, default=1.0, help='Seconds the stub takes per Chapa call.')
+
+  def handle(self, *args, **options):
+    server, base_url = start_stub_server(delay=options['delay'])
+    user, bookings = self.seed(options['payments'] * 2)
+    headers = {'HTTP_AUTHORIZATION': f'Bearer {AccessToken.for_user(user)}', 'HTTP_HOST': '127.0.0.1'}
+    chapa_http = {**getattr(settings, 'CHAPA_HTTP', {}), 'BASE_URL': base_url}
+    try:
+      for gateway_async, chunk in [(False, bookings[:options['payments']]), (True, bookings[options['payments']:])]:
+        reset_chapa_session()
+        with override_settings(PAYMENT_GATEWAY_ASYNC=gateway_async, CHAPA_HTTP=chapa_http):
+          if gateway_async:
+            with self.celery_worker(options['task_workers']):
+              self.run_mode('async', chunk, headers, options)
+          else:
+            self.run_mode('sync', chunk, headers, options)
+    finally:
+      reset_chapa_session()
+      user.delete()
+      server.shutdown()
+      server.server_close()
+
+  def seed(self, count):
+    tag = uuid.uuid4().hex[:8]
+    user = User.objects.create_user(username=f'loadtest-{tag}', email=f'loadtest-{tag}@example.com')
+    listing = Listing.objects.create(
+      user_id=user, title=f'Load test {tag}', description='Load test listing', price=Decimal('120.00'),
+      location='Addis Ababa, Ethiopia',
+    )
+    start = date.today() + timedelta(days=30)
+    bookings = Booking.objects.bulk_create([
+      Booking(
+        listing_id=listing, user_id=user, start_date=start + timedelta(days=3 * i),
+        end_date=start + timedelta(days=3 * i + 2), total_amount=Decimal('240.00'),
+      )
+      for i in range(count)
+    ])
+    return user, bookings
+
+  def celery_worker(self, concurrency):
+    from celery.contrib.testing.worker import start_worker
+    from alx_travel_app.celery import app
+
+    app.conf.update(broker_url='memory://', task_always_eager=False)
+    return start_worker(app, pool='threads', concurrency=concurrency, perform_ping_check=False, loglevel='WARNING')
+
+  def request(self, submitted, method, path, headers, data=None):
+    client = Client()
+    if method == 'post':
+      response = client.post(path, data, content_type='application/json', **headers)
+    else:
+      response = client.get(path, **headers)
+    # Latency as a client sees it, including the wait for a free web thread
+    return response.status_code, time.perf_counter() - submitted
+
+  def run_mode(self, mode, bookings, headers, options):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=options['web_threads']) as pool:
+      initiates = [
+        pool.submit(self.request, time.perf_counter(), 'post', '/api/v1/payments/initiate/', headers, {
+          'booking_id': str(booking.pk), 'return_url': 'https://example.com/return',
+        })
+        for booking in bookings
+      ]
+      probes = [
+        pool.submit(self.request, time.perf_counter(), 'get', '/api/v1/bookings/', headers)
+        for _ in range(options['probes'])
+      ]
+      initiate_results = [future.result() for future in initiates]
+      probe_results = [future.result() for future in probes]
+    answered = time.perf_counter() - start
+
+    payments = Payment.objects.filter(booking_id__in=bookings)
+    deadline = time.monotonic() + len(bookings) * options['delay'] + 30
+    while payments.filter(gateway_state='initializing').exists():
+      if time.monotonic() > deadline:
+        raise CommandError(f"{mode}: payments still initializing after the deadline.")
+      time.sleep(0.05)
+    settled = time.perf_counter() - start
+
+    codes = Counter(code for code, _ in initiate_results)
+    ready = payments.filter(gateway_state='idle', chapa_checkout_url__isnull=False).count()
+    if ready != len(bookings):
+      raise CommandError(f"{mode}: {ready}/{len(bookings)} payments got a checkout URL (responses {dict(codes)}).")
+
+    initiate_latency = [latency for _, latency in initiate_results]
+    probe_latency = [latency for _, latency in probe_results]
+    self.stdout.write(self.style.SUCCESS(
+      f"{mode}: {len(bookings)} initiates {dict(codes)} p50 {percentile(initiate_latency, 0.5):.2f}s "
+      f"p95 {percentile(initiate_latency, 0.95):.2f}s; other requests p50 {percentile(probe_latency, 0.5):.2f}s "
+      f"p95 {percentile(probe_latency, 0.95):.2f}s; all answered in {answered:.2f}s, "
+      f"all checkout URLs in {settled:.2f}s."
+    ))
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandParser
+from django.db import transaction
+from django.db.models import Count, Sum
+
+from listings.models import Listing, Review
+
+
+class Command(BaseCommand):
+  help = 'Recomputes the materialized review count and average rating of every listing from the Review table.'
+
+  def add_arguments(self, parser: CommandParser) -> None:
+    parser.add_argument('--batch-size', dest='batch_size', type=int, default=2000, help='Listings per UPDATE batch.')
+
+  def handle(self, *args, **options):
+    batch_size = options['batch_size']
+    stats = {
+      row['listing_id']: (row['count'], row['total'])
+      for row in Review.objects.order_by().values('listing_id').annotate(count=Count('pk'), total=Sum('rating'))
+    }
+
+    # Only drifted listings are rewritten, through refresh_review_stats() so
+    # their updated_at, ETag and cached responses move with the new values
+    repaired, batch = 0, []
+    with transaction.atomic():
+      rows = Listing.objects.order_by('pk').values_list('pk', 'review_count', 'rating_total', 'avg_rating')
+      for pk, *current in rows.iterator(chunk_size=batch_size):
+        count, total = stats.get(pk, (0, 0))
+        average = total / count if count else 0.0
+        if tuple(current) == (count, total, average):
+          continue
+        batch.append(pk)
+        if len(batch) >= batch_size:
+          Listing.objects.filter(pk__in=batch).refresh_review_stats()
+          repaired += len(batch)
+          batch = []
+      Listing.objects.filter(pk__in=batch).refresh_review_stats()
+      repaired += len(batch)
+
+    self.stdout.write(self.style.SUCCESS(f"Recomputed review stats for {len(stats)} reviewed listings; repaired {repaired}."))
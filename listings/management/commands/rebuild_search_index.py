@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand, CommandParser
+
+from listings.models import Listing
+from listings.search import SEARCH_BACKENDS, get_search_backend
+
+
+class Command(BaseCommand):
+  help = 'Rebuilds the listing full-text search index from the Listing table.'
+
+  def add_arguments(self, parser: CommandParser) -> None:
+    parser.add_argument('--backend', choices=sorted(SEARCH_BACKENDS), help='Index to rebuild. Defaults to the active LISTING_SEARCH_BACKEND.')
+
+  def handle(self, *args, **options):
+    backend = SEARCH_BACKENDS[options['backend']] if options['backend'] else get_search_backend()
+    backend.rebuild()
+    self.stdout.write(self.style.SUCCESS(
+      f"Rebuilt the '{backend.name}' search index for {Listing.objects.count()} listings."
+    ))
@@ -0,0 +1,26 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandParser
+
+from listings.reconcile import reconcile_pending_payments
+
+
+class Command(BaseCommand):
+  help = 'Verifies pending payments with Chapa and applies the reported status in bulk, printing throughput metrics.'
+
+  def add_arguments(self, parser: CommandParser) -> None:
+    parser.add_argument('--limit', type=int, help='Stop after this many payments.')
+    parser.add_argument('--chunk-size', dest='chunk_size', type=int, help='Payments read and updated per batch.')
+    parser.add_argument('--workers', type=int, help='Concurrent verify calls.')
+    parser.add_argument('--grace-minutes', dest='grace_minutes', type=int, help='Skip payments younger than this.')
+
+  def handle(self, *args, **options):
+    grace = timedelta(minutes=options['grace_minutes']) if options['grace_minutes'] is not None else None
+    metrics = reconcile_pending_payments(
+      limit=options['limit'], chunk_size=options['chunk_size'], workers=options['workers'], grace=grace,
+    )
+    self.stdout.write(self.style.SUCCESS(
+      f"Reconciled {metrics['scanned']} pending payments in {metrics['seconds']:.1f}s "
+      f"({metrics['per_second']:,.0f}/s): {metrics['completed']} completed, {metrics['failed']} failed, "
+      f"{metrics['cancelled']} cancelled, {metrics['unchanged']} unchanged, {metrics['errors']} errors."
+    ))
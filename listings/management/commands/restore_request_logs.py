@@ -0,0 +1,34 @@
+from datetime import date
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+
+from listings.archive import archive_path, default_archive_dir, restore_request_logs
+
+
+class Command(BaseCommand):
+  help = 'Re-imports archived request logs from gzip JSONL files back into the RequestLog table.'
+
+  def add_arguments(self, parser: CommandParser) -> None:
+    parser.add_argument('archives', nargs='*', type=str, help='Archive files to restore.')
+    parser.add_argument('--date', dest='dates', action='append', default=[],
+                        help='Restore the archive for this day (YYYY-MM-DD) from the configured archive directory. Repeatable.')
+    parser.add_argument('--batch-size', dest='batch_size', type=int, default=5000, help='Rows per INSERT batch.')
+
+  def handle(self, *args, **options):
+    archive_dir = default_archive_dir()
+    paths = [Path(path) for path in options['archives']]
+    for day in options['dates']:
+      try:
+        paths.append(archive_path(archive_dir, date.fromisoformat(day)))
+      except ValueError:
+        raise CommandError(f"Invalid date '{day}', expected YYYY-MM-DD.")
+
+    if not paths:
+      raise CommandError("Provide at least one archive file or --date.")
+
+    for path in paths:
+      if not path.exists():
+        raise CommandError(f"Archive '{path}' does not exist.")
+      restored = restore_request_logs(path, batch_size=options['batch_size'])
+      self.stdout.write(self.style.SUCCESS(f"Re-imported {restored} archived request logs from '{path}' (rows already present were skipped). The next archive run deletes them once past the retention cutoff, without archiving them again."))
@@ -9,7 +9,10 @@ from django.contrib.auth import get_user_model
 
 from utils import get_seeding_stats, validate_booking_data, validate_review_data, validate_user_count, \
     validate_listing_data
-from ...models import Listing, Booking, Review
+from ...cache import listing_cache
+from ...geo import geocode_listing
+from ...models import Listing, ListingAmenity, Booking, Review
+from ...search import index_listings
 
 User = get_user_model()
 
@@ -70,14 +73,18 @@ async def async_create_listings(users: List[User], count: int = 50) -> List[List
         batch_listings = []
         for listing_data in listing_data_batch:
             try:
-                listing = Listing(**listing_data)
+                listing = geocode_listing(Listing(**listing_data))
                 batch_listings.append(listing)
             except Exception as e:
                 logger.error(f"Error creating listing {listing_data.get('title')}: {str(e)}")
 
         # Bulk create for efficiency
         if batch_listings:
-            return Listing.objects.bulk_create(batch_listings, ignore_conflicts=True)
+            created_listings = Listing.objects.bulk_create(batch_listings, ignore_conflicts=True)
+            ListingAmenity.objects.sync(created_listings)
+            index_listings(created_listings)
+            listing_cache.invalidate()
+            return created_listings
         return []
 
     # Generate listing data using generator
@@ -143,13 +150,16 @@ def create_listings(users: List[User], count: int = 100) -> List[Listing]:
             batch_listings = []
             for listing_data in batch:
                 try:
-                    listing = Listing(**listing_data)
+                    listing = geocode_listing(Listing(**listing_data))
                     batch_listings.append(listing)
                 except Exception as e:
                     logger.error(f"Error preparing listing {listing_data['title']}: {str(e)}")
 
             if batch_listings:
                 created_listings = Listing.objects.bulk_create(batch_listings, ignore_conflicts=True)
+                ListingAmenity.objects.sync(created_listings)
+                index_listings(created_listings)
+                listing_cache.invalidate()
                 listings.extend(created_listings)
 
     logger.info(f"Created {len(listings)} listings")
@@ -210,6 +220,7 @@ def create_reviews(listings: List[Listing], users: List[User], count: int = 200)
 
             if batch_reviews:
                 created_reviews = Review.objects.bulk_create(batch_reviews, ignore_conflicts=True)
+                Review.objects.record_created(created_reviews)
                 reviews.extend(created_reviews)
 
     logger.info(f"Created {len(reviews)} reviews")
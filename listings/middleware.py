@@ -2,7 +2,9 @@ import logging
 from datetime import datetime, timezone
 from django.http import HttpResponseForbidden
 from ipware import get_client_ip
-from .models import BlockedIP, RequestLog
+from .blocklist import blocked_ips
+from .buffers import request_log_buffer
+from .models import RequestLog
 
 
 logging.basicConfig(level=logging.INFO)
@@ -19,9 +21,8 @@ class RequestLoggingMiddleware:
     if ip_address is None:
       ip_address = '0.0.0.0'
       is_routable = False
-    print(ip_address, is_routable)
     try:
-        if BlockedIP.objects.filter(ip_address=ip_address).exists():
+        if blocked_ips.is_blocked(ip_address):
             log_message = f"[{datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S UTC')}] - Blocked request from IP: {ip_address}, Path: {request.path}"
             logger.warning(log_message)
             return HttpResponseForbidden("This IP address has been blocked.")
@@ -36,24 +37,22 @@ class RequestLoggingMiddleware:
       country = 'N/A'
       city = 'N/A'
       
-    timestamp = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S UTC')
+    timestamp = datetime.now(timezone.utc)
     path = request.path
 
     log_type = "ROUTABLE" if is_routable else "NON-ROUTABLE"
-    log_message = f"[{timestamp}] - Incoming request from {log_type} IP: {ip_address}, Path: {path}"
+    log_message = f"[{timestamp.strftime('%Y-%m-%d %H:%M:%S UTC')}] - Incoming request from {log_type} IP: {ip_address}, Path: {path}"
     logger.info(log_message)
 
-    try:
-        RequestLog.objects.create(
-            ip_address=ip_address,
-            path=path,
-            is_routable=is_routable,
-            timestamp=timestamp,
-            city=city,
-            country=country,
-        )
-    except Exception as e:
-        logger.error(f"Failed to save request log to DB: {e}")
+    # Rows are written in batches by the buffer's flusher thread
+    request_log_buffer.append(RequestLog(
+        ip_address=ip_address,
+        path=path,
+        is_routable=is_routable,
+        timestamp=timestamp,
+        city=city,
+        country=country,
+    ))
 
     response = self.get_response(request)
     return response
\ No newline at end of file
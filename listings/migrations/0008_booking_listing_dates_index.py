@@ -0,0 +1,17 @@
+# Generated by Django 5.2.4 on 2026-10-17 00:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0007_blockedip_requestlog_suspiciousip'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['listing_id', 'start_date', 'end_date'], name='listings_bo_listing_e26120_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.4 on 2026-10-17 00:53
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0008_booking_listing_dates_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='requestlog',
+            name='timestamp',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.4 on 2026-10-17 00:54
+
+from django.db import migrations, models
+
+
+def set_ipv6_prefix_length(apps, schema_editor):
+    BlockedIP = apps.get_model('listings', 'BlockedIP')
+    BlockedIP.objects.filter(ip_address__contains=':').update(prefix_length=128)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0009_alter_requestlog_timestamp'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blockedip',
+            name='prefix_length',
+            field=models.PositiveSmallIntegerField(default=32),
+            preserve_default=False,
+        ),
+        migrations.RunPython(set_ipv6_prefix_length, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='blockedip',
+            name='ip_address',
+            field=models.GenericIPAddressField(),
+        ),
+        migrations.AddConstraint(
+            model_name='blockedip',
+            constraint=models.UniqueConstraint(fields=('ip_address', 'prefix_length'), name='unique_blocked_network'),
+        ),
+    ]
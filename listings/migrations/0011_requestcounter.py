@@ -0,0 +1,29 @@
+# Generated by Django 5.2.4 on 2026-10-17 00:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0010_blockedip_prefix_length'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RequestCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ip_address', models.GenericIPAddressField()),
+                ('minute', models.DateTimeField(db_index=True)),
+                ('request_count', models.PositiveIntegerField(default=0)),
+                ('sensitive_count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Request Counter',
+                'verbose_name_plural': 'Request Counters',
+                'ordering': ['-minute'],
+                'constraints': [models.UniqueConstraint(fields=('ip_address', 'minute'), name='unique_request_counter_bucket')],
+            },
+        ),
+    ]
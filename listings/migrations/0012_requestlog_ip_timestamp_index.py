@@ -0,0 +1,17 @@
+# Generated by Django 5.2.4 on 2026-10-17 00:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0011_requestcounter'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='requestlog',
+            index=models.Index(fields=['ip_address', 'timestamp'], name='listings_re_ip_addr_9d9458_idx'),
+        ),
+    ]
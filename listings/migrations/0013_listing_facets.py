@@ -0,0 +1,62 @@
+# Generated by Django 5.2.4 on 2026-10-17 00:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_listing_amenities(apps, schema_editor):
+    Listing = apps.get_model('listings', 'Listing')
+    ListingAmenity = apps.get_model('listings', 'ListingAmenity')
+    batch = []
+    for pk, amenities in Listing.objects.values_list('pk', 'amenities').iterator(chunk_size=2000):
+        batch.extend(ListingAmenity(listing_id_id=pk, name=str(name)[:100]) for name in set(amenities or []))
+        if len(batch) >= 2000:
+            ListingAmenity.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    ListingAmenity.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0012_requestlog_ip_timestamp_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ListingAmenity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+            ],
+            options={
+                'verbose_name_plural': 'Listing amenities',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='listing',
+            index=models.Index(fields=['type', 'price'], name='listings_li_type_11ddce_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='listing',
+            index=models.Index(fields=['price'], name='listings_li_price_d6caaa_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='listing',
+            index=models.Index(fields=['num_bedrooms'], name='listings_li_num_bed_81b29b_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='listing',
+            index=models.Index(fields=['location'], name='listings_li_locatio_4bc07d_idx'),
+        ),
+        migrations.AddField(
+            model_name='listingamenity',
+            name='listing_id',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='amenity_index', to='listings.listing'),
+        ),
+        migrations.AddConstraint(
+            model_name='listingamenity',
+            constraint=models.UniqueConstraint(fields=('name', 'listing_id'), name='unique_listing_amenity'),
+        ),
+        migrations.RunPython(backfill_listing_amenities, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.4 on 2026-10-17 01:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.utils import OperationalError
+
+
+def create_fts_index(apps, schema_editor):
+    """
+    Create and fill the FTS5 index on SQLite builds that include FTS5.
+    Other databases use the ListingSearchTerm table, filled by
+    ``manage.py rebuild_search_index``.
+    """
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    try:
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE listings_listing_fts USING fts5(listing_id UNINDEXED, title, description, location)"
+        )
+    except OperationalError:
+        return
+    Listing = apps.get_model('listings', 'Listing')
+    rows = Listing.objects.values_list('listing_id', 'title', 'description', 'location').iterator(chunk_size=2000)
+    with schema_editor.connection.cursor() as cursor:
+        # rowid is the first 15 hex digits of the UUID, as in FTS5SearchBackend.rowid
+        cursor.executemany(
+            "INSERT INTO listings_listing_fts (rowid, listing_id, title, description, location) VALUES (%s, %s, %s, %s, %s)",
+            ((int(pk.hex[:15], 16), pk.hex, title, description, location) for pk, title, description, location in rows),
+        )
+
+
+def drop_fts_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute("DROP TABLE IF EXISTS listings_listing_fts")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0013_listing_facets'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ListingSearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64)),
+                ('frequency', models.PositiveIntegerField()),
+                ('length', models.PositiveIntegerField()),
+                ('listing_id', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to='listings.listing')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('term', 'listing_id'), name='unique_listing_search_term')],
+            },
+        ),
+        migrations.RunPython(create_fts_index, drop_fts_index),
+    ]
@@ -0,0 +1,106 @@
+# Generated by Django 5.2.4 on 2026-10-17 01:04
+
+import csv
+from pathlib import Path
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+# Frozen copies of listings.geo as of this migration, so later changes to the
+# app code cannot change what it does
+
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+GEOHASH_PRECISION = 9
+DEFAULT_GAZETTEER = Path(__file__).resolve().parent.parent / 'data' / 'gazetteer.csv'
+
+
+def encode_geohash(latitude, longitude, precision=GEOHASH_PRECISION):
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    geohash, bits, bit_count, even = [], 0, 0, True
+    while len(geohash) < precision:
+        if even:
+            mid = (lon_range[0] + lon_range[1]) / 2
+            if longitude >= mid:
+                bits, lon_range[0] = (bits << 1) | 1, mid
+            else:
+                bits, lon_range[1] = bits << 1, mid
+        else:
+            mid = (lat_range[0] + lat_range[1]) / 2
+            if latitude >= mid:
+                bits, lat_range[0] = (bits << 1) | 1, mid
+            else:
+                bits, lat_range[1] = bits << 1, mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            geohash.append(BASE32[bits])
+            bits, bit_count = 0, 0
+    return ''.join(geohash)
+
+
+def normalize_place(name):
+    return ' '.join((name or '').lower().replace(',', ' , ').split())
+
+
+def load_gazetteer():
+    path = getattr(settings, 'GEOCODER_GAZETTEER', DEFAULT_GAZETTEER)
+    with open(path, newline='', encoding='utf-8') as gazetteer:
+        return {
+            normalize_place(row['name']): (float(row['latitude']), float(row['longitude']))
+            for row in csv.DictReader(gazetteer)
+        }
+
+
+def geocode(places, location):
+    name = normalize_place(location)
+    if name in places:
+        return places[name]
+    return places.get(normalize_place((location or '').split(',')[0]))
+
+
+def geocode_listings(apps, schema_editor):
+    Listing = apps.get_model('listings', 'Listing')
+    places = load_gazetteer()
+    batch = []
+    for listing in Listing.objects.only('pk', 'location').iterator(chunk_size=2000):
+        coordinates = geocode(places, listing.location)
+        if coordinates is None:
+            continue
+        listing.latitude, listing.longitude = coordinates
+        listing.geohash = encode_geohash(*coordinates)
+        batch.append(listing)
+        if len(batch) >= 2000:
+            Listing.objects.bulk_update(batch, ['latitude', 'longitude', 'geohash'])
+            batch = []
+    Listing.objects.bulk_update(batch, ['latitude', 'longitude', 'geohash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0014_listing_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='listing',
+            name='geohash',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=12),
+        ),
+        migrations.AddField(
+            model_name='listing',
+            name='latitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='listing',
+            name='longitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='listing',
+            index=models.Index(fields=['latitude', 'longitude'], name='listings_li_latitud_6dd1bf_idx'),
+        ),
+        migrations.RunPython(geocode_listings, migrations.RunPython.noop),
+    ]
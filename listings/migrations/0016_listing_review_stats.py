@@ -0,0 +1,50 @@
+# Generated by Django 5.2.4 on 2026-10-17 01:06
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def backfill_review_stats(apps, schema_editor):
+    Listing = apps.get_model('listings', 'Listing')
+    Review = apps.get_model('listings', 'Review')
+    batch = []
+    stats = Review.objects.order_by().values('listing_id').annotate(count=Count('pk'), total=Sum('rating'))
+    for row in stats.iterator(chunk_size=2000):
+        batch.append(Listing(
+            pk=row['listing_id'], review_count=row['count'], rating_total=row['total'],
+            avg_rating=row['total'] / row['count'],
+        ))
+        if len(batch) >= 2000:
+            Listing.objects.bulk_update(batch, ['review_count', 'rating_total', 'avg_rating'])
+            batch = []
+    Listing.objects.bulk_update(batch, ['review_count', 'rating_total', 'avg_rating'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0015_listing_coordinates'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='listing',
+            name='avg_rating',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='listing',
+            name='rating_total',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='listing',
+            name='review_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='listing',
+            index=models.Index(fields=['avg_rating', 'listing_id'], name='listings_li_avg_rat_4e607e_idx'),
+        ),
+        migrations.RunPython(backfill_review_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.4 on 2026-10-17 01:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0016_listing_review_stats'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['listing_id', '-created_at', '-review_id'], name='listings_re_listing_69c4d6_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['user_id', '-created_at'], name='listings_re_user_id_2e4cc3_idx'),
+        ),
+    ]
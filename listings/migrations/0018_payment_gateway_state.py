@@ -0,0 +1,23 @@
+# Generated by Django 5.2.4 on 2026-10-17 01:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0017_review_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payment',
+            name='gateway_error',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='payment',
+            name='gateway_state',
+            field=models.CharField(choices=[('idle', 'Idle'), ('initializing', 'Initializing'), ('verifying', 'Verifying'), ('error', 'Error')], default='idle', max_length=20),
+        ),
+    ]
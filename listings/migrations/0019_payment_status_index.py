@@ -0,0 +1,17 @@
+# Generated by Django 5.2.4 on 2026-10-17 01:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0018_payment_gateway_state'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['status', 'payment_id'], name='listings_pa_status_e19589_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.4 on 2026-10-17 01:36
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0019_payment_status_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PaymentWebhookEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tx_ref', models.CharField(max_length=100)),
+                ('event_id', models.CharField(max_length=255)),
+                ('payload', models.JSONField()),
+                ('received_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+                ('outcome', models.CharField(blank=True, choices=[('applied', 'Applied'), ('ignored', 'Ignored'), ('unknown_payment', 'Unknown payment')], max_length=20)),
+            ],
+            options={
+                'ordering': ['id'],
+                'indexes': [models.Index(condition=models.Q(('processed_at__isnull', True)), fields=['id'], name='payment_webhook_unprocessed')],
+                'constraints': [models.UniqueConstraint(fields=('tx_ref', 'event_id'), name='unique_payment_webhook_event')],
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.4 on 2026-10-17 01:37
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0020_payment_webhook_event'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PaymentGatewayEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('initialize', 'Initialize'), ('verification', 'Verification'), ('webhook', 'Webhook')], max_length=20)),
+                ('payload', models.JSONField()),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('payment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='gateway_events', to='listings.payment')),
+            ],
+            options={
+                'ordering': ['id'],
+            },
+        ),
+    ]
@@ -0,0 +1,83 @@
+# Generated by Django 5.2.4 on 2026-10-17 01:37
+
+from django.db import migrations, transaction
+
+
+CHUNK_SIZE = 1000
+# Keys the old code nested into chapa_response after initialization
+NESTED_KINDS = ('verification', 'webhook')
+
+
+def payment_chunks(Payment, fields):
+    last_pk = None
+    while True:
+        rows = Payment.objects.order_by('pk')
+        if last_pk is not None:
+            rows = rows.filter(pk__gt=last_pk)
+        rows = list(rows.values_list('pk', *fields)[:CHUNK_SIZE])
+        if not rows:
+            return
+        yield rows
+        last_pk = rows[-1][0]
+
+
+def split_chapa_response(apps, schema_editor):
+    Payment = apps.get_model('listings', 'Payment')
+    PaymentGatewayEvent = apps.get_model('listings', 'PaymentGatewayEvent')
+
+    for rows in payment_chunks(Payment, ['chapa_response', 'created_at', 'updated_at']):
+        # Payments already split by an interrupted earlier run
+        done = set(
+            PaymentGatewayEvent.objects.filter(payment_id__in=[row[0] for row in rows])
+            .values_list('payment_id', flat=True).distinct()
+        )
+        events = []
+        for pk, response, created_at, updated_at in rows:
+            if pk in done or not response:
+                continue
+            if not isinstance(response, dict):
+                events.append(PaymentGatewayEvent(payment_id=pk, kind='initialize', payload=response, created_at=created_at))
+                continue
+            response = dict(response)
+            nested = [(kind, response.pop(kind)) for kind in NESTED_KINDS if kind in response]
+            if response:
+                events.append(PaymentGatewayEvent(payment_id=pk, kind='initialize', payload=response, created_at=created_at))
+            events.extend(
+                PaymentGatewayEvent(payment_id=pk, kind=kind, payload=payload, created_at=updated_at)
+                for kind, payload in nested
+            )
+        with transaction.atomic():
+            PaymentGatewayEvent.objects.bulk_create(events)
+
+
+def merge_chapa_response(apps, schema_editor):
+    Payment = apps.get_model('listings', 'Payment')
+    PaymentGatewayEvent = apps.get_model('listings', 'PaymentGatewayEvent')
+
+    for rows in payment_chunks(Payment, []):
+        responses = {}
+        events = PaymentGatewayEvent.objects.filter(payment_id__in=[row[0] for row in rows]).order_by('id')
+        for pk, kind, payload in events.values_list('payment_id', 'kind', 'payload'):
+            response = responses.setdefault(pk, {})
+            if kind == 'initialize' and isinstance(payload, dict):
+                response.update(payload)
+            else:
+                response[kind] = payload
+        with transaction.atomic():
+            Payment.objects.bulk_update(
+                [Payment(pk=pk, chapa_response=response) for pk, response in responses.items()], ['chapa_response']
+            )
+
+
+class Migration(migrations.Migration):
+    # Each chunk commits on its own, so a large table is never locked for
+    # the whole copy; an interrupted run resumes where it stopped
+    atomic = False
+
+    dependencies = [
+        ('listings', '0021_payment_gateway_event'),
+    ]
+
+    operations = [
+        migrations.RunPython(split_chapa_response, merge_chapa_response),
+    ]
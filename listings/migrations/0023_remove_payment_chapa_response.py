@@ -0,0 +1,17 @@
+# Generated by Django 5.2.4 on 2026-10-17 01:37
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0022_split_chapa_response'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='payment',
+            name='chapa_response',
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-17 01:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0023_remove_payment_chapa_response'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='requestlog',
+            name='restored',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,84 @@
+# Generated by Django 5.2.4 on 2026-10-17 01:54
+
+from django.db import migrations, models
+
+
+FTS_TABLE = 'listings_listing_fts'
+CHUNK_SIZE = 2000
+
+
+def fts_index_exists(schema_editor):
+    connection = schema_editor.connection
+    return connection.vendor == 'sqlite' and FTS_TABLE in connection.introspection.table_names()
+
+
+def listing_chunks(Listing):
+    rows = Listing.objects.order_by('pk').values_list('listing_id', 'title', 'description', 'location')
+    last_pk = None
+    while True:
+        chunk = list((rows if last_pk is None else rows.filter(pk__gt=last_pk))[:CHUNK_SIZE])
+        if not chunk:
+            return
+        yield chunk
+        last_pk = chunk[-1][0]
+
+
+def refill_fts_index(schema_editor, chunks):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE}")
+        for rows in chunks:
+            cursor.executemany(
+                f"INSERT INTO {FTS_TABLE} (rowid, listing_id, title, description, location) VALUES (%s, %s, %s, %s, %s)",
+                rows,
+            )
+
+
+def key_fts_by_document(apps, schema_editor):
+    """
+    Re-key the FTS5 index from truncated UUIDs to ListingSearchDocument ids.
+    """
+    if not fts_index_exists(schema_editor):
+        return
+    Listing = apps.get_model('listings', 'Listing')
+    ListingSearchDocument = apps.get_model('listings', 'ListingSearchDocument')
+
+    def chunks():
+        for chunk in listing_chunks(Listing):
+            ListingSearchDocument.objects.bulk_create(
+                [ListingSearchDocument(listing_id=row[0]) for row in chunk], ignore_conflicts=True
+            )
+            rowids = dict(
+                ListingSearchDocument.objects.filter(listing_id__in=[row[0] for row in chunk])
+                .values_list('listing_id', 'id')
+            )
+            yield [(rowids[pk], pk.hex, title, description, location) for pk, title, description, location in chunk]
+
+    refill_fts_index(schema_editor, chunks())
+
+
+def key_fts_by_uuid(apps, schema_editor):
+    if not fts_index_exists(schema_editor):
+        return
+    Listing = apps.get_model('listings', 'Listing')
+    refill_fts_index(schema_editor, (
+        [(int(pk.hex[:15], 16), pk.hex, title, description, location) for pk, title, description, location in chunk]
+        for chunk in listing_chunks(Listing)
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0024_requestlog_restored'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ListingSearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('listing_id', models.UUIDField(unique=True)),
+            ],
+        ),
+        migrations.RunPython(key_fts_by_document, key_fts_by_uuid),
+    ]
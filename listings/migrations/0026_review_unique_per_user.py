@@ -0,0 +1,55 @@
+# Generated by Django 5.2.4 on 2026-10-17 02:00
+
+from django.db import migrations, models
+from django.db.models.functions import Cast, Coalesce
+
+
+def drop_repeat_reviews(apps, schema_editor):
+    """
+    Keep only each user's newest review of a listing, then recompute the
+    review aggregates of the listings that lost reviews.
+    """
+    Listing = apps.get_model('listings', 'Listing')
+    Review = apps.get_model('listings', 'Review')
+
+    repeated = (
+        Review.objects.order_by().values('user_id', 'listing_id')
+        .annotate(reviews=models.Count('pk')).filter(reviews__gt=1)
+    )
+    listings = set()
+    for pair in repeated.iterator():
+        reviews = Review.objects.filter(user_id=pair['user_id'], listing_id=pair['listing_id'])
+        newest = reviews.order_by('-created_at', '-review_id').values_list('pk', flat=True)[0]
+        reviews.exclude(pk=newest).delete()
+        listings.add(pair['listing_id'])
+    if not listings:
+        return
+
+    reviews = Review.objects.filter(listing_id=models.OuterRef('pk')).order_by().values('listing_id')
+    Listing.objects.filter(pk__in=listings).update(
+        review_count=Coalesce(models.Subquery(reviews.annotate(count=models.Count('pk')).values('count')), 0),
+        rating_total=Coalesce(models.Subquery(reviews.annotate(total=models.Sum('rating')).values('total')), 0),
+        avg_rating=Coalesce(
+            Cast(models.Subquery(reviews.annotate(average=models.Avg('rating')).values('average')), models.FloatField()),
+            models.Value(0.0),
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0025_listing_search_document'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='review',
+            unique_together=set(),
+        ),
+        migrations.RunPython(drop_repeat_reviews, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='review',
+            constraint=models.UniqueConstraint(fields=('user_id', 'listing_id'), name='unique_review_per_user'),
+        ),
+    ]
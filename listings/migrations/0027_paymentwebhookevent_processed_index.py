@@ -0,0 +1,17 @@
+# Generated by Django 5.2.4 on 2026-10-17 02:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0026_review_unique_per_user'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='paymentwebhookevent',
+            index=models.Index(fields=['processed_at'], name='payment_webhook_processed'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.4 on 2026-10-17 02:12
+
+from django.db import migrations, models
+
+
+def count_search_stats(apps, schema_editor):
+    ListingSearchStats = apps.get_model('listings', 'ListingSearchStats')
+    ListingSearchTerm = apps.get_model('listings', 'ListingSearchTerm')
+    stats = ListingSearchTerm.objects.aggregate(
+        documents=models.Count('listing_id', distinct=True), total_length=models.Sum('frequency')
+    )
+    ListingSearchStats.objects.create(pk=1, documents=stats['documents'], total_length=stats['total_length'] or 0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0027_paymentwebhookevent_processed_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ListingSearchStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('documents', models.PositiveIntegerField(default=0)),
+                ('total_length', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(count_search_stats, migrations.RunPython.noop),
+    ]
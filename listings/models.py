@@ -1,10 +1,84 @@
-from django.db import models
+from collections import Counter
+from django.db import connection, models
+from django.db.models.functions import Cast, Coalesce
+from django.utils import timezone
 import uuid
 from django.contrib.auth.models import AbstractUser
 from decimal import Decimal
 
+from .cache import listing_cache
+from .geo import geocode_listing
+
 # User = get_user_model()
 
+class ListingQuerySet(models.QuerySet):
+    def available(self, check_in, check_out):
+        """
+        Listings with no booking overlapping the ``[check_in, check_out)`` stay.
+
+        Runs as a single ``NOT EXISTS`` anti-join that probes the
+        ``(listing_id, start_date, end_date)`` booking index per listing.
+        """
+        overlapping = Booking.objects.filter(listing_id=models.OuterRef('pk')).overlapping(check_in, check_out)
+        return self.filter(~models.Exists(overlapping))
+
+    def add_review_stats(self, deltas):
+        """
+        Apply ``{listing_pk: (count_delta, rating_delta)}`` to the materialized
+        review aggregates, one atomic ``UPDATE`` per listing.
+
+        The new average is computed in SQL from the pre-update columns, so
+        concurrent review writes cannot lose each other's increments.
+        """
+        for pk, (count, total) in deltas.items():
+            if not count and not total:
+                continue
+            self.filter(pk=pk).update(
+                review_count=models.F('review_count') + count,
+                rating_total=models.F('rating_total') + total,
+                updated_at=timezone.now(),
+                avg_rating=models.Case(
+                    models.When(
+                        review_count__gt=-count,
+                        then=Cast(models.F('rating_total') + total, models.FloatField())
+                        / (models.F('review_count') + count),
+                    ),
+                    default=models.Value(0.0),
+                    output_field=models.FloatField(),
+                ),
+            )
+        listing_cache.invalidate(deltas)
+
+    def refresh_review_stats(self):
+        """
+        Recompute the review aggregates of these listings from the Review
+        table in one ``UPDATE``. Used where many reviews go at once, so the
+        cost is one statement rather than one per review.
+        """
+        pks = list(self.values_list('pk', flat=True))
+        if not pks:
+            return
+        reviews = Review.objects.filter(listing_id=models.OuterRef('pk')).order_by().values('listing_id')
+        count = models.Subquery(reviews.annotate(count=models.Count('pk')).values('count'))
+        total = models.Subquery(reviews.annotate(total=models.Sum('rating')).values('total'))
+        average = models.Subquery(reviews.annotate(average=models.Avg('rating')).values('average'))
+        Listing.objects.filter(pk__in=pks).update(
+            review_count=Coalesce(count, 0),
+            rating_total=Coalesce(total, 0),
+            avg_rating=Coalesce(Cast(average, models.FloatField()), models.Value(0.0)),
+            updated_at=timezone.now(),
+        )
+        listing_cache.invalidate(pks)
+
+
+class BookingQuerySet(models.QuerySet):
+    def overlapping(self, start_date, end_date):
+        """
+        Bookings sharing at least one night with ``[start_date, end_date)``.
+        """
+        return self.filter(start_date__lt=end_date, end_date__gt=start_date)
+
+
 class User(AbstractUser):
     user_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     email = models.EmailField(unique=True)
@@ -42,11 +116,53 @@ class Listing(models.Model):
     num_bathrooms = models.PositiveIntegerField(default=1)
     type = models.CharField(max_length=50, choices=TYPE_CHOICES, default='Studio')
     amenities = models.JSONField(default=list, blank=True, null=True)
+    review_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_total = models.PositiveIntegerField(default=0, editable=False)
+    avg_rating = models.FloatField(default=0, editable=False)
+    latitude = models.FloatField(blank=True, null=True)
+    longitude = models.FloatField(blank=True, null=True)
+    geohash = models.CharField(max_length=12, blank=True, default='', db_index=True)
     created_at = models.DateTimeField(auto_now_add=True, db_index=True)
     updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    objects = ListingQuerySet.as_manager()
+
+    GEO_FIELDS = {'location', 'latitude', 'longitude'}
+    REVIEW_STAT_FIELDS = {'review_count', 'rating_total', 'avg_rating'}
     
     def __str__(self):
       return f"{self.title} with ${self.price} at {self.location}"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+      instance = super().from_db(db, field_names, values)
+      if cls.GEO_FIELDS <= set(instance.__dict__):
+        instance._loaded_geo = (instance.location, instance.latitude, instance.longitude)
+      return instance
+
+    def save(self, *args, **kwargs):
+      """
+      Geocode from the gazetteer before writing. Coordinates loaded with the
+      row are dropped when only the location changed, so they follow it.
+      """
+      update_fields = kwargs.get('update_fields')
+      if update_fields is None or self.GEO_FIELDS & set(update_fields):
+        loaded = getattr(self, '_loaded_geo', None)
+        if loaded and loaded[0] != self.location and loaded[1:] == (self.latitude, self.longitude):
+          self.latitude = self.longitude = None
+        geocode_listing(self)
+        if update_fields is not None:
+          kwargs['update_fields'] = set(update_fields) | self.GEO_FIELDS | {'geohash'}
+
+      # Review aggregates are only written by ``add_review_stats`` increments,
+      # never from a possibly stale in-memory copy.
+      if update_fields is None and not self._state.adding and not kwargs.get('force_insert'):
+        kwargs['update_fields'] = [
+          field.name for field in self._meta.concrete_fields
+          if not field.primary_key and field.name not in self.REVIEW_STAT_FIELDS
+        ]
+      super().save(*args, **kwargs)
+      self._loaded_geo = (self.location, self.latitude, self.longitude)
     
     class Meta:
       verbose_name_plural= 'Listings'
@@ -54,10 +170,99 @@ class Listing(models.Model):
       unique_together = ['title', 'location']
       indexes = [
                 models.Index(fields=['user_id', '-created_at']),
-                models.Index(fields=['user_id', 'listing_id'])
+                models.Index(fields=['user_id', 'listing_id']),
+                models.Index(fields=['type', 'price']),
+                models.Index(fields=['price']),
+                models.Index(fields=['num_bedrooms']),
+                models.Index(fields=['location']),
+                models.Index(fields=['latitude', 'longitude']),
+                models.Index(fields=['avg_rating', 'listing_id']),
                 ]
 
 
+class ListingAmenityQuerySet(models.QuerySet):
+    def sync(self, listings):
+        """
+        Rebuild the amenity rows for ``listings`` from their ``amenities`` JSON.
+
+        ``bulk_create`` skips model signals, so bulk write paths call this
+        directly. Listings that were never inserted, such as conflicts
+        dropped by ``ignore_conflicts``, are skipped.
+        """
+        listings = {listing.pk: listing for listing in listings}
+        existing = set(Listing.objects.filter(pk__in=listings).values_list('pk', flat=True))
+        self.filter(listing_id__in=existing).delete()
+        return self.bulk_create([
+            self.model(listing_id_id=pk, name=str(name)[:100])
+            for pk in existing
+            for name in set(listings[pk].amenities or [])
+        ], ignore_conflicts=True)
+
+
+class ListingAmenity(models.Model):
+    """
+    One row per amenity on a listing, a normalized copy of ``Listing.amenities``
+    that amenity filters and facets can read through an index.
+    """
+    listing_id = models.ForeignKey(Listing, on_delete=models.CASCADE, related_name='amenity_index')
+    name = models.CharField(max_length=100)
+
+    objects = ListingAmenityQuerySet.as_manager()
+
+    def __str__(self):
+      return f"{self.name} at {self.listing_id_id}"
+
+    class Meta:
+      verbose_name_plural = 'Listing amenities'
+      constraints = [
+        models.UniqueConstraint(fields=['name', 'listing_id'], name='unique_listing_amenity'),
+      ]
+
+
+class ListingSearchTerm(models.Model):
+    """
+    Posting in the portable listing search index: how often ``term`` occurs in
+    a listing (weighted by field) and the listing's total weighted length.
+    """
+    listing_id = models.ForeignKey(Listing, on_delete=models.CASCADE, related_name='search_terms')
+    term = models.CharField(max_length=64)
+    frequency = models.PositiveIntegerField()
+    length = models.PositiveIntegerField()
+
+    def __str__(self):
+      return f"{self.term} x{self.frequency} in {self.listing_id_id}"
+
+    class Meta:
+      constraints = [
+        models.UniqueConstraint(fields=['term', 'listing_id'], name='unique_listing_search_term'),
+      ]
+
+
+class ListingSearchStats(models.Model):
+    """
+    Corpus statistics of the portable search index, kept in step with
+    ``ListingSearchTerm`` so BM25 scoring reads one row instead of scanning
+    every posting. There is a single row, with ``pk=1``.
+    """
+    documents = models.PositiveIntegerField(default=0)
+    total_length = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+      return f"{self.documents} indexed listings, total length {self.total_length}"
+
+
+class ListingSearchDocument(models.Model):
+    """
+    Integer rowid of a listing in the SQLite FTS5 index, which cannot key on
+    the listing's UUID. ``listing_id`` is a plain column rather than a foreign
+    key so the mapping survives until the listing's index row is removed.
+    """
+    listing_id = models.UUIDField(unique=True)
+
+    def __str__(self):
+      return f"FTS rowid {self.pk} for {self.listing_id}"
+
+
 class Booking(models.Model):
     booking_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     listing_id = models.ForeignKey(Listing, on_delete=models.CASCADE, related_name='bookings')
@@ -66,6 +271,8 @@ class Booking(models.Model):
     start_date = models.DateField(db_index=True)
     end_date = models.DateField(db_index=True)
     created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    objects = BookingQuerySet.as_manager()
     
     def __str__(self):
       return f"Booking for {self.user_id.username} beginning from {self.start_date} and ending on {self.end_date}"
@@ -74,7 +281,39 @@ class Booking(models.Model):
       ordering = ['start_date', 'end_date', '-created_at']
       verbose_name_plural = 'Bookings'
       unique_together = ['booking_id', 'listing_id']
-      # indexes = [models.Index(fields=['-created_at', 'start_date', 'end_date'])]
+      indexes = [models.Index(fields=['listing_id', 'start_date', 'end_date'])]
+
+
+class ReviewQuerySet(models.QuerySet):
+    def stat_deltas(self, reviews, sign=1):
+        """
+        ``{listing_pk: (count_delta, rating_delta)}`` for adding (``sign=1``)
+        or removing (``sign=-1``) ``reviews``.
+        """
+        deltas = {}
+        for review in reviews:
+            count, total = deltas.get(review.listing_id_id, (0, 0))
+            deltas[review.listing_id_id] = (count + sign, total + sign * review.rating)
+        return deltas
+
+    def record_created(self, reviews):
+        """
+        Fold bulk-created ``reviews`` into their listings' aggregates.
+        ``bulk_create`` skips model signals, so bulk write paths call this
+        directly. Reviews dropped by ``ignore_conflicts`` are skipped.
+        """
+        reviews = list(reviews)
+        existing = set(self.filter(pk__in=[review.pk for review in reviews]).values_list('pk', flat=True))
+        Listing.objects.add_review_stats(self.stat_deltas(review for review in reviews if review.pk in existing))
+
+    def delete(self):
+        """
+        Delete the reviews, then recompute each affected listing once.
+        """
+        listings = set(self.order_by().values_list('listing_id', flat=True))
+        deleted = super().delete()
+        Listing.objects.filter(pk__in=listings).refresh_review_stats()
+        return deleted
 
 
 class Review(models.Model):
@@ -84,15 +323,38 @@ class Review(models.Model):
     rating = models.PositiveIntegerField()
     comment = models.TextField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = ReviewQuerySet.as_manager()
     
     def __str__(self):
       return f"{self.user_id.username} left {self.rating} rating and comment: {self.comment}"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+      instance = super().from_db(db, field_names, values)
+      if {'listing_id_id', 'rating'} <= set(instance.__dict__):
+        instance._loaded_stats = (instance.listing_id_id, instance.rating)
+      return instance
+
+    def delete(self, *args, **kwargs):
+      # Reviews removed by a cascade skip this: a deleted listing needs no
+      # stats, and a deleted user's listings are refreshed by a signal
+      loaded = getattr(self, '_loaded_stats', None)
+      deleted = super().delete(*args, **kwargs)
+      listing, rating = loaded or (self.listing_id_id, self.rating)
+      Listing.objects.add_review_stats({listing: (-1, -rating)})
+      return deleted
     
     class Meta:
       ordering = ['-created_at', 'rating']
       verbose_name_plural = 'Ratings'
-      unique_together = ['user_id', 'listing_id', 'review_id']
-      # indexes = models.Index(fields=['user', '-created_at'])
+      constraints = [
+        models.UniqueConstraint(fields=['user_id', 'listing_id'], name='unique_review_per_user'),
+      ]
+      indexes = [
+        models.Index(fields=['listing_id', '-created_at', '-review_id']),
+        models.Index(fields=['user_id', '-created_at']),
+      ]
       
       
 class Payment(models.Model):
@@ -104,6 +366,15 @@ class Payment(models.Model):
         ('cancelled', 'Cancelled'),
     ]
 
+    # Progress of the last Chapa call made for this payment, for clients
+    # polling the status action while it runs off the request thread
+    GATEWAY_STATE_CHOICES = [
+        ('idle', 'Idle'),
+        ('initializing', 'Initializing'),
+        ('verifying', 'Verifying'),
+        ('error', 'Error'),
+    ]
+
     payment_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     booking_id = models.OneToOneField(Booking, on_delete=models.CASCADE, related_name='payment')
     user_id = models.ForeignKey(User, on_delete=models.CASCADE, related_name='payments')
@@ -116,8 +387,9 @@ class Payment(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     completed_at = models.DateTimeField(null=True, blank=True)
-    chapa_response = models.JSONField(default=dict, blank=True)
     currency = models.CharField(max_length=3, default='ETB')
+    gateway_state = models.CharField(max_length=20, choices=GATEWAY_STATE_CHOICES, default='idle')
+    gateway_error = models.CharField(max_length=255, blank=True, default='')
 
     
     def __str__(self):
@@ -127,25 +399,180 @@ class Payment(models.Model):
       ordering = ['-created_at']
       verbose_name_plural = 'Payments'
       unique_together = ['payment_id', 'booking_id']
+      indexes = [
+        # Keyset scan of pending payments by the reconciliation job
+        models.Index(fields=['status', 'payment_id']),
+      ]
       
       
     def save(self, *args, **kwargs):
         if not self.chapa_tx_ref:
             self.chapa_tx_ref = f"booking_{self.booking_id.booking_id}_{uuid.uuid4().hex[:8]}"
         super().save(*args, **kwargs)
-        
+
+
+class PaymentGatewayEvent(models.Model):
+    """
+    Append-only log of the Chapa responses and webhook payloads for a
+    payment. Kept out of ``Payment`` so payment rows stay narrow; read
+    through ``payment.gateway_events`` only when the raw payloads are
+    needed.
+    """
+
+    KIND_CHOICES = [
+        ('initialize', 'Initialize'),
+        ('verification', 'Verification'),
+        ('webhook', 'Webhook'),
+    ]
+
+    payment = models.ForeignKey(Payment, on_delete=models.CASCADE, related_name='gateway_events')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    payload = models.JSONField()
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['id']
+
+    def __str__(self):
+        return f"{self.get_kind_display()} event for payment {self.payment_id}"
+
+
+class PaymentWebhookEvent(models.Model):
+    """
+    Append-only inbox of raw Chapa webhook deliveries. A redelivered event
+    hits the ``(tx_ref, event_id)`` constraint and is dropped on insert.
+    Events are applied to their payments later, in batches, and only
+    ``processed_at``/``outcome`` are ever written after the insert.
+    """
+
+    OUTCOME_CHOICES = [
+        ('applied', 'Applied'),
+        ('ignored', 'Ignored'),
+        ('unknown_payment', 'Unknown payment'),
+    ]
+
+    tx_ref = models.CharField(max_length=100)
+    event_id = models.CharField(max_length=255)
+    payload = models.JSONField()
+    received_at = models.DateTimeField(default=timezone.now)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    outcome = models.CharField(max_length=20, choices=OUTCOME_CHOICES, blank=True)
+
+    class Meta:
+        ordering = ['id']
+        constraints = [
+            models.UniqueConstraint(fields=['tx_ref', 'event_id'], name='unique_payment_webhook_event'),
+        ]
+        indexes = [
+            # Only the unprocessed tail is scanned by the apply task
+            models.Index(fields=['id'], condition=models.Q(processed_at__isnull=True), name='payment_webhook_unprocessed'),
+            # ...and processed events are pruned oldest first
+            models.Index(fields=['processed_at'], name='payment_webhook_processed'),
+        ]
+
+    def __str__(self):
+        return f"Webhook {self.event_id} for {self.tx_ref}"
+
+# Exact request paths that count towards RequestCounter.sensitive_count
+SENSITIVE_PATHS = ['/admin/', '/login/', '/api/']
+
+
+class RequestCounterQuerySet(models.QuerySet):
+    def record(self, logs):
+        """
+        Add a batch of ``RequestLog`` rows to their per-IP, per-minute buckets.
+
+        Counts are summed in Python first, then written with one native
+        upsert that increments existing buckets in place. Concurrent flushes
+        from several workers therefore never overwrite each other.
+        """
+        buckets = Counter()
+        sensitive = Counter()
+        for log in logs:
+            key = (log.ip_address, log.timestamp.replace(second=0, microsecond=0))
+            buckets[key] += 1
+            if log.path in SENSITIVE_PATHS:
+                sensitive[key] += 1
+        if not buckets:
+            return 0
+
+        ip_field = self.model._meta.get_field('ip_address')
+        minute_field = self.model._meta.get_field('minute')
+        params = [
+            (
+                ip_field.get_db_prep_save(ip_address, connection),
+                minute_field.get_db_prep_save(minute, connection),
+                count,
+                sensitive[(ip_address, minute)],
+            )
+            for (ip_address, minute), count in buckets.items()
+        ]
+
+        qn = connection.ops.quote_name
+        table = qn(self.model._meta.db_table)
+        insert = (
+            f"INSERT INTO {table} ({qn('ip_address')}, {qn('minute')}, {qn('request_count')}, {qn('sensitive_count')}) "
+            "VALUES (%s, %s, %s, %s) "
+        )
+        if connection.vendor == 'mysql':
+            upsert = (
+                f"ON DUPLICATE KEY UPDATE {qn('request_count')} = {qn('request_count')} + VALUES({qn('request_count')}), "
+                f"{qn('sensitive_count')} = {qn('sensitive_count')} + VALUES({qn('sensitive_count')})"
+            )
+        else:
+            upsert = (
+                f"ON CONFLICT ({qn('ip_address')}, {qn('minute')}) DO UPDATE SET "
+                f"{qn('request_count')} = {table}.{qn('request_count')} + excluded.{qn('request_count')}, "
+                f"{qn('sensitive_count')} = {table}.{qn('sensitive_count')} + excluded.{qn('sensitive_count')}"
+            )
+
+        with connection.cursor() as cursor:
+            cursor.executemany(insert + upsert, params)
+        return len(params)
+
+
+class RequestCounter(models.Model):
+    """
+    Rolling per-IP request counts bucketed by minute. They are kept up to
+    date as request logs are flushed, so detection never rescans RequestLog.
+    """
+    ip_address = models.GenericIPAddressField()
+    minute = models.DateTimeField(db_index=True)
+    request_count = models.PositiveIntegerField(default=0)
+    sensitive_count = models.PositiveIntegerField(default=0)
+
+    objects = RequestCounterQuerySet.as_manager()
+
+    class Meta:
+        ordering = ['-minute']
+        verbose_name = "Request Counter"
+        verbose_name_plural = "Request Counters"
+        constraints = [
+            models.UniqueConstraint(fields=['ip_address', 'minute'], name='unique_request_counter_bucket'),
+        ]
+
+    def __str__(self):
+        return f"[{self.minute.strftime('%Y-%m-%d %H:%M')}] - {self.ip_address}: {self.request_count} requests"
+
+
 class RequestLog(models.Model):
     ip_address = models.GenericIPAddressField()
-    timestamp = models.DateTimeField(auto_now_add=True, db_index=True)
+    timestamp = models.DateTimeField(default=timezone.now, db_index=True)
     path = models.TextField(max_length=255, db_index=True)
     is_routable = models.BooleanField(default=False)
     country = models.CharField(max_length=100, blank=True)
     city = models.CharField(max_length=100, blank=True)
+    # Re-imported from an archive; the retention task deletes it without
+    # archiving it again
+    restored = models.BooleanField(default=False)
 
     class Meta:
         ordering = ['-timestamp']
         verbose_name = "Request Log"
         verbose_name_plural = "Request Logs"
+        indexes = [
+            models.Index(fields=['ip_address', 'timestamp']),
+        ]
 
     def __str__(self):
         return f"[{self.timestamp.strftime('%Y-%m-%d %H:%M:%S')}] - {self.ip_address}: {self.path}"
@@ -153,16 +580,33 @@ class RequestLog(models.Model):
       
       
 class BlockedIP(models.Model):
-    ip_address = models.GenericIPAddressField(unique=True)
+    """
+    A blocked address or network. Single hosts use a full-length prefix
+    (32 for IPv4, 128 for IPv6), and ``ip_address`` holds the network address.
+    """
+    ip_address = models.GenericIPAddressField()
+    prefix_length = models.PositiveSmallIntegerField()
     blocked_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         ordering = ['-blocked_at']
         verbose_name = "Blocked IP"
         verbose_name_plural = "Blocked IPs"
+        constraints = [
+            models.UniqueConstraint(fields=['ip_address', 'prefix_length'], name='unique_blocked_network'),
+        ]
 
     def __str__(self):
-        return f"{self.ip_address} blocked at {self.blocked_at.strftime('%Y-%m-%d %H:%M:%S')}"
+        return f"{self.network} blocked at {self.blocked_at.strftime('%Y-%m-%d %H:%M:%S')}"
+
+    @property
+    def network(self):
+        return f"{self.ip_address}/{self.prefix_length}"
+
+    def save(self, *args, **kwargs):
+        if self.prefix_length is None:
+            self.prefix_length = 128 if ':' in str(self.ip_address) else 32
+        super().save(*args, **kwargs)
 
 class SuspiciousIP(models.Model):
     ip_address = models.GenericIPAddressField(unique=True)
@@ -0,0 +1,199 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetCursorPagination(CursorPagination):
+  """
+  Cursor pagination keyed on a ``(field, primary key)`` pair.
+
+  DRF's ``CursorPagination`` only keys on the first ordering field and falls
+  back to an OFFSET for rows that share it. Here the primary key breaks ties,
+  so every page is a single ``WHERE (field, pk) > (a, b) ... LIMIT n`` probe
+  on the ``field`` index, no matter how deep the client has paged. A ``-``
+  prefix on ``field`` pages in descending order of both keys.
+  """
+
+  ordering = None
+  page_size = 20
+  page_size_query_param = 'page_size'
+  max_page_size = 100
+
+  def paginate_queryset(self, queryset, request, view=None):
+    self.request = request
+    self.page_size = self.get_page_size(request)
+    if not self.page_size:
+      return None
+
+    self.base_url = request.build_absolute_uri()
+    field, pk = self.ordering # type: ignore
+    descending = field.startswith('-')
+    field = field.lstrip('-')
+    reverse, position = self.decode_cursor(request)
+    if position is not None:
+      position = self.cursor_values(queryset.model, (field, pk), position)
+
+    if reverse != descending:
+      queryset = queryset.order_by(f'-{field}', f'-{pk}')
+    else:
+      queryset = queryset.order_by(field, pk)
+
+    if position is not None:
+      value, key = position
+      lookup = 'lt' if reverse != descending else 'gt'
+      queryset = queryset.filter(**{f'{field}__{lookup}': value}) | queryset.filter(
+        **{field: value, f'{pk}__{lookup}': key}
+      )
+
+    results = list(queryset[:self.page_size + 1])
+    has_following = len(results) > self.page_size
+    self.page = results[:self.page_size]
+
+    if reverse:
+      self.page.reverse()
+      self.has_next = position is not None
+      self.has_previous = has_following
+    else:
+      self.has_next = has_following
+      self.has_previous = position is not None
+
+    return self.page
+
+  def decode_cursor(self, request): # type: ignore
+    encoded = request.query_params.get(self.cursor_query_param)
+    if encoded is None:
+      return False, None
+
+    try:
+      reverse, value, key = json.loads(urlsafe_b64decode(encoded.encode('ascii')))
+    except (TypeError, ValueError):
+      raise NotFound(self.invalid_cursor_message)
+
+    return bool(reverse), (value, key)
+
+  def cursor_values(self, model, fields, values):
+    """
+    Convert decoded cursor ``values`` with each ordering field's
+    ``to_python()``, so a tampered cursor is a 404 rather than an error from
+    the database lookup.
+    """
+    converted = []
+    for name, value in zip(fields, values):
+      try:
+        field = model._meta.get_field(name)
+      except FieldDoesNotExist:
+        converted.append(value)
+        continue
+      if value is None and field.null:
+        converted.append(None)
+        continue
+      if not isinstance(value, (str, int, float)):
+        raise NotFound(self.invalid_cursor_message)
+      try:
+        converted.append(field.to_python(value))
+      except (ValidationError, TypeError, ValueError):
+        raise NotFound(self.invalid_cursor_message)
+    return tuple(converted)
+
+  def encode_cursor(self, reverse, instance): # type: ignore
+    field, pk = self.ordering # type: ignore
+    value = getattr(instance, field.lstrip('-'))
+    if hasattr(value, 'isoformat'):
+      value = value.isoformat()
+    token = json.dumps([int(reverse), value, str(getattr(instance, pk))])
+    encoded = urlsafe_b64encode(token.encode('ascii')).decode('ascii')
+    return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+  def get_next_link(self):
+    if not self.has_next:
+      return None
+    return self.encode_cursor(False, self.page[-1])
+
+  def get_previous_link(self):
+    if not self.has_previous:
+      return None
+    if not self.page:
+      return remove_query_param(self.base_url, self.cursor_query_param)
+    return self.encode_cursor(True, self.page[0])
+
+  def get_paginated_response(self, data):
+    return Response({
+      'next': self.get_next_link(),
+      'previous': self.get_previous_link(),
+      'results': data,
+    })
+
+
+class ListingCursorPagination(KeysetCursorPagination):
+  ordering = ('created_at', 'listing_id')
+
+
+class ListingRatingCursorPagination(KeysetCursorPagination):
+  ordering = ('-avg_rating', 'listing_id')
+
+
+class ReviewCursorPagination(KeysetCursorPagination):
+  ordering = ('-created_at', 'review_id')
+
+
+class BookingCursorPagination(KeysetCursorPagination):
+  ordering = ('start_date', 'booking_id')
+
+
+class RankedCursorPagination(KeysetCursorPagination):
+  """
+  Cursor pagination for relevance-ranked results such as ``?q=`` search.
+
+  The rank is computed per query and is not a column, so it cannot serve as
+  a key. The opaque cursor holds an offset into the ranked results instead.
+  The queryset must already be ordered by rank.
+  """
+
+  def paginate_queryset(self, queryset, request, view=None):
+    self.request = request
+    self.page_size = self.get_page_size(request)
+    if not self.page_size:
+      return None
+
+    self.base_url = request.build_absolute_uri()
+    self.offset = self.decode_offset(request)
+
+    results = list(queryset[self.offset:self.offset + self.page_size + 1])
+    self.has_next = len(results) > self.page_size
+    self.has_previous = self.offset > 0
+    self.page = results[:self.page_size]
+    return self.page
+
+  def decode_offset(self, request):
+    encoded = request.query_params.get(self.cursor_query_param)
+    if encoded is None:
+      return 0
+
+    try:
+      offset = int(json.loads(urlsafe_b64decode(encoded.encode('ascii')))[0])
+    except (TypeError, ValueError, IndexError, KeyError):
+      raise NotFound(self.invalid_cursor_message)
+    if offset < 0:
+      raise NotFound(self.invalid_cursor_message)
+    return offset
+
+  def offset_link(self, offset):
+    if offset <= 0:
+      return remove_query_param(self.base_url, self.cursor_query_param)
+    encoded = urlsafe_b64encode(json.dumps([offset]).encode('ascii')).decode('ascii')
+    return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+  def get_next_link(self):
+    if not self.has_next:
+      return None
+    return self.offset_link(self.offset + self.page_size)
+
+  def get_previous_link(self):
+    if not self.has_previous:
+      return None
+    return self.offset_link(self.offset - self.page_size)
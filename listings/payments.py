@@ -0,0 +1,136 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .db import locking_atomic
+from .models import Payment, PaymentGatewayEvent
+from .services import ChapaService
+
+logger = logging.getLogger(__name__)
+
+INITIALIZE_FAILED = 'Failed to initialize payment with Chapa'
+VERIFY_FAILED = 'Failed to verify payment with Chapa'
+VERIFY_REJECTED = 'Payment verification failed'
+
+
+def gateway_async():
+  return getattr(settings, 'PAYMENT_GATEWAY_ASYNC', False)
+
+
+def payment_request_data(payment, booking, user, return_url, callback_url=None):
+  """
+  The ``ChapaService.initialize_payment`` payload for ``payment``. Only
+  plain JSON types, so it can be passed to a task as is.
+  """
+  return {
+    'amount': float(payment.amount),
+    'currency': payment.currency,
+    'email': user.email,
+    'first_name': user.first_name or 'Customer',
+    'last_name': user.last_name or 'User',
+    'phone_number': getattr(user, 'phone', None),
+    'tx_ref': payment.chapa_tx_ref,
+    'return_url': return_url,
+    'callback_url': callback_url,
+    'title': f'Payment for {booking.listing_id.title}',
+    'description': f'Booking from {booking.start_date} to {booking.end_date}',
+  }
+
+
+def claim_gateway_call(payment, state):
+  """
+  Move ``payment`` into ``state`` unless a call in that state is already in
+  flight. Returns ``False`` for a duplicate, so a double-submitted request
+  does not queue a second gateway call. A claim older than
+  ``PAYMENT_GATEWAY_CLAIM_TIMEOUT`` seconds is treated as lost and taken
+  over.
+  """
+  now = timezone.now()
+  stale = now - timedelta(seconds=getattr(settings, 'PAYMENT_GATEWAY_CLAIM_TIMEOUT', 120))
+  claimed = Payment.objects.filter(pk=payment.pk).exclude(
+    gateway_state=state, updated_at__gt=stale
+  ).update(gateway_state=state, gateway_error='', updated_at=now)
+  if claimed:
+    payment.gateway_state, payment.gateway_error, payment.updated_at = state, '', now
+  return bool(claimed)
+
+
+def _record_error(payment, message):
+  payment.gateway_state = 'error'
+  payment.gateway_error = message
+  payment.save(update_fields=['gateway_state', 'gateway_error', 'updated_at'])
+
+
+def apply_initialization(payment, response):
+  if not response or response.get('status') != 'success':
+    _record_error(payment, INITIALIZE_FAILED)
+    return False
+
+  payment.chapa_checkout_url = response['data']['checkout_url']
+  payment.status = 'pending'
+  payment.gateway_state = 'idle'
+  payment.save(update_fields=['chapa_checkout_url', 'status', 'gateway_state', 'gateway_error', 'updated_at'])
+  PaymentGatewayEvent.objects.create(payment=payment, kind='initialize', payload=response)
+  return True
+
+
+def apply_verification(payment, response):
+  if not response:
+    _record_error(payment, VERIFY_FAILED)
+    return False
+  if response.get('status') != 'success':
+    _record_error(payment, VERIFY_REJECTED)
+    return False
+
+  data = response.get('data', {})
+  if data.get('status') == 'success':
+    payment.status = 'completed'
+    payment.transaction_id = data.get('reference')
+    payment.payment_method = data.get('method')
+    payment.completed_at = timezone.now()
+  else:
+    payment.status = 'failed'
+  payment.gateway_state = 'idle'
+  payment.save(update_fields=[
+    'status', 'transaction_id', 'payment_method', 'completed_at', 'gateway_state', 'gateway_error', 'updated_at',
+  ])
+  PaymentGatewayEvent.objects.create(payment=payment, kind='verification', payload=response)
+  return True
+
+
+def initialize_payment(payment_id, payment_data):
+  """
+  Call Chapa, then record the outcome on the locked payment row. The HTTP
+  call runs outside any transaction so no lock is held while waiting on
+  the gateway.
+  """
+  response = ChapaService().initialize_payment(payment_data)
+  with locking_atomic():
+    payment = Payment.objects.select_for_update().get(pk=payment_id)
+    apply_initialization(payment, response)
+  return payment
+
+
+def verify_payment(payment_id):
+  payment = Payment.objects.only('chapa_tx_ref').get(pk=payment_id)
+  response = ChapaService().verify_payment(payment.chapa_tx_ref)
+  with locking_atomic():
+    payment = Payment.objects.select_for_update().get(pk=payment_id)
+    apply_verification(payment, response)
+  return payment
+
+
+def enqueue(task, payment, *args):
+  """
+  Queue ``task`` for ``payment``. When the broker is unreachable the claim
+  is turned into an error so the payment does not look in flight forever.
+  """
+  try:
+    task.delay(str(payment.pk), *args)
+  except Exception as e:
+    logger.error(f"Could not queue {task.name} for payment {payment.pk}: {e}")
+    _record_error(payment, 'Payment gateway queue unavailable')
+    return False
+  return True
@@ -0,0 +1,183 @@
+import logging
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .db import locking_atomic
+from .models import Payment, PaymentGatewayEvent
+from .services import ChapaService, build_chapa_session, chapa_http_options
+
+
+logger = logging.getLogger(__name__)
+
+# Per-row columns written for each transition
+RECONCILE_FIELDS = {
+  'completed': ['transaction_id', 'payment_method'],
+  'failed': [],
+  'cancelled': [],
+}
+BULK_UPDATE_BATCH_SIZE = 200
+
+
+def reconciliation_options():
+  return {
+    'GRACE_MINUTES': 15,
+    'EXPIRE_HOURS': 24,
+    'CHUNK_SIZE': 1000,
+    'WORKERS': 8,
+    **getattr(settings, 'PAYMENT_RECONCILIATION', {}),
+  }
+
+
+def reconciled_status(payment, response, expire_before):
+  """
+  The status Chapa's verify ``response`` moves ``payment`` to, or ``None``
+  to leave it pending. A checkout still pending at Chapa is only given up
+  (``cancelled``) once the payment is older than ``expire_before``.
+  """
+  if not response or response.get('status') != 'success':
+    return None
+  gateway_status = response.get('data', {}).get('status')
+  if gateway_status == 'success':
+    return 'completed'
+  if gateway_status == 'pending':
+    return 'cancelled' if payment.created_at < expire_before else None
+  return 'failed'
+
+
+class PaymentReconciliation:
+  """
+  Verifies pending payments against Chapa and applies what it reports.
+
+  Pending payments that reached Chapa (they have a checkout URL) and are
+  older than the grace period are read in primary key order,
+  ``chunk_size`` at a time, so memory stays flat however large the
+  backlog. Each chunk's verify calls run on a pool of ``workers`` threads
+  sharing one keep-alive session. The resulting transitions are written
+  in bulk per chunk and status, limited to rows still pending under
+  ``select_for_update`` so a webhook or client verify that landed
+  meanwhile is not overwritten.
+  """
+
+  def __init__(self, chunk_size=None, workers=None, grace=None, expire_after=None, service=None):
+    options = reconciliation_options()
+    self.chunk_size = chunk_size or options['CHUNK_SIZE']
+    self.workers = workers or options['WORKERS']
+    self.grace = grace if grace is not None else timedelta(minutes=options['GRACE_MINUTES'])
+    self.expire_after = expire_after if expire_after is not None else timedelta(hours=options['EXPIRE_HOURS'])
+    self.service = service or ChapaService(
+      session=build_chapa_session({**chapa_http_options(), 'POOL_MAXSIZE': self.workers})
+    )
+    self.metrics = Counter()
+    self.timings = Counter()
+
+  def pending(self, started):
+    return Payment.objects.filter(
+      status='pending', chapa_checkout_url__isnull=False, created_at__lt=started - self.grace
+    ).only('payment_id', 'chapa_tx_ref', 'created_at').order_by('pk')
+
+  def chunks(self, queryset, limit=None):
+    last_pk, remaining = None, limit
+    while remaining is None or remaining > 0:
+      page = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+      size = self.chunk_size if remaining is None else min(self.chunk_size, remaining)
+      chunk = list(page[:size])
+      if not chunk:
+        return
+      yield chunk
+      last_pk = chunk[-1].pk
+      if remaining is not None:
+        remaining -= len(chunk)
+
+  def run(self, limit=None):
+    started = timezone.now()
+    expire_before = started - self.expire_after
+    clock = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=self.workers) as pool:
+      for chunk in self.chunks(self.pending(started), limit):
+        gateway_clock = time.perf_counter()
+        responses = list(pool.map(self.service.verify_payment, [payment.chapa_tx_ref for payment in chunk]))
+        self.timings['gateway'] += time.perf_counter() - gateway_clock
+
+        database_clock = time.perf_counter()
+        self.apply(chunk, responses, expire_before)
+        self.timings['database'] += time.perf_counter() - database_clock
+
+        elapsed = time.perf_counter() - clock
+        logger.info(
+          f"Reconciled {self.metrics['scanned']} pending payments in {elapsed:.1f}s "
+          f"({self.metrics['scanned'] / elapsed:,.0f}/s): {dict(self.metrics)}"
+        )
+
+    return self.summary(time.perf_counter() - clock)
+
+  def transition(self, payment, response, expire_before):
+    new_status = reconciled_status(payment, response, expire_before)
+    if new_status is None:
+      return None
+    if new_status == 'completed':
+      data = response.get('data', {})
+      payment.transaction_id = data.get('reference')
+      payment.payment_method = data.get('method')
+    return new_status
+
+  def apply(self, chunk, responses, expire_before):
+    by_status = defaultdict(list)
+    for payment, response in zip(chunk, responses):
+      self.metrics['scanned'] += 1
+      if not response:
+        self.metrics['errors'] += 1
+        continue
+      new_status = self.transition(payment, response, expire_before)
+      if new_status is None:
+        self.metrics['unchanged'] += 1
+        continue
+      by_status[new_status].append((payment, response))
+    if not by_status:
+      return
+
+    now = timezone.now()
+    with locking_atomic():
+      still_pending = set(
+        Payment.objects.select_for_update().filter(
+          pk__in=[payment.pk for pairs in by_status.values() for payment, _ in pairs], status='pending'
+        ).values_list('pk', flat=True)
+      )
+      for new_status, pairs in by_status.items():
+        settled = [(payment, response) for payment, response in pairs if payment.pk in still_pending]
+        # Settled by a webhook or verify call while Chapa was being asked
+        self.metrics['unchanged'] += len(pairs) - len(settled)
+        if not settled:
+          continue
+        # Columns shared by the whole group in one UPDATE; bulk_update only
+        # for the per-row ones, since its CASE grows with every extra field
+        Payment.objects.filter(pk__in=[payment.pk for payment, _ in settled]).update(
+          status=new_status, completed_at=now if new_status == 'completed' else None, updated_at=now
+        )
+        if RECONCILE_FIELDS[new_status]:
+          Payment.objects.bulk_update(
+            [payment for payment, _ in settled], RECONCILE_FIELDS[new_status], batch_size=BULK_UPDATE_BATCH_SIZE
+          )
+        PaymentGatewayEvent.objects.bulk_create([
+          PaymentGatewayEvent(payment=payment, kind='verification', payload=response, created_at=now)
+          for payment, response in settled
+        ])
+        self.metrics[new_status] += len(settled)
+
+  def summary(self, seconds):
+    return {
+      **{key: self.metrics[key] for key in ('scanned', 'completed', 'failed', 'cancelled', 'unchanged', 'errors')},
+      'seconds': round(seconds, 3),
+      'gateway_seconds': round(self.timings['gateway'], 3),
+      'database_seconds': round(self.timings['database'], 3),
+      'per_second': round(self.metrics['scanned'] / seconds, 1) if seconds else 0.0,
+    }
+
+
+def reconcile_pending_payments(limit=None, **options):
+  return PaymentReconciliation(**options).run(limit=limit)
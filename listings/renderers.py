@@ -0,0 +1,206 @@
+import datetime
+import decimal
+import json
+import math
+import uuid
+
+from django.conf import settings
+from django.utils.encoding import force_str
+from django.utils.functional import Promise
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils import encoders
+from rest_framework.utils.json import strict_constant
+
+try:
+  import orjson
+except ImportError: # pragma: no cover - optional accelerator
+  orjson = None
+
+
+def _datetime(value):
+  representation = value.isoformat()
+  if representation.endswith('+00:00'):
+    representation = representation[:-6] + 'Z'
+  return representation
+
+
+# Same output as DRF's JSONEncoder for the types API payloads carry most
+_DEFAULT_HANDLERS = {
+  Promise: force_str,
+  datetime.datetime: _datetime,
+  datetime.date: datetime.date.isoformat,
+  decimal.Decimal: float,
+  uuid.UUID: str,
+}
+_drf_encoder = encoders.JSONEncoder()
+_handlers = {}
+
+
+def encode_default(value):
+  """
+  ``default`` hook shared by both backends.
+
+  The handler for each concrete type is resolved once through its MRO and
+  cached. Types with no handler of their own use DRF's encoder, so
+  behaviour matches ``JSONRenderer`` for everything else.
+  """
+  kind = type(value)
+  handler = _handlers.get(kind)
+  if handler is None:
+    handler = next(
+      (_DEFAULT_HANDLERS[base] for base in kind.__mro__ if base in _DEFAULT_HANDLERS),
+      _drf_encoder.default,
+    )
+    _handlers[kind] = handler
+  return handler(value)
+
+
+def _escape_line_separators(content):
+  # Keep the output a strict JavaScript subset, as JSONRenderer does
+  if b'\xe2\x80\xa8' in content or b'\xe2\x80\xa9' in content:
+    content = content.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+  return content
+
+
+def _has_non_finite(data):
+  """
+  Whether ``data`` holds a NaN or infinite float or ``Decimal`` anywhere
+  in its dicts, lists and tuples.
+  """
+  pending = [data]
+  while pending:
+    value = pending.pop()
+    if isinstance(value, dict):
+      pending.extend(value.values())
+    elif isinstance(value, (list, tuple)):
+      pending.extend(value)
+    elif isinstance(value, float):
+      if not math.isfinite(value):
+        return True
+    elif isinstance(value, decimal.Decimal) and not value.is_finite():
+      return True
+  return False
+
+
+class _DispatchEncoder(json.JSONEncoder):
+  def default(self, o):
+    return encode_default(o)
+
+
+class PythonJSONBackend:
+  """
+  Stdlib ``json`` with the C encoder, reused encoder instances and the
+  cached ``default`` dispatch. Output is byte-identical to ``JSONRenderer``.
+  """
+
+  name = 'python'
+
+  def __init__(self):
+    self._encoders = {}
+
+  def dumps(self, data, ensure_ascii=False, allow_nan=False):
+    key = (ensure_ascii, allow_nan)
+    encoder = self._encoders.get(key)
+    if encoder is None:
+      encoder = self._encoders[key] = _DispatchEncoder(
+        ensure_ascii=ensure_ascii, allow_nan=allow_nan, separators=(',', ':')
+      )
+    content = encoder.encode(data)
+    return content.replace('\u2028', '\\u2028').replace('\u2029', '\\u2029').encode()
+
+  def loads(self, content, strict=True):
+    if isinstance(content, bytes):
+      content = content.decode('utf-8')
+    return json.loads(content, parse_constant=strict_constant if strict else None)
+
+
+class OrjsonBackend:
+  """
+  ``orjson`` for the common case. Payloads it cannot represent the same way
+  (ASCII-only output, non-strict parsing, integers over 64 bits, non-finite
+  floats) go through the Python backend instead, so they are rejected or
+  written exactly as ``JSONRenderer`` would.
+  """
+
+  name = 'orjson'
+  options = (orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS) if orjson else 0
+
+  def __init__(self, fallback):
+    self.fallback = fallback
+
+  def dumps(self, data, ensure_ascii=False, allow_nan=False):
+    if ensure_ascii:
+      return self.fallback.dumps(data, ensure_ascii, allow_nan)
+    try:
+      content = orjson.dumps(data, default=encode_default, option=self.options) # type: ignore
+    except orjson.JSONEncodeError: # type: ignore
+      return self.fallback.dumps(data, ensure_ascii, allow_nan)
+    # orjson writes NaN and infinities as null; only output with a null can
+    # hide one, so the payload is searched for them only then
+    if b'null' in content and _has_non_finite(data):
+      return self.fallback.dumps(data, ensure_ascii, allow_nan)
+    return _escape_line_separators(content)
+
+  def loads(self, content, strict=True):
+    if not strict:
+      return self.fallback.loads(content, strict)
+    return orjson.loads(content) # type: ignore
+
+
+JSON_BACKENDS = {'python': PythonJSONBackend()}
+if orjson is not None:
+  JSON_BACKENDS['orjson'] = OrjsonBackend(JSON_BACKENDS['python'])
+
+
+def get_json_backend(name='auto'):
+  if name == 'auto':
+    name = 'orjson' if 'orjson' in JSON_BACKENDS else 'python'
+  return JSON_BACKENDS[name]
+
+
+class FastJSONRenderer(JSONRenderer):
+  """
+  Drop-in ``JSONRenderer`` on the fastest available backend (``orjson``
+  when installed). Indented output, as used by the browsable API, is left
+  to ``JSONRenderer``.
+  """
+
+  backend = 'auto'
+
+  def render(self, data, accepted_media_type=None, renderer_context=None):
+    if data is None:
+      return b''
+    if not self.compact or self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+      return super().render(data, accepted_media_type, renderer_context)
+    return get_json_backend(self.backend).dumps(data, ensure_ascii=self.ensure_ascii, allow_nan=not self.strict)
+
+
+class PythonJSONRenderer(FastJSONRenderer):
+  backend = 'python'
+
+
+class FastJSONParser(JSONParser):
+  """
+  Drop-in ``JSONParser`` on the fastest available backend.
+  """
+
+  backend = 'auto'
+  renderer_class = FastJSONRenderer
+
+  def parse(self, stream, media_type=None, parser_context=None):
+    parser_context = parser_context or {}
+    encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+    try:
+      content = stream.read()
+      if encoding.lower().replace('-', '').replace('_', '') != 'utf8':
+        content = content.decode(encoding).encode('utf-8')
+      return get_json_backend(self.backend).loads(content, strict=self.strict)
+    except ValueError as exc:
+      raise ParseError('JSON parse error - %s' % str(exc))
+
+
+class PythonJSONParser(FastJSONParser):
+  backend = 'python'
+  renderer_class = PythonJSONRenderer
@@ -0,0 +1,278 @@
+import logging
+import math
+import re
+from collections import Counter
+
+from django.conf import settings
+from django.db import OperationalError, connection, transaction
+from django.db.models import Case, Count, ExpressionWrapper, F, FloatField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Cast
+
+from .models import Listing, ListingSearchDocument, ListingSearchStats, ListingSearchTerm
+
+
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = 'listings_listing_fts'
+
+# Relative weight of a term match in each field
+FIELD_WEIGHTS = {'title': 3, 'description': 1, 'location': 2}
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize(text):
+  return TOKEN_RE.findall((text or '').lower())
+
+
+def existing_listings(listings):
+  """
+  Listings from ``listings`` that are actually in the table. Rows dropped by
+  ``bulk_create(ignore_conflicts=True)`` still carry a client-side UUID.
+  """
+  listings = list(listings)
+  existing = set(Listing.objects.filter(pk__in=[listing.pk for listing in listings]).values_list('pk', flat=True))
+  return [listing for listing in listings if listing.pk in existing]
+
+
+def listing_batches(size=2000):
+  batch = []
+  for listing in Listing.objects.order_by('pk').iterator(chunk_size=size):
+    batch.append(listing)
+    if len(batch) >= size:
+      yield batch
+      batch = []
+  if batch:
+    yield batch
+
+
+class FTS5SearchBackend:
+  """
+  SQLite FTS5 index over title, description and location, ranked by BM25.
+
+  FTS5 rowids are integers, so each indexed listing gets a
+  ``ListingSearchDocument`` whose id is its rowid. An update or delete is a
+  rowid lookup instead of a scan over the ``listing_id`` column.
+  """
+
+  name = 'fts5'
+
+  @staticmethod
+  def rowids(pks, create=False):
+    if create:
+      ListingSearchDocument.objects.bulk_create(
+        [ListingSearchDocument(listing_id=pk) for pk in pks], ignore_conflicts=True
+      )
+    return dict(ListingSearchDocument.objects.filter(listing_id__in=pks).values_list('listing_id', 'id'))
+
+  def index(self, listings):
+    listings = existing_listings(listings)
+    rowids = self.rowids([listing.pk for listing in listings], create=True)
+    rows = [
+      (rowids[listing.pk], listing.pk.hex, listing.title, listing.description, listing.location)
+      for listing in listings
+    ]
+    with connection.cursor() as cursor:
+      cursor.executemany(
+        f"INSERT OR REPLACE INTO {FTS_TABLE} (rowid, listing_id, title, description, location) VALUES (%s, %s, %s, %s, %s)",
+        rows,
+      )
+
+  def remove(self, pks):
+    rowids = self.rowids(pks)
+    with connection.cursor() as cursor:
+      cursor.executemany(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [(rowid,) for rowid in rowids.values()])
+    ListingSearchDocument.objects.filter(listing_id__in=pks).delete()
+
+  def rebuild(self):
+    with connection.cursor() as cursor:
+      cursor.execute(f"DELETE FROM {FTS_TABLE}")
+    ListingSearchDocument.objects.all().delete()
+    for batch in listing_batches():
+      self.index(batch)
+
+  def search(self, queryset, query):
+    terms = tokenize(query)
+    if not terms:
+      return queryset.none()
+
+    match = ' '.join(f'"{term}"' for term in terms)
+    weights = ', '.join(str(FIELD_WEIGHTS[field]) for field in ['title', 'description', 'location'])
+    documents = ListingSearchDocument._meta.db_table
+    listings = Listing._meta.db_table
+    matched = RawSQL(
+      f"SELECT {documents}.listing_id FROM {FTS_TABLE} JOIN {documents} ON {documents}.id = {FTS_TABLE}.rowid "
+      f"WHERE {FTS_TABLE} MATCH %s",
+      (match,),
+    )
+    # bm25() only works inside a MATCH query, so the rank is one rowid probe
+    # per matched listing
+    rank = RawSQL(
+      f"SELECT bm25({FTS_TABLE}, 0, {weights}) FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s AND {FTS_TABLE}.rowid = "
+      f"(SELECT {documents}.id FROM {documents} WHERE {documents}.listing_id = {listings}.listing_id)",
+      (match,),
+      output_field=FloatField(),
+    )
+    return queryset.filter(pk__in=matched).annotate(search_rank=rank).order_by('search_rank', 'listing_id')
+
+
+class InvertedIndexSearchBackend:
+  """
+  Portable fallback: an inverted index in ``ListingSearchTerm`` with BM25
+  scoring done in SQL over the postings of the query terms. It works on
+  every database and gives deterministic results in tests.
+
+  The corpus size and total length BM25 needs are kept in
+  ``ListingSearchStats``, updated in the same transaction as the postings.
+  A search reads that row and the posting counts of its own terms, never
+  the whole index.
+  """
+
+  name = 'inverted'
+  k1 = 1.2
+  b = 0.75
+
+  @staticmethod
+  def add_stats(documents, length):
+    if not documents and not length:
+      return
+    updated = ListingSearchStats.objects.filter(pk=1).update(
+      documents=F('documents') + documents, total_length=F('total_length') + length
+    )
+    if not updated:
+      ListingSearchStats.objects.create(pk=1, documents=documents, total_length=length)
+
+  @staticmethod
+  def unindex(pks):
+    """
+    Delete the postings of ``pks`` and return ``(documents, length)`` they
+    contributed to the corpus statistics.
+    """
+    postings = ListingSearchTerm.objects.filter(listing_id__in=pks)
+    removed = postings.aggregate(documents=Count('listing_id', distinct=True), length=Sum('frequency'))
+    postings.delete()
+    return removed['documents'], removed['length'] or 0
+
+  def index(self, listings):
+    listings = existing_listings(listings)
+
+    terms, documents, length = [], 0, 0
+    for listing in listings:
+      frequencies = Counter()
+      for field, weight in FIELD_WEIGHTS.items():
+        for token in tokenize(getattr(listing, field)):
+          frequencies[token[:64]] += weight
+      listing_length = sum(frequencies.values())
+      documents += bool(frequencies)
+      length += listing_length
+      terms.extend(
+        ListingSearchTerm(listing_id_id=listing.pk, term=term, frequency=frequency, length=listing_length)
+        for term, frequency in frequencies.items()
+      )
+
+    with transaction.atomic():
+      removed_documents, removed_length = self.unindex([listing.pk for listing in listings])
+      ListingSearchTerm.objects.bulk_create(terms, batch_size=5000)
+      self.add_stats(documents - removed_documents, length - removed_length)
+
+  def remove(self, pks):
+    with transaction.atomic():
+      documents, length = self.unindex(pks)
+      self.add_stats(-documents, -length)
+
+  def rebuild(self):
+    with transaction.atomic():
+      ListingSearchTerm.objects.all().delete()
+      ListingSearchStats.objects.update_or_create(pk=1, defaults={'documents': 0, 'total_length': 0})
+    for batch in listing_batches():
+      self.index(batch)
+
+  def posting_score(self, terms):
+    """
+    BM25 contribution of one posting as an expression over
+    ``ListingSearchTerm`` rows, or ``None`` when some term has no postings
+    and so no listing can match them all. Only the corpus statistics and
+    the posting counts of ``terms`` are read up front.
+    """
+    documents, total_length = (
+      ListingSearchStats.objects.filter(pk=1).values_list('documents', 'total_length').first() or (0, 0)
+    )
+    postings = dict(
+      ListingSearchTerm.objects.filter(term__in=terms).values('term').annotate(postings=Count('pk'))
+      .values_list('term', 'postings')
+    )
+    if not documents or len(postings) < len(terms):
+      return None
+    average_length = total_length / documents or 1
+
+    idf = Case(
+      *[
+        When(term=term, then=Value(math.log(1 + (documents - count + 0.5) / (count + 0.5))))
+        for term, count in postings.items()
+      ],
+      output_field=FloatField(),
+    )
+    frequency = Cast('frequency', FloatField())
+    norm = frequency + Value(self.k1 * (1 - self.b)) + Value(self.k1 * self.b / average_length) * F('length')
+    return ExpressionWrapper(idf * frequency * Value(self.k1 + 1) / norm, output_field=FloatField())
+
+  def search(self, queryset, query):
+    terms = sorted({term[:64] for term in tokenize(query)})
+    if not terms:
+      return queryset.none()
+
+    score = self.posting_score(terms)
+    if score is None:
+      return queryset.none()
+
+    postings = ListingSearchTerm.objects.filter(term__in=terms)
+    # Listings holding every term; the caller's filters narrow them further
+    matched = postings.values('listing_id').annotate(matches=Count('pk')).filter(matches=len(terms))
+    scores = postings.filter(listing_id=OuterRef('pk')).values('listing_id').annotate(score=Sum(score)).values('score')
+    # Negated so that, as with FTS5 bm25(), a lower rank is a better match
+    return queryset.filter(pk__in=matched.values('listing_id')).annotate(
+      search_rank=-Subquery(scores, output_field=FloatField())
+    ).order_by('search_rank', 'listing_id')
+
+
+SEARCH_BACKENDS = {backend.name: backend for backend in [FTS5SearchBackend(), InvertedIndexSearchBackend()]}
+_fts5_available = {}
+
+
+def fts5_available():
+  alias = connection.alias
+  if alias not in _fts5_available:
+    _fts5_available[alias] = (
+      connection.vendor == 'sqlite' and FTS_TABLE in connection.introspection.table_names()
+    )
+  return _fts5_available[alias]
+
+
+def get_search_backend():
+  """
+  The backend named by ``LISTING_SEARCH_BACKEND``. ``'auto'`` (the default)
+  uses FTS5 when the SQLite index table exists, else the inverted index.
+  """
+  choice = getattr(settings, 'LISTING_SEARCH_BACKEND', 'auto')
+  if choice == 'auto':
+    choice = 'fts5' if fts5_available() else 'inverted'
+  return SEARCH_BACKENDS[choice]
+
+
+def index_listings(listings):
+  try:
+    get_search_backend().index(listings)
+  except OperationalError as e:
+    logger.error(f"Failed to update listing search index: {e}")
+
+
+def remove_listings(pks):
+  try:
+    get_search_backend().remove(pks)
+  except OperationalError as e:
+    logger.error(f"Failed to remove listings from search index: {e}")
+
+
+def search_listings(queryset, query):
+  return get_search_backend().search(queryset, query)
@@ -1,6 +1,9 @@
-from rest_framework import serializers
+import datetime
+
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
 from django.contrib.auth import get_user_model
-from .models import Listing, Booking, Payment
+from .models import Listing, Booking, Payment, Review
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 
 User = get_user_model()
@@ -77,15 +80,136 @@ class ListingSerializer(serializers.ModelSerializer):
     description = serializers.CharField(max_length=1000)
     price = serializers.DecimalField(max_digits=10, decimal_places=2)
     location = serializers.CharField(max_length=255)
+    latitude = serializers.FloatField(min_value=-90, max_value=90, required=False, allow_null=True)
+    longitude = serializers.FloatField(min_value=-180, max_value=180, required=False, allow_null=True)
     created_at = serializers.DateTimeField(read_only=True)
 
     class Meta:
         model = Listing
         fields = [
             'listing_id', 'title', 'description', 'type',
-            'price', 'location', 'created_at', 'updated_at',
-            'num_bedrooms', 'num_bathrooms', 'amenities'
+            'price', 'location', 'latitude', 'longitude', 'created_at', 'updated_at',
+            'num_bedrooms', 'num_bathrooms', 'amenities', 'avg_rating', 'review_count'
         ]
+        read_only_fields = ('avg_rating', 'review_count')
+
+    def validate(self, data): # type: ignore
+        if ('latitude' in data) != ('longitude' in data):
+            raise serializers.ValidationError("latitude and longitude must be given together.")
+        return data
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        distance = getattr(instance, 'distance_km', None)
+        if distance is not None:
+            data['distance_km'] = round(distance, 3)
+        return data
+
+
+class ReviewSerializer(serializers.ModelSerializer):
+    review_id = serializers.UUIDField(read_only=True)
+    rating = serializers.IntegerField(min_value=1, max_value=5)
+    created_at = serializers.DateTimeField(read_only=True)
+
+    class Meta:
+        model = Review
+        fields = ['review_id', 'listing_id', 'user_id', 'rating', 'comment', 'created_at']
+        read_only_fields = ('listing_id', 'user_id')
+
+
+class ReviewBatchSerializer(ReviewSerializer):
+    """
+    One item of a review batch. Staff importing reviews may attribute each to
+    a user; everyone else's reviews are their own.
+    """
+    user_id = serializers.PrimaryKeyRelatedField(queryset=User.objects.all(), required=False)
+
+    class Meta(ReviewSerializer.Meta):
+        read_only_fields = ('listing_id',)
+
+
+class ValuesSerializer:
+    """
+    Read-only fast path for list endpoints.
+
+    Rows are fetched with ``values_list(named=True)`` instead of model
+    instances. They are converted with the field objects of one
+    ``serializer_class`` instance built once per class. Fields whose
+    ``to_representation`` returns plain column values unchanged are copied
+    as they are. Relations render as their raw key, as
+    ``PrimaryKeyRelatedField`` does. Decimal, UUID, date and datetime
+    columns go through the serializer's own field, so the rendered JSON is
+    byte-identical to ``serializer_class(many=True).data``.
+    """
+
+    serializer_class = None
+    identity_fields = (
+        serializers.CharField, serializers.IntegerField, serializers.FloatField,
+        serializers.BooleanField, serializers.ChoiceField, serializers.JSONField,
+    )
+    _columns = None
+
+    @classmethod
+    def columns(cls):
+        """
+        ``(name, source, field)`` per readable field. ``field`` is ``None``
+        when the column value is already its representation.
+        """
+        if cls.__dict__.get('_columns') is None:
+            columns = []
+            for name, field in cls.serializer_class().fields.items(): # type: ignore
+                if field.write_only:
+                    continue
+                if isinstance(field, serializers.PrimaryKeyRelatedField) and field.pk_field is None:
+                    columns.append((name, field.source, None))
+                elif type(field) in cls.identity_fields and not getattr(field, 'binary', False):
+                    columns.append((name, field.source, None))
+                elif isinstance(field, (serializers.RelatedField, serializers.SerializerMethodField, serializers.BaseSerializer)):
+                    raise TypeError(f"{cls.__name__} cannot render field '{name}' without a model instance.")
+                else:
+                    columns.append((name, field.source, field))
+            cls._columns = columns
+        return cls._columns
+
+    @staticmethod
+    def converter(field):
+        """
+        ``field.to_representation``, except that ISO 8601 datetimes resolve
+        the output timezone once per call instead of once per value.
+        """
+        if not isinstance(field, serializers.DateTimeField):
+            return field.to_representation
+        output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+        field_timezone = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+        if output_format is None or output_format.lower() != ISO_8601 or field_timezone is None:
+            return field.to_representation
+
+        def to_representation(value):
+            if not isinstance(value, datetime.datetime) or value.tzinfo is None:
+                return field.to_representation(value)
+            value = value.astimezone(field_timezone).isoformat()
+            return value[:-6] + 'Z' if value.endswith('+00:00') else value
+        return to_representation
+
+    def values(self, queryset):
+        return queryset.values_list(*[source for _, source, _ in self.columns()], named=True)
+
+    def converters(self):
+        return [
+            (name, index, None if field is None else self.converter(field))
+            for index, (name, _, field) in enumerate(self.columns())
+        ]
+
+    def to_representation(self, row, converters=None):
+        data = {}
+        for name, index, convert in converters or self.converters():
+            value = row[index]
+            data[name] = value if convert is None or value is None else convert(value)
+        return data
+
+    def many(self, rows):
+        converters = self.converters()
+        return [self.to_representation(row, converters) for row in rows]
 
 
 class BookingSerializer(serializers.ModelSerializer):
@@ -105,7 +229,10 @@ class BookingSerializer(serializers.ModelSerializer):
         read_only_fields = ('total_amount','user_id',)
         
     def validate(self, data): # type: ignore
-        if data['start_date'] >= data['end_date']:
+        # A partial update may change only one of the dates
+        start_date = data.get('start_date', getattr(self.instance, 'start_date', None))
+        end_date = data.get('end_date', getattr(self.instance, 'end_date', None))
+        if start_date >= end_date:
             raise serializers.ValidationError("Start date must be before end date.")
         return data
 
@@ -137,20 +264,103 @@ class PaymentSerializer(serializers.ModelSerializer):
         fields = [
             'payment_id', 'chapa_tx_ref', 'amount', 'currency', 'status',
             'transaction_id', 'chapa_checkout_url', 'payment_method',
-            'created_at', 'updated_at', 'completed_at', 'booking_details'
+            'created_at', 'updated_at', 'completed_at', 'gateway_state', 'gateway_error', 'booking_details'
+        ]
+        read_only_fields = [
+            'payment_id', 'transaction_id', 'status', 'created_at', 'updated_at', 'gateway_state', 'gateway_error'
         ]
-        read_only_fields = ['payment_id', 'transaction_id', 'status', 'created_at', 'updated_at']
         
     def get_booking_details(self, obj):
         if obj.booking_id:
             return {
                 'booking_id': str(obj.booking_id.booking_id),
-                'listing_id': str(obj.booking_id.listing_id.listing_id),
-                'user_id': str(obj.booking_id.user_id.user_id),
+                'listing_id': str(obj.booking_id.listing_id_id),
+                'user_id': str(obj.booking_id.user_id_id),
                 'start_date': obj.booking_id.start_date,
                 'end_date': obj.booking_id.end_date,
             }
         return None
       
 class PaymentVerifySerializer(serializers.Serializer):
-    tx_ref = serializers.CharField(max_length=100)
\ No newline at end of file
+    tx_ref = serializers.CharField(max_length=100)
+
+class AvailabilitySerializer(serializers.Serializer):
+    check_in = serializers.DateField()
+    check_out = serializers.DateField()
+
+    def validate(self, data): # type: ignore
+        if data['check_in'] >= data['check_out']:
+            raise serializers.ValidationError("check_in must be before check_out.")
+        return data
+
+
+
+class ListingFilterSerializer(serializers.Serializer):
+    type = serializers.CharField(required=False)
+    min_price = serializers.DecimalField(max_digits=10, decimal_places=2, required=False)
+    max_price = serializers.DecimalField(max_digits=10, decimal_places=2, required=False)
+    num_bedrooms = serializers.IntegerField(min_value=0, required=False)
+    min_bedrooms = serializers.IntegerField(min_value=0, required=False)
+    location = serializers.CharField(max_length=255, required=False)
+    amenities = serializers.CharField(required=False)
+
+    def validate_type(self, value):
+        types = [item.strip() for item in value.split(',') if item.strip()]
+        valid = dict(Listing.TYPE_CHOICES)
+        unknown = [item for item in types if item not in valid]
+        if unknown:
+            raise serializers.ValidationError(f"Unknown listing type(s): {', '.join(unknown)}.")
+        return types
+
+    def validate_amenities(self, value):
+        return [item.strip() for item in value.split(',') if item.strip()]
+
+    def validate(self, data): # type: ignore
+        min_price, max_price = data.get('min_price'), data.get('max_price')
+        if min_price is not None and max_price is not None and min_price > max_price:
+            raise serializers.ValidationError("min_price must not exceed max_price.")
+        return data
+
+
+class GeoQuerySerializer(serializers.Serializer):
+    lat = serializers.FloatField(min_value=-90, max_value=90, required=False)
+    lng = serializers.FloatField(min_value=-180, max_value=180, required=False)
+    radius_km = serializers.FloatField(min_value=0, max_value=20050, required=False)
+    bbox = serializers.CharField(required=False)
+
+    def validate_bbox(self, value):
+        try:
+            south, west, north, east = [float(item) for item in value.split(',')]
+        except ValueError:
+            raise serializers.ValidationError("bbox must be south,west,north,east in degrees.")
+        if not (-90 <= south <= north <= 90 and -180 <= west <= 180 and -180 <= east <= 180):
+            raise serializers.ValidationError("bbox is out of range or has south above north.")
+        return south, west, north, east
+
+    def validate(self, data): # type: ignore
+        if ('lat' in data) != ('lng' in data):
+            raise serializers.ValidationError("lat and lng must be given together.")
+        if 'radius_km' in data and 'lat' not in data:
+            raise serializers.ValidationError("radius_km requires lat and lng.")
+        return data
+
+
+class ListingValuesSerializer(ValuesSerializer):
+    serializer_class = ListingSerializer
+
+    def values(self, queryset):
+        sources = [source for _, source, _ in self.columns()]
+        if 'distance_km' in queryset.query.annotations:
+            sources.append('distance_km')
+        return queryset.values_list(*sources, named=True)
+
+    def to_representation(self, row, converters=None):
+        data = super().to_representation(row, converters)
+        distance = getattr(row, 'distance_km', None)
+        if distance is not None:
+            data['distance_km'] = round(distance, 3)
+        return data
+
+
+class BookingValuesSerializer(ValuesSerializer):
+    serializer_class = BookingSerializer
@@ -1,12 +1,104 @@
+import os
+import threading
+
 import requests
 from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Process-wide keep-alive session settings, overridden key by key by
+# settings.CHAPA_HTTP. POOL_MAXSIZE caps the connections kept open to Chapa
+# per process; set it to at least the number of threads per worker. Only
+# verify (GET) calls are retried after a read error or a 429/5xx;
+# connection failures are retried for every call since nothing was sent.
+DEFAULT_CHAPA_HTTP = {
+    'BASE_URL': 'https://api.chapa.co/v1',
+    'POOL_CONNECTIONS': 2,
+    'POOL_MAXSIZE': 10,
+    'CONNECT_TIMEOUT': 3.05,    # Seconds
+    'READ_TIMEOUT': 15,         # Seconds
+    'RETRIES': 3,
+    'RETRY_BACKOFF': 0.3,
+    'RETRY_JITTER': 0.3,
+}
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def chapa_http_options():
+    return {**DEFAULT_CHAPA_HTTP, **getattr(settings, 'CHAPA_HTTP', {})}
+
+
+def build_chapa_session(options=None):
+    """
+    A ``requests.Session`` with a keep-alive pool to Chapa.
+
+    Connection errors are retried for any method, since the request never
+    left. Read errors and 429/5xx responses are only retried for GET, which
+    makes verify calls safe to repeat while initialize (POST) is never sent
+    twice. Waits back off exponentially with random jitter and honour
+    ``Retry-After``.
+    """
+    options = options or chapa_http_options()
+    retry = Retry(
+        total=options['RETRIES'],
+        allowed_methods=frozenset(['GET', 'HEAD']),
+        status_forcelist=(429, 500, 502, 503, 504),
+        backoff_factor=options['RETRY_BACKOFF'],
+        backoff_jitter=options['RETRY_JITTER'],
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=options['POOL_CONNECTIONS'],
+        pool_maxsize=options['POOL_MAXSIZE'],
+        max_retries=retry,
+    )
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def get_chapa_session():
+    """
+    The process-wide Chapa session, created on first use.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = build_chapa_session()
+    return _session
+
+
+def reset_chapa_session():
+    global _session
+    with _session_lock:
+        session, _session = _session, None
+    if session is not None:
+        session.close()
+
+
+def _forget_chapa_session():
+    # Pooled sockets must not be shared with a forked worker
+    global _session, _session_lock
+    _session, _session_lock = None, threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_forget_chapa_session)
+
+
 class ChapaService:
-    def __init__(self):
-        self.base_url = "https://api.chapa.co/v1"
+    def __init__(self, session=None):
+        options = chapa_http_options()
+        self.base_url = options['BASE_URL'].rstrip('/')
+        self.timeout = (options['CONNECT_TIMEOUT'], options['READ_TIMEOUT'])
+        self.session = session or get_chapa_session()
         self.secret_key = settings.CHAPA_SECRET_KEY
         self.headers = {
             'Authorization': f'Bearer {self.secret_key}',
@@ -18,7 +110,7 @@ class ChapaService:
         Initialize payment with Chapa
         """
         url = f"{self.base_url}/transaction/initialize"
-        
+
         payload = {
             "amount": payment_data['amount'],
             "currency": payment_data.get('currency', 'ETB'),
@@ -35,7 +127,7 @@ class ChapaService:
             }
         }
         try:
-            response = requests.post(url, json=payload, headers=self.headers)
+            response = self.session.post(url, json=payload, headers=self.headers, timeout=self.timeout)
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as e:
@@ -47,11 +139,11 @@ class ChapaService:
         Verify payment with Chapa
         """
         url = f"{self.base_url}/transaction/verify/{tx_ref}"
-        
+
         try:
-            response = requests.get(url, headers=self.headers)
+            response = self.session.get(url, headers=self.headers, timeout=self.timeout)
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as e:
             logger.error(f"Chapa payment verification failed: {str(e)}")
-            return None
\ No newline at end of file
+            return None
@@ -0,0 +1,67 @@
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .cache import listing_cache
+from .models import Listing, ListingAmenity, Review, User
+from .search import index_listings, remove_listings
+
+
+@receiver(post_save, sender=Listing)
+def sync_listing_amenities(sender, instance, update_fields=None, **kwargs):
+  if update_fields is not None and 'amenities' not in update_fields:
+    return
+  ListingAmenity.objects.sync([instance])
+
+
+@receiver(post_save, sender=Listing)
+def index_listing(sender, instance, update_fields=None, **kwargs):
+  if update_fields is not None and not {'title', 'description', 'location'} & set(update_fields):
+    return
+  index_listings([instance])
+
+
+# Before the delete, while the listing's postings still count towards the
+# index statistics; the cascade would remove them without adjusting those
+@receiver(pre_delete, sender=Listing)
+def unindex_listing(sender, instance, **kwargs):
+  remove_listings([instance.pk])
+
+
+@receiver(post_save, sender=Listing)
+@receiver(post_delete, sender=Listing)
+def invalidate_listing_responses(sender, instance, **kwargs):
+  listing_cache.invalidate([instance.pk])
+
+
+@receiver(pre_save, sender=Review)
+def remember_review_stats(sender, instance, **kwargs):
+  if instance._state.adding or hasattr(instance, '_loaded_stats'):
+    return
+  instance._loaded_stats = Review.objects.filter(pk=instance.pk).values_list('listing_id', 'rating').first()
+
+
+@receiver(post_save, sender=Review)
+def update_review_stats(sender, instance, created, **kwargs):
+  current = (instance.listing_id_id, instance.rating)
+  previous = None if created else getattr(instance, '_loaded_stats', None)
+  if previous != current:
+    if previous:
+      Listing.objects.add_review_stats({previous[0]: (-1, -previous[1])})
+    Listing.objects.add_review_stats({current[0]: (1, current[1])})
+  instance._loaded_stats = current
+
+
+# Review deletes adjust stats in Review.delete() and ReviewQuerySet.delete()
+# rather than per row in post_delete, which would cost one UPDATE per review
+# in a cascade and turn off Django's fast delete for it. Deleting a listing
+# needs no stats; deleting a user refreshes the listings they reviewed once.
+@receiver(pre_delete, sender=User)
+def remember_reviewed_listings(sender, instance, **kwargs):
+  instance._reviewed_listings = set(
+    Review.objects.filter(user_id=instance).order_by().values_list('listing_id', flat=True)
+  )
+
+
+@receiver(post_delete, sender=User)
+def refresh_reviewed_listings(sender, instance, **kwargs):
+  Listing.objects.filter(pk__in=getattr(instance, '_reviewed_listings', ())).refresh_review_stats()
@@ -1,14 +1,16 @@
 from celery import shared_task
 import time
 import logging
-from django.db.models import Count
-from datetime import datetime, timedelta
+from django.db.models import Q, Sum
+from django.utils import timezone
+from datetime import timedelta
 from django.core.mail import send_mail
 from django.conf import settings
-from .models import RequestLog, SuspiciousIP
-# import pandas as pd
-# from sklearn.ensemble import IsolationForest
-# 
+from .archive import archive_request_logs, default_archive_dir
+from .models import RequestCounter, SuspiciousIP
+from . import payments, webhooks
+from .reconcile import reconcile_pending_payments as reconcile
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
@@ -41,67 +43,143 @@ def flag_suspicious_ips():
   """
     An hourly Celery task to check for suspicious IP addresses
     based on request volume and access to sensitive paths.
+
+    Reads the per-minute RequestCounter buckets for the last hour rather than
+    the raw RequestLog rows, so its cost tracks the number of active IPs, not
+    the hour's traffic.
   """
   
   logger.info("Starting hourly suspicious IP detection task...")
   
-  one_hour_ago = datetime.now() - timedelta(hours=1)
+  one_hour_ago = timezone.now() - timedelta(hours=1)
   
-  high_volume_ips = RequestLog.objects.filter(
-    timestamp__gte=one_hour_ago
+  window = RequestCounter.objects.filter(
+    minute__gte=one_hour_ago
   ).values('ip_address').annotate(
-    request_count=Count('ip_address')
+    request_count=Sum('request_count'),
+    sensitive_count=Sum('sensitive_count'),
   ).filter(
-    request_count__gt=100
+    Q(request_count__gt=100) | Q(sensitive_count__gt=0)
   ).order_by('-request_count')
 
-
-  for entry in high_volume_ips:
+  flagged = []
+  for entry in window:
     ip = entry['ip_address']
-    reason = f"High request volume: {entry['request_count']} requests in the last hour."
-    SuspiciousIP.objects.get_or_create(ip_address=ip, defaults={'reason': reason})
-    logger.warning(f"Flagged suspicious IP '{ip}' for high request volume.")
+    if entry['request_count'] > 100:
+      reason = f"High request volume: {entry['request_count']} requests in the last hour."
+      logger.warning(f"Flagged suspicious IP '{ip}' for high request volume.")
+    else:
+      reason = f"Accessed sensitive paths {entry['sensitive_count']} time(s) in the last hour."
+      logger.warning(f"Flagged suspicious IP '{ip}' for accessing sensitive paths.")
+    flagged.append(SuspiciousIP(ip_address=ip, reason=reason))
 
-  sensitive_paths = ['/admin/', '/login/', '/api/']
-  
-  suspicious_ips = RequestLog.objects.filter(
-    timestamp__gte=one_hour_ago,
-    path__in=sensitive_paths
-  ).values('ip_address').distinct()
+  # An IP flagged earlier keeps its original reason, as with get_or_create
+  SuspiciousIP.objects.bulk_create(flagged, ignore_conflicts=True)
 
-  for entry in suspicious_ips:
-    ip = entry['ip_address']
-    reason = f"Accessed sensitive path: {entry['path']}."
-    SuspiciousIP.objects.get_or_create(ip_address=ip, defaults={'reason': reason})
-    logger.warning(f"Flagged suspicious IP '{ip}' for accessing sensitive paths.")
-    
-  # all_requests = RequestLog.objects.filter(timestamp__gte=one_hour_ago)
-  # df = pd.DataFrame(list(all_requests.values()))
-  
-  # if not df.empty:
-    # df['path_encoded'] = df['path'].astype('category').cat.codes # mapping the path to numerical values
-    # 
-    # Aggregating data to a per-IP basis
-    # ip_features = df.groupby('ip_address').agg(
-      # request_count=('timestamp', 'count'),
-      # path_uniqueness=('path_encoded', 'nunique')
-    # ).reset_index()
-    # 
-    # X = ip_features[['request_count', 'path_uniqueness']]
-    # model = IsolationForest(contamination=0.5, random_state=42)
-    # model.fit(X)
-    # 
-    # Predicting anomalies (-1 for anomalies, 1 for normal)
-    # predictions = model.predict(X)
-    
-    # Find the IPs that the model has flagged as anomalies
-    # anomalous_ips_df = ip_features[predictions == -1]
-    # 
-    # for index, row in anomalous_ips_df.iterrows():
-      # ip = row['ip_address']
-      # reason = "Detected as an anomaly by the Isolation Forest model."
-      # SuspiciousIP.objects.get_or_create(ip_address=ip, defaults={'reason': reason})
-      # logger.warning(f"Flagged suspicious IP '{ip}' via ML model: {reason}")
-    
-    
-# logger.info("Completed suspicious IP detection task.")
\ No newline at end of file
+  # Buckets older than the window are never read again
+  RequestCounter.objects.filter(minute__lt=one_hour_ago).delete()
+
+
+@shared_task
+def detect_anomalous_ips(contamination=0.01, chunk_size=50000):
+  """
+    An hourly Celery task that flags IPs whose request pattern an
+    IsolationForest model marks as anomalous.
+
+    Features (request count, unique paths, inter-arrival gap mean/std/min)
+    are built per IP from request logs streamed in chunks, so the last hour
+    is never loaded into memory at once.
+  """
+
+  # numpy and scikit-learn stay out of web processes, which import this module
+  from .anomaly import find_anomalous_ips
+
+  logger.info("Starting hourly anomaly detection task...")
+
+  window = timedelta(hours=1)
+  anomalies = find_anomalous_ips(
+    timezone.now() - window,
+    window.total_seconds(),
+    contamination=contamination,
+    chunk_size=chunk_size,
+  )
+
+  reason = "Detected as an anomaly by the Isolation Forest model."
+  SuspiciousIP.objects.bulk_create(
+    [SuspiciousIP(ip_address=ip, reason=f"{reason} (score {score:.3f})") for ip, score in anomalies],
+    ignore_conflicts=True,
+  )
+  for ip, score in anomalies:
+    logger.warning(f"Flagged suspicious IP '{ip}' via ML model: {reason}")
+
+  logger.info("Completed anomaly detection task.")
+
+
+@shared_task
+def archive_expired_request_logs():
+  """
+    A daily Celery task that moves request logs older than the retention
+    period out of the database and into compressed daily archive files.
+  """
+
+  retention = getattr(settings, 'REQUEST_LOG_RETENTION', {})
+  cutoff = timezone.now() - timedelta(days=retention.get('DAYS', 30))
+
+  logger.info(f"Archiving request logs older than {cutoff:%Y-%m-%d %H:%M:%S}...")
+  archived = archive_request_logs(
+    cutoff,
+    default_archive_dir(),
+    chunk_size=retention.get('CHUNK_SIZE', 5000),
+  )
+  logger.info(f"Archived {archived} request logs.")
+
+
+@shared_task(ignore_result=True)
+def initialize_chapa_payment(payment_id, payment_data):
+  """
+    Initialize a payment with Chapa off the request thread. The outcome is
+    recorded on the payment, where the status action reports it.
+  """
+  payment = payments.initialize_payment(payment_id, payment_data)
+  logger.info(f"Chapa initialization for payment {payment_id}: {payment.gateway_state}")
+
+
+@shared_task(ignore_result=True)
+def verify_chapa_payment(payment_id):
+  """
+    Verify a payment with Chapa off the request thread.
+  """
+  payment = payments.verify_payment(payment_id)
+  logger.info(f"Chapa verification for payment {payment_id}: {payment.status}, {payment.gateway_state}")
+
+
+@shared_task(ignore_result=True)
+def reconcile_pending_payments(limit=None):
+  """
+    A scheduled Celery task that verifies payments still pending with
+    Chapa, for checkouts whose verify call or webhook never arrived.
+  """
+  logger.info("Starting pending payment reconciliation...")
+  metrics = reconcile(limit=limit)
+  logger.info(f"Completed pending payment reconciliation: {metrics}")
+  return metrics
+
+
+@shared_task(ignore_result=True)
+def apply_payment_webhooks():
+  """
+    Apply the Chapa webhook events waiting in the inbox to their payments.
+  """
+  processed = webhooks.apply_webhook_events()
+  logger.info(f"Applied {processed} payment webhook events.")
+
+
+@shared_task(ignore_result=True)
+def prune_payment_webhooks():
+  """
+    A daily Celery task that deletes webhook events processed longer ago
+    than the retention period, so the inbox stays small.
+  """
+  cutoff = timezone.now() - timedelta(days=webhooks.webhook_options()['RETENTION_DAYS'])
+  pruned = webhooks.prune_webhook_events(cutoff)
+  logger.info(f"Pruned {pruned} payment webhook events processed before {cutoff:%Y-%m-%d %H:%M:%S}.")
@@ -1,3 +1,877 @@
-from django.test import TestCase
+import csv
+import gzip
+import hashlib
+import hmac
+import io
+import json
+import shutil
+import tempfile
+import time
+from base64 import urlsafe_b64encode
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db.models import Count, Sum
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from . import tasks, transfer, webhooks
+from .archive import archive_path, archive_request_logs, restore_request_logs
+from .geo import nearest, within_radius
+from .management.commands.chapa_stub import start_stub_server
+from .models import (
+    Booking, Listing, ListingSearchStats, ListingSearchTerm, Payment, PaymentGatewayEvent, PaymentWebhookEvent,
+    RequestLog, User,
+)
+from .reconcile import PaymentReconciliation, reconcile_pending_payments
+from .search import SEARCH_BACKENDS
+from .services import ChapaService, build_chapa_session
+
+
+class PaymentListQueryCountTests(TestCase):
+    """
+    Listing payments must not issue a query per payment for its booking
+    details, so the count is the same for 10 payments as for 1000.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='payer', email='payer@example.com', password='secret')
+        cls.listing = Listing.objects.create(
+            user_id=cls.user, title='Loft', description='A loft', price=Decimal('100.00'), location='Lagos'
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_payments(self, count):
+        start = date(2030, 1, 1) + timedelta(days=3 * Booking.objects.count())
+        bookings = Booking.objects.bulk_create([
+            Booking(
+                listing_id=self.listing, user_id=self.user, start_date=start + timedelta(days=3 * i),
+                end_date=start + timedelta(days=3 * i + 2), total_amount=Decimal('200.00'),
+            )
+            for i in range(count)
+        ])
+        Payment.objects.bulk_create([
+            Payment(booking_id=booking, user_id=self.user, amount=booking.total_amount, chapa_tx_ref=f'tx-{booking.pk}')
+            for booking in bookings
+        ])
+
+    def list_payments(self, expected, queries):
+        with self.assertNumQueries(queries):
+            response = self.client.get('/api/v1/payments/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()), expected)
+        self.assertTrue(all(payment['booking_details'] for payment in response.json()))
+
+    def test_payment_list_query_count_is_flat(self):
+        self.create_payments(10)
+        self.list_payments(10, 1)
+
+        self.create_payments(990)
+        self.list_payments(1000, 1)
+
+
+class KeysetPaginationTests(TestCase):
+    """
+    Cursor pages must neither skip nor repeat rows that share the ordering
+    field, and a cursor that was tampered with is a 404, not a 500.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='host', email='host@example.com', password='secret')
+        listings = Listing.objects.bulk_create([
+            Listing(user_id=cls.user, title=f'Loft {i}', description='A loft', price=Decimal('100.00'), location='Lagos')
+            for i in range(7)
+        ])
+        # Every listing shares one created_at, so only the pk orders them
+        Listing.objects.update(created_at=listings[0].created_at)
+        cls.listing_ids = {str(listing.pk) for listing in listings}
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_pages_cover_ties_exactly_once_in_both_directions(self):
+        response = self.client.get('/api/v1/listings/', {'page_size': 2})
+        pages = []
+        while True:
+            self.assertEqual(response.status_code, 200)
+            pages.append([listing['listing_id'] for listing in response.json()['results']])
+            if not response.json()['next']:
+                break
+            response = self.client.get(response.json()['next'])
+
+        seen = [pk for page in pages for pk in page]
+        self.assertEqual(len(seen), len(self.listing_ids))
+        self.assertEqual(set(seen), self.listing_ids)
+
+        previous = self.client.get(response.json()['previous']).json()
+        self.assertEqual([listing['listing_id'] for listing in previous['results']], pages[-2])
+
+    def test_tampered_cursor_is_not_found(self):
+        cursors = [
+            'not-base64!',
+            urlsafe_b64encode(b'{"a": 1}').decode(),
+            urlsafe_b64encode(json.dumps([0, 'yesterday', 'x']).encode()).decode(),
+            urlsafe_b64encode(json.dumps([0, '2030-01-01T00:00:00', {'pk': 1}]).encode()).decode(),
+        ]
+        for cursor in cursors:
+            with self.subTest(cursor=cursor):
+                response = self.client.get('/api/v1/listings/', {'cursor': cursor})
+                self.assertEqual(response.status_code, 404)
+
+
+class BookingDestroyTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.guest = User.objects.create_user(username='guest', email='guest@example.com', password='secret')
+        cls.other = User.objects.create_user(username='other', email='other@example.com', password='secret')
+        listing = Listing.objects.create(
+            user_id=cls.other, title='Loft', description='A loft', price=Decimal('100.00'), location='Lagos'
+        )
+        cls.booking = Booking.objects.create(
+            listing_id=listing, user_id=cls.guest, start_date=date(2030, 1, 1), end_date=date(2030, 1, 3),
+            total_amount=Decimal('200.00'),
+        )
+
+    def test_only_the_guest_can_delete_their_booking(self):
+        client = APIClient()
+        url = f'/api/v1/bookings/{self.booking.pk}/'
+
+        client.force_authenticate(self.other)
+        self.assertEqual(client.delete(url).status_code, 403)
+
+        client.force_authenticate(self.guest)
+        self.assertEqual(client.delete(url).status_code, 204)
+        self.assertFalse(Booking.objects.filter(pk=self.booking.pk).exists())
+        self.assertEqual(client.delete(url).status_code, 404)
+
+
+class BookingOverlapTests(TestCase):
+    """
+    A listing takes one booking per night: overlapping stays are a 409,
+    back-to-back stays are fine, and updates get the same check.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.guest = User.objects.create_user(username='guest', email='guest@example.com', password='secret')
+        cls.listing = Listing.objects.create(
+            user_id=cls.guest, title='Loft', description='A loft', price=Decimal('100.00'), location='Lagos'
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.guest)
+
+    def book(self, start, end):
+        return self.client.post('/api/v1/bookings/', {
+            'listing_id': str(self.listing.pk), 'start_date': start, 'end_date': end,
+        }, format='json')
+
+    def test_overlapping_stays_conflict_and_adjacent_stays_do_not(self):
+        response = self.book('2030-01-10', '2030-01-13')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Decimal(response.json()['total_amount']), Decimal('300.00'))
+
+        for start, end in [('2030-01-09', '2030-01-11'), ('2030-01-12', '2030-01-15'), ('2030-01-11', '2030-01-12')]:
+            with self.subTest(start=start, end=end):
+                self.assertEqual(self.book(start, end).status_code, 409)
+
+        self.assertEqual(self.book('2030-01-07', '2030-01-10').status_code, 201)
+        self.assertEqual(self.book('2030-01-13', '2030-01-14').status_code, 201)
+        self.assertEqual(Booking.objects.filter(listing_id=self.listing).count(), 3)
+
+    def test_update_is_checked_against_the_other_bookings(self):
+        first = self.book('2030-02-01', '2030-02-03').json()['booking_id']
+        self.book('2030-02-05', '2030-02-07')
+
+        url = f'/api/v1/bookings/{first}/'
+        self.assertEqual(self.client.patch(url, {'end_date': '2030-02-06'}, format='json').status_code, 409)
+
+        response = self.client.patch(url, {'end_date': '2030-02-05'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Decimal(response.json()['total_amount']), Decimal('400.00'))
+
+
+class RequestLogArchiveTests(TestCase):
+    """
+    Rows past the cutoff leave the table, and restored rows are deleted
+    again without being appended to their archive a second time.
+    """
+
+    def setUp(self):
+        self.archive_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.archive_dir)
+        self.old = timezone.now() - timedelta(days=40)
+        self.cutoff = timezone.now() - timedelta(days=30)
+        RequestLog.objects.bulk_create(
+            [RequestLog(ip_address='10.0.0.1', path='/api/', timestamp=self.old) for _ in range(5)]
+            + [RequestLog(ip_address='10.0.0.1', path='/api/')]
+        )
+
+    def archived_lines(self):
+        with gzip.open(archive_path(self.archive_dir, self.old.date()), 'rt', encoding='utf-8') as archive:
+            return sum(1 for _ in archive)
+
+    def test_restored_rows_are_deleted_without_being_archived_twice(self):
+        self.assertEqual(archive_request_logs(self.cutoff, self.archive_dir, chunk_size=2), 5)
+        self.assertEqual(RequestLog.objects.count(), 1)
+
+        self.assertEqual(restore_request_logs(archive_path(self.archive_dir, self.old.date())), 5)
+        self.assertEqual(RequestLog.objects.filter(restored=True).count(), 5)
+
+        self.assertEqual(archive_request_logs(self.cutoff, self.archive_dir, chunk_size=2), 0)
+        self.assertEqual(RequestLog.objects.count(), 1)
+        self.assertEqual(self.archived_lines(), 5)
+
+
+class ListingSearchIndexTests(TestCase):
+    """
+    Both search backends follow listing renames and deletes, and the
+    inverted index keeps its corpus statistics equal to its postings.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.host = User.objects.create_user(username='host', email='host@example.com', password='secret')
+
+    def setUp(self):
+        cache.clear()
+
+    def create_listing(self, title, description='A quiet flat'):
+        return Listing.objects.create(
+            user_id=self.host, title=title, description=description, price=Decimal('100.00'), location='Lagos'
+        )
+
+    def search(self, query):
+        response = APIClient().get('/api/v1/listings/', {'q': query})
+        self.assertEqual(response.status_code, 200)
+        return [listing['title'] for listing in response.json()['results']]
+
+    def assert_stats_match_postings(self):
+        stats = ListingSearchStats.objects.get(pk=1)
+        postings = ListingSearchTerm.objects.aggregate(
+            documents=Count('listing_id', distinct=True), length=Sum('frequency')
+        )
+        self.assertEqual((stats.documents, stats.total_length), (postings['documents'], postings['length'] or 0))
+
+    def test_index_follows_renames_and_deletes(self):
+        for backend in SEARCH_BACKENDS:
+            with self.subTest(backend=backend), override_settings(LISTING_SEARCH_BACKEND=backend):
+                SEARCH_BACKENDS[backend].rebuild()
+                with self.captureOnCommitCallbacks(execute=True):
+                    beach = self.create_listing('Beach villa')
+                    self.create_listing('Forest cabin', 'Near the beach')
+                self.assertEqual(self.search('beach'), ['Beach villa', 'Forest cabin'])
+
+                # Each write drops the cached list pages once it commits
+                with self.captureOnCommitCallbacks(execute=True):
+                    beach.title = 'Mountain villa'
+                    beach.save()
+                self.assertEqual(self.search('beach'), ['Forest cabin'])
+                self.assertEqual(self.search('mountain'), ['Mountain villa'])
+
+                with self.captureOnCommitCallbacks(execute=True):
+                    beach.delete()
+                self.assertEqual(self.search('villa'), [])
+                with self.captureOnCommitCallbacks(execute=True):
+                    Listing.objects.all().delete()
+                self.assertEqual(self.search('beach'), [])
+
+    def test_inverted_index_statistics_follow_postings(self):
+        backend = SEARCH_BACKENDS['inverted']
+        with override_settings(LISTING_SEARCH_BACKEND='inverted'):
+            listings = [self.create_listing(f'Loft {i}', 'Sea view ' * i) for i in range(4)]
+            self.assert_stats_match_postings()
+
+            listings[1].description = 'Garden'
+            listings[1].save()
+            listings[2].delete()
+            self.host.delete()
+            self.assert_stats_match_postings()
+
+            host = User.objects.create_user(username='other', email='other@example.com', password='secret')
+            Listing.objects.create(user_id=host, title='Sea loft', description='', price=Decimal('1'), location='Lagos')
+            backend.rebuild()
+            self.assert_stats_match_postings()
+            self.assertEqual(ListingSearchStats.objects.get(pk=1).documents, 1)
+
+
+class ReviewStatsTests(TestCase):
+    """
+    A listing's review count and average follow every review write, and a
+    rebuild that repairs them also refreshes the listing's ETag and cached
+    responses.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.host = User.objects.create_user(username='host', email='host@example.com', password='secret')
+        cls.guests = [
+            User.objects.create_user(username=f'guest{i}', email=f'guest{i}@example.com', password='secret')
+            for i in range(3)
+        ]
+        cls.listing = Listing.objects.create(
+            user_id=cls.host, title='Loft', description='A loft', price=Decimal('100.00'), location='Lagos'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.reviews_url = f'/api/v1/listings/{self.listing.pk}/reviews/'
+
+    def assert_stats(self, count, average):
+        self.listing.refresh_from_db()
+        self.assertEqual((self.listing.review_count, self.listing.avg_rating), (count, average))
+
+    def review(self, guest, rating):
+        self.client.force_authenticate(guest)
+        response = self.client.post(self.reviews_url, {'rating': rating}, format='json')
+        self.assertEqual(response.status_code, 201)
+        return f"{self.reviews_url}{response.json()['review_id']}/"
+
+    def test_stats_follow_review_writes(self):
+        first = self.review(self.guests[0], 5)
+        second = self.review(self.guests[1], 3)
+        self.assert_stats(2, 4.0)
+
+        self.client.force_authenticate(self.guests[0])
+        self.assertEqual(self.client.patch(first, {'rating': 1}, format='json').status_code, 200)
+        self.assert_stats(2, 2.0)
+        self.assertEqual(self.client.post(self.reviews_url, {'rating': 4}, format='json').status_code, 400)
+
+        self.client.force_authenticate(self.guests[1])
+        self.assertEqual(self.client.delete(second).status_code, 204)
+        self.assert_stats(1, 1.0)
+
+        self.client.force_authenticate(self.host)
+        response = self.client.post(f'{self.reviews_url}batch/', [{'rating': 4}, {'rating': 2}], format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assert_stats(1, 1.0)
+
+        self.guests[0].delete()
+        self.assert_stats(0, 0.0)
+
+    def test_rebuild_refreshes_etag_and_cached_response(self):
+        self.review(self.guests[0], 5)
+        # Drift the materialized stats without touching updated_at
+        Listing.objects.filter(pk=self.listing.pk).update(rating_total=1, avg_rating=1.0)
+        url = f'/api/v1/listings/{self.listing.pk}/'
+        stale = APIClient().get(url)
+        self.assertEqual(stale.json()['avg_rating'], 1.0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('rebuild_review_stats', stdout=io.StringIO())
+        self.assert_stats(1, 5.0)
+
+        fresh = APIClient().get(url)
+        self.assertEqual(fresh.json()['avg_rating'], 5.0)
+        self.assertNotEqual(fresh['ETag'], stale['ETag'])
+        self.assertEqual(APIClient().get(url, HTTP_IF_NONE_MATCH=stale['ETag']).status_code, 200)
+
+
+class ListingResponseCacheTests(TestCase):
+    """
+    Repeated list and detail GETs are served from the cache without a
+    query, and a write to a listing drops the list pages and that listing's
+    detail but no other listing's.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.host = User.objects.create_user(username='host', email='host@example.com', password='secret')
+        cls.listings = [
+            Listing.objects.create(
+                user_id=cls.host, title=f'Loft {i}', description='A loft', price=Decimal('100.00'), location='Lagos'
+            )
+            for i in range(3)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def detail_url(self, listing):
+        return f'/api/v1/listings/{listing.pk}/'
+
+    def test_repeated_gets_are_served_from_the_cache(self):
+        first = self.client.get('/api/v1/listings/', {'page_size': 2})
+        detail = self.client.get(self.detail_url(self.listings[0]))
+        with self.assertNumQueries(0):
+            second = self.client.get('/api/v1/listings/', {'page_size': 2})
+            detail_again = self.client.get(self.detail_url(self.listings[0]))
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second['ETag'], first['ETag'])
+        self.assertEqual(detail_again.content, detail.content)
+
+    def test_writes_invalidate_list_and_own_detail_only(self):
+        renamed, untouched = self.listings[0], self.listings[1]
+        self.client.get('/api/v1/listings/')
+        self.client.get(self.detail_url(renamed))
+        self.client.get(self.detail_url(untouched))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            renamed.title = 'Renamed loft'
+            renamed.save()
+
+        with self.assertNumQueries(0):
+            self.client.get(self.detail_url(untouched))
+        self.assertEqual(self.client.get(self.detail_url(renamed)).json()['title'], 'Renamed loft')
+        titles = [listing['title'] for listing in self.client.get('/api/v1/listings/').json()['results']]
+        self.assertIn('Renamed loft', titles)
+
+        url = self.detail_url(renamed)
+        with self.captureOnCommitCallbacks(execute=True):
+            renamed.delete()
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+
+class ListingConditionalGetTests(TestCase):
+    """
+    List and detail responses carry validators derived from ``updated_at``.
+    A matching conditional GET is a bodyless 304 answered with one query,
+    and any change to the filtered listings changes the ETag.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.host = User.objects.create_user(username='host', email='host@example.com', password='secret')
+        cls.cheap, cls.dear = [
+            Listing.objects.create(
+                user_id=cls.host, title=f'Loft {price}', description='A loft', price=Decimal(price), location='Lagos'
+            )
+            for price in ('50.00', '500.00')
+        ]
+
+    def get(self, url, params=None, **headers):
+        # Skip the response cache, so the validators are what answer
+        cache.clear()
+        return APIClient().get(url, params or {}, **headers)
+
+    def test_matching_etag_or_date_is_not_modified(self):
+        response = self.get('/api/v1/listings/')
+        self.assertTrue(response.has_header('ETag') and response.has_header('Last-Modified'))
+
+        cache.clear()
+        with self.assertNumQueries(1):
+            not_modified = APIClient().get('/api/v1/listings/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified.content, b'')
+        self.assertEqual(not_modified['ETag'], response['ETag'])
+
+        since = self.get('/api/v1/listings/', HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(since.status_code, 304)
+
+        detail = self.get(f'/api/v1/listings/{self.cheap.pk}/')
+        self.assertEqual(self.get(f'/api/v1/listings/{self.cheap.pk}/', HTTP_IF_NONE_MATCH=detail['ETag']).status_code, 304)
+
+    def test_etag_follows_changes_to_the_filtered_listings(self):
+        filtered = self.get('/api/v1/listings/', {'max_price': 100})
+        everything = self.get('/api/v1/listings/')
+
+        self.dear.title = 'Penthouse'
+        self.dear.save()
+        self.assertEqual(self.get('/api/v1/listings/', {'max_price': 100}, HTTP_IF_NONE_MATCH=filtered['ETag']).status_code, 304)
+        self.assertEqual(self.get('/api/v1/listings/', HTTP_IF_NONE_MATCH=everything['ETag']).status_code, 200)
+
+        self.cheap.delete()
+        self.assertEqual(self.get('/api/v1/listings/', {'max_price': 100}, HTTP_IF_NONE_MATCH=filtered['ETag']).status_code, 200)
+
+    def test_availability_queries_are_not_conditional(self):
+        response = self.get('/api/v1/listings/', {'check_in': '2030-01-01', 'check_out': '2030-01-03'})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('ETag'))
+
+
+class ListingTransferTests(TestCase):
+    """
+    Imports create or update the caller's listings by ``(title, location)``,
+    never another user's, and exports stream the filtered listings.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(username='owner', email='owner@example.com', password='secret')
+        cls.other = User.objects.create_user(username='other', email='other@example.com', password='secret')
+        cls.taken = Listing.objects.create(
+            user_id=cls.other, title='Taken', description='Theirs', price=Decimal('5.00'), location='Lagos'
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+
+    def upload(self, rows, name='listings.jsonl'):
+        body = '\n'.join(row if isinstance(row, str) else json.dumps(row) for row in rows).encode()
+        response = self.client.post(
+            '/api/v1/listings/import/', {'file': SimpleUploadedFile(name, body)}, format='multipart'
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def row(self, title, **fields):
+        return {'title': title, 'description': 'Imported', 'price': '100.00', 'location': 'Lagos', **fields}
+
+    def test_import_upserts_own_listings_and_rejects_others(self):
+        summary = self.upload([self.row('Loft'), '{not json', self.row('Taken'), self.row('Studio', price='abc')])
+        self.assertEqual((summary['created'], summary['updated'], summary['error_count']), (1, 0, 3))
+        self.assertEqual(sorted(error['line'] for error in summary['errors']), [2, 3, 4])
+
+        summary = self.upload([self.row('Loft', price='150.00')])
+        self.assertEqual((summary['created'], summary['updated']), (0, 1))
+        self.assertEqual(Listing.objects.get(title='Loft').price, Decimal('150.00'))
+
+        self.taken.refresh_from_db()
+        self.assertEqual((self.taken.user_id, self.taken.description), (self.other, 'Theirs'))
+
+    def test_key_taken_during_the_upsert_is_retried_not_overwritten(self):
+        attempts = []
+        geocode = transfer.geocode_listing
+
+        def race(listing):
+            # Another user creates the key between the check and the upsert
+            if not attempts:
+                Listing.objects.create(
+                    user_id=self.other, title='Race', description='Theirs', price=Decimal('5.00'), location='Lagos'
+                )
+            attempts.append(listing.title)
+            return geocode(listing)
+
+        with mock.patch.object(transfer, 'geocode_listing', side_effect=race):
+            summary = self.upload([self.row('Race')])
+
+        # The first attempt saw the other listing after the upsert and was
+        # rolled back, taking the other listing with it in this test
+        self.assertEqual(attempts, ['Race', 'Race'])
+        self.assertEqual(summary['created'], 1)
+        self.assertEqual(Listing.objects.get(title='Race').user_id, self.owner)
+
+    def test_export_streams_the_filtered_listings(self):
+        self.upload([self.row('Loft', type='Loft'), self.row('Studio', type='Studio')])
+
+        response = self.client.get('/api/v1/listings/export/', {'type': 'Loft'})
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(line)['title'] for line in lines], ['Loft'])
+
+        response = self.client.get('/api/v1/listings/export/', {'file_format': 'csv'})
+        rows = list(csv.DictReader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual({row['title'] for row in rows}, {'Taken', 'Loft', 'Studio'})
+        self.assertEqual(self.client.get('/api/v1/listings/export/', {'file_format': 'xml'}).status_code, 400)
+
+
+class GeoSearchTests(TestCase):
+    """
+    Radius and nearest-neighbour queries return geocoded listings nearest
+    first with their distance, and skip listings without coordinates.
+    """
+
+    PLACES = {
+        'Lagos Island': (6.4541, 3.3947),
+        'Ikeja': (6.6018, 3.3515),
+        'Abuja': (9.0765, 7.3986),
+        'London': (51.5072, -0.1276),
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        host = User.objects.create_user(username='host', email='host@example.com', password='secret')
+        for title, (latitude, longitude) in cls.PLACES.items():
+            Listing.objects.create(
+                user_id=host, title=title, description='A flat', price=Decimal('100.00'), location=title,
+                latitude=latitude, longitude=longitude,
+            )
+        Listing.objects.create(
+            user_id=host, title='Unknown', description='A flat', price=Decimal('100.00'), location='Nowhere at all'
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def get(self, **params):
+        response = APIClient().get('/api/v1/listings/', params)
+        self.assertEqual(response.status_code, 200)
+        return [(listing['title'], listing['distance_km']) for listing in response.json()['results']]
+
+    def test_radius_returns_nearest_first_with_distances(self):
+        results = self.get(lat=6.4541, lng=3.3947, radius_km=25)
+        self.assertEqual([title for title, _ in results], ['Lagos Island', 'Ikeja'])
+        self.assertAlmostEqual(results[0][1], 0.0, places=3)
+        self.assertTrue(15 < results[1][1] < 19)
+
+        results = self.get(lat=6.4541, lng=3.3947, radius_km=1000)
+        self.assertEqual([title for title, _ in results], ['Lagos Island', 'Ikeja', 'Abuja'])
+        self.assertTrue(500 < results[2][1] < 600)
+
+    def test_nearest_widens_until_it_has_enough_listings(self):
+        results = self.get(lat=51.0, lng=0.0)
+        self.assertEqual([title for title, _ in results], ['London', 'Abuja', 'Ikeja', 'Lagos Island'])
+
+        listings = Listing.objects.all()
+        self.assertEqual([listing.title for listing in nearest(listings, 6.5, 3.38, 2).order_by('distance_km')], ['Lagos Island', 'Ikeja'])
+        self.assertEqual(within_radius(listings, 0.0, -150.0, 500).count(), 0)
+
+    def test_bounding_box_and_invalid_points(self):
+        response = APIClient().get('/api/v1/listings/', {'bbox': '5,2,10,8'})
+        self.assertEqual({listing['title'] for listing in response.json()['results']}, {'Lagos Island', 'Ikeja', 'Abuja'})
+        self.assertEqual(APIClient().get('/api/v1/listings/', {'lat': 95, 'lng': 0}).status_code, 400)
+
+
+class ChapaClientTests(SimpleTestCase):
+    """
+    ``ChapaService`` against a local stub Chapa server: one kept-alive
+    connection, GETs retried through 503s, POSTs sent once, and stalled
+    responses given up on after the read timeout.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server, cls.base_url = start_stub_server(slow_seconds=2)
+        cls.addClassCleanup(cls.server.server_close)
+        cls.addClassCleanup(cls.server.shutdown)
+
+    def service(self, **options):
+        settings = {'BASE_URL': self.base_url, 'RETRY_BACKOFF': 0.01, 'RETRY_JITTER': 0.01, **options}
+        with override_settings(CHAPA_HTTP=settings):
+            session = build_chapa_session()
+            # Proxies from the environment would intercept the local stub
+            session.trust_env = False
+            service = ChapaService(session=session)
+        self.addCleanup(session.close)
+        return service
+
+    def test_calls_share_one_kept_alive_connection(self):
+        service = self.service()
+        self.server.connections = 0
+        for i in range(5):
+            response = service.verify_payment(f'pooled-{i}')
+            self.assertEqual(response['data']['status'], 'success')
+        self.assertEqual(self.server.connections, 1)
+
+    def test_verify_is_retried_through_server_errors(self):
+        response = self.service().verify_payment('flaky-verify')
+        self.assertEqual(response['data']['reference'], 'ref-flaky-verify')
+        self.assertEqual(self.server.hits['flaky-verify'], 3)
+
+    def test_initialize_is_sent_once(self):
+        payment_data = {
+            'amount': '100.00', 'email': 'guest@example.com', 'first_name': 'Ada', 'last_name': 'Obi',
+            'tx_ref': 'flaky-initialize', 'return_url': 'https://example.com/return',
+        }
+        self.assertIsNone(self.service().initialize_payment(payment_data))
+        self.assertEqual(self.server.hits['flaky-initialize'], 1)
+
+    def test_stalled_response_times_out(self):
+        service = self.service(READ_TIMEOUT=0.2, RETRIES=1)
+        start = time.perf_counter()
+        self.assertIsNone(service.verify_payment('slow-verify'))
+        self.assertLess(time.perf_counter() - start, 1.5)
+
+
+@override_settings(PAYMENT_WEBHOOKS={'SECRET': 'webhook-secret'}, PAYMENT_GATEWAY_ASYNC=False)
+class PaymentWebhookTests(TestCase):
+    """
+    Chapa webhooks carry no credentials: the body HMAC is the only thing
+    that authenticates them. Without a broker the event is applied before
+    the response, and redeliveries are stored once.
+    """
+
+    url = '/api/v1/payments/webhook/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='payer', email='payer@example.com', password='secret')
+        listing = Listing.objects.create(
+            user_id=cls.user, title='Loft', description='A loft', price=Decimal('100.00'), location='Lagos'
+        )
+        booking = Booking.objects.create(
+            listing_id=listing, user_id=cls.user, start_date=date(2030, 1, 1), end_date=date(2030, 1, 2),
+            total_amount=Decimal('100.00')
+        )
+        cls.payment = Payment.objects.create(
+            booking_id=booking, user_id=cls.user, amount=Decimal('100.00'), chapa_tx_ref='tx-webhook'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.event = {'tx_ref': 'tx-webhook', 'status': 'success', 'reference': 'CH-1', 'method': 'card'}
+
+    def deliver(self, payload, secret='webhook-secret', **headers):
+        body = json.dumps(payload).encode()
+        if secret is not None:
+            headers.setdefault(
+                'HTTP_X_CHAPA_SIGNATURE', hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+            )
+        return APIClient().post(self.url, body, content_type='application/json', **headers)
+
+    def test_signed_delivery_is_applied_without_a_broker(self):
+        response = self.deliver(self.event)
+        self.assertEqual(response.status_code, 200)
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, 'completed')
+        self.assertIsNotNone(PaymentWebhookEvent.objects.get().processed_at)
+
+    def test_unsigned_or_missigned_delivery_is_refused(self):
+        secret_hash = hmac.new(b'webhook-secret', b'webhook-secret', hashlib.sha256).hexdigest()
+        for response in (
+            self.deliver(self.event, secret=None),
+            self.deliver(self.event, secret='other-secret'),
+            self.deliver(self.event, secret=None, HTTP_CHAPA_SIGNATURE=secret_hash),
+        ):
+            self.assertEqual(response.status_code, 403)
+        self.assertFalse(PaymentWebhookEvent.objects.exists())
+
+    @override_settings(PAYMENT_WEBHOOKS={})
+    def test_deliveries_are_refused_without_a_secret(self):
+        with self.assertLogs('listings.webhooks', 'ERROR'):
+            response = self.deliver(self.event, secret='')
+        self.assertEqual(response.status_code, 403)
+
+    def test_non_object_body_is_rejected(self):
+        self.assertEqual(self.deliver([self.event]).status_code, 400)
+        self.assertEqual(self.deliver('tx-webhook').status_code, 400)
+
+    def test_unknown_payment_writes_nothing(self):
+        response = self.deliver({**self.event, 'tx_ref': 'tx-unknown'})
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(PaymentWebhookEvent.objects.exists())
+
+    def test_redelivery_is_stored_once(self):
+        for _ in range(3):
+            self.assertEqual(self.deliver(self.event).status_code, 200)
+        self.assertEqual(PaymentWebhookEvent.objects.count(), 1)
+        self.assertEqual(PaymentGatewayEvent.objects.filter(kind='webhook').count(), 1)
+
+    @override_settings(PAYMENT_GATEWAY_ASYNC=True)
+    def test_worker_applies_events_when_async(self):
+        with mock.patch.object(tasks.apply_payment_webhooks, 'apply_async') as apply_async:
+            self.assertEqual(self.deliver(self.event).status_code, 200)
+            self.assertEqual(self.deliver({**self.event, 'reference': 'CH-2'}).status_code, 200)
+        apply_async.assert_called_once()
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, 'pending')
+
+        tasks.apply_payment_webhooks()
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, 'completed')
+        self.assertFalse(PaymentWebhookEvent.objects.filter(processed_at__isnull=True).exists())
+
+    def test_prune_keeps_recent_and_unprocessed_events(self):
+        self.deliver(self.event)
+        PaymentWebhookEvent.objects.update(processed_at=timezone.now() - timedelta(days=10))
+        self.deliver({**self.event, 'reference': 'CH-2'})
+        PaymentWebhookEvent.objects.create(tx_ref='tx-webhook', event_id='queued', payload=self.event)
+
+        self.assertEqual(webhooks.prune_webhook_events(timezone.now() - timedelta(days=7), chunk_size=1), 1)
+        self.assertEqual(PaymentWebhookEvent.objects.count(), 2)
+
+
+class PaymentReconciliationTests(TestCase):
+    """
+    The sweep verifies old pending checkouts against Chapa (here the stub
+    server), applies what it reports, and never overwrites a payment that
+    was settled while Chapa was being asked.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server, cls.base_url = start_stub_server()
+        cls.addClassCleanup(cls.server.server_close)
+        cls.addClassCleanup(cls.server.shutdown)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='payer', email='payer@example.com', password='secret')
+        cls.listing = Listing.objects.create(
+            user_id=cls.user, title='Loft', description='A loft', price=Decimal('100.00'), location='Lagos'
+        )
+
+    def setUp(self):
+        self.nights = 0
+
+    def payment(self, tx_ref, age=timedelta(hours=1), checkout=True):
+        start = date(2030, 1, 1) + timedelta(days=2 * self.nights)
+        self.nights += 1
+        booking = Booking.objects.create(
+            listing_id=self.listing, user_id=self.user, start_date=start, end_date=start + timedelta(days=1),
+            total_amount=Decimal('100.00')
+        )
+        payment = Payment.objects.create(
+            booking_id=booking, user_id=self.user, amount=Decimal('100.00'), chapa_tx_ref=tx_ref,
+            chapa_checkout_url=f'https://checkout.example/{tx_ref}' if checkout else None
+        )
+        Payment.objects.filter(pk=payment.pk).update(created_at=timezone.now() - age)
+        return payment
+
+    def service(self):
+        with override_settings(CHAPA_HTTP={'BASE_URL': self.base_url, 'RETRY_BACKOFF': 0.01, 'RETRY_JITTER': 0.01}):
+            session = build_chapa_session()
+            # Proxies from the environment would intercept the local stub
+            session.trust_env = False
+            service = ChapaService(session=session)
+        self.addCleanup(session.close)
+        return service
+
+    def reconcile(self, **options):
+        return reconcile_pending_payments(service=self.service(), workers=2, chunk_size=2, **options)
+
+    def status(self, payment):
+        payment.refresh_from_db()
+        return payment.status
+
+    def test_pending_payments_follow_the_gateway(self):
+        paid = self.payment('paid-1')
+        flaky = self.payment('flaky-reconcile')
+        failed = self.payment('failed-1')
+        abandoned = self.payment('pending-old', age=timedelta(days=2))
+        waiting = self.payment('pending-new')
+        recent = self.payment('paid-recent', age=timedelta(minutes=1))
+        unsent = self.payment('paid-unsent', checkout=False)
+
+        summary = self.reconcile()
+
+        self.assertEqual(
+            {key: summary[key] for key in ('scanned', 'completed', 'failed', 'cancelled', 'unchanged', 'errors')},
+            {'scanned': 5, 'completed': 2, 'failed': 1, 'cancelled': 1, 'unchanged': 1, 'errors': 0},
+        )
+        self.assertEqual(self.status(paid), 'completed')
+        self.assertEqual((paid.transaction_id, paid.payment_method), ('ref-paid-1', 'telebirr'))
+        self.assertIsNotNone(paid.completed_at)
+        self.assertEqual(self.status(flaky), 'completed')
+        self.assertEqual(self.status(failed), 'failed')
+        self.assertEqual(self.status(abandoned), 'cancelled')
+        for payment in (waiting, recent, unsent):
+            self.assertEqual(self.status(payment), 'pending')
+        self.assertEqual(PaymentGatewayEvent.objects.filter(kind='verification').count(), 4)
+
+    def test_limit_caps_the_payments_checked(self):
+        for i in range(5):
+            self.payment(f'paid-{i}')
+        self.assertEqual(self.reconcile(limit=3)['scanned'], 3)
+        self.assertEqual(Payment.objects.filter(status='pending').count(), 2)
+
+    def test_payment_settled_meanwhile_is_kept(self):
+        payment = self.payment('paid-1')
+        apply = PaymentReconciliation.apply
+
+        # A webhook lands between the verify call and the write
+        def settle_then_apply(reconciliation, chunk, responses, expire_before):
+            Payment.objects.filter(pk=payment.pk).update(status='failed')
+            return apply(reconciliation, chunk, responses, expire_before)
+
+        with mock.patch.object(PaymentReconciliation, 'apply', settle_then_apply):
+            summary = self.reconcile()
+        self.assertEqual((summary['completed'], summary['unchanged']), (0, 1))
+        self.assertEqual(self.status(payment), 'failed')
+        self.assertFalse(PaymentGatewayEvent.objects.exists())
@@ -0,0 +1,247 @@
+import csv
+import io
+import json
+
+from rest_framework import serializers
+from rest_framework.utils.encoders import JSONEncoder
+
+from .cache import listing_cache
+from .db import locking_atomic
+from .geo import geocode_listing
+from .models import Listing, ListingAmenity
+from .search import index_listings
+from .serializers import ListingSerializer
+
+
+FILE_FORMATS = ('jsonl', 'csv')
+IMPORT_CHUNK_SIZE = 500
+MAX_REPORTED_ERRORS = 1000
+# Tries per chunk when another user takes one of its keys mid-upsert
+UPSERT_ATTEMPTS = 3
+
+# Columns written on conflict; the (title, location) key, owner, creation
+# time and review aggregates of an existing listing are kept.
+UPSERT_FIELDS = [
+  'description', 'price', 'num_bedrooms', 'num_bathrooms', 'type', 'amenities',
+  'latitude', 'longitude', 'geohash', 'updated_at',
+]
+
+
+class KeyTaken(Exception):
+  """
+  Another user created a listing with one of the chunk's keys during the
+  upsert.
+  """
+
+
+class ListingImportSerializer(ListingSerializer):
+  """
+  ``ListingSerializer`` without the per-row ``(title, location)`` uniqueness
+  query. The importer resolves those keys for a whole chunk at once and
+  upserts them.
+  """
+
+  class Meta(ListingSerializer.Meta):
+    validators = []
+
+
+def file_format(name, requested=None):
+  if requested:
+    return requested
+  return 'csv' if (name or '').lower().endswith('.csv') else 'jsonl'
+
+
+def iter_jsonl_rows(stream):
+  """
+  Yield ``(line, row, error)`` for each non-blank line of a JSONL stream.
+  """
+  for line, text in enumerate(io.TextIOWrapper(stream, encoding='utf-8-sig'), start=1):
+    if not text.strip():
+      continue
+    try:
+      row = json.loads(text)
+    except ValueError as e:
+      yield line, None, f"Invalid JSON: {e}"
+      continue
+    if not isinstance(row, dict):
+      yield line, None, "Expected a JSON object."
+      continue
+    yield line, row, None
+
+
+def iter_csv_rows(stream):
+  """
+  Yield ``(line, row, error)`` for each data row of a CSV stream with a
+  header row. Empty cells are treated as missing. ``amenities`` is either a
+  JSON array or a comma-separated list.
+  """
+  reader = csv.DictReader(io.TextIOWrapper(stream, encoding='utf-8-sig', newline=''))
+  for row in reader:
+    row = {name: value for name, value in row.items() if name and value not in (None, '')}
+    amenities = row.get('amenities')
+    if amenities is not None:
+      try:
+        row['amenities'] = json.loads(amenities) if amenities.lstrip().startswith('[') else [
+          item.strip() for item in amenities.split(',') if item.strip()
+        ]
+      except ValueError as e:
+        yield reader.line_num, None, f"Invalid amenities: {e}"
+        continue
+    yield reader.line_num, row, None
+
+
+ROW_READERS = {'jsonl': iter_jsonl_rows, 'csv': iter_csv_rows}
+
+
+class ListingImport:
+  """
+  Streams rows into ``Listing`` in chunks of ``chunk_size``.
+
+  Each chunk is validated by one reused ``ListingImportSerializer``. Its
+  existing ``(title, location)`` keys are locked and read in one query and
+  the valid rows are upserted with a single
+  ``bulk_create(update_conflicts=True)`` in the same transaction. Rows whose
+  key belongs to another user's listing are rejected. Amenity and search indexes and the response cache are updated
+  per chunk, since bulk writes skip model signals.
+  """
+
+  def __init__(self, user, chunk_size=IMPORT_CHUNK_SIZE):
+    self.user = user
+    self.chunk_size = chunk_size
+    self.serializer = ListingImportSerializer()
+    self.created = self.updated = self.error_count = 0
+    self.errors = []
+
+  def add_error(self, line, errors):
+    self.error_count += 1
+    if len(self.errors) < MAX_REPORTED_ERRORS:
+      self.errors.append({'line': line, 'errors': errors})
+
+  def run(self, rows):
+    chunk = []
+    for line, row, error in rows:
+      if error:
+        self.add_error(line, {'non_field_errors': [error]})
+        continue
+      chunk.append((line, row))
+      if len(chunk) >= self.chunk_size:
+        self.write_chunk(chunk)
+        chunk = []
+    if chunk:
+      self.write_chunk(chunk)
+    return self.summary()
+
+  def summary(self):
+    return {
+      'created': self.created,
+      'updated': self.updated,
+      'error_count': self.error_count,
+      'errors': self.errors,
+    }
+
+  def write_chunk(self, chunk):
+    listings = {}
+    for line, row in chunk:
+      try:
+        data = self.serializer.run_validation(row)
+      except serializers.ValidationError as e:
+        self.add_error(line, e.detail)
+        continue
+      # A later row with the same key replaces an earlier one
+      listings[(data['title'], data['location'])] = (line, Listing(user_id=self.user, **data))
+    if not listings:
+      return
+
+    for _ in range(UPSERT_ATTEMPTS):
+      try:
+        with locking_atomic():
+          rejected, batch, updated = self.upsert(listings)
+      except KeyTaken:
+        continue
+      break
+    else:
+      for line, _ in listings.values():
+        self.add_error(line, {'non_field_errors': ["Listings with these keys kept changing during the import; try again."]})
+      return
+
+    for line in rejected:
+      self.add_error(line, {'non_field_errors': ["A listing with this title and location belongs to another user."]})
+    self.updated += len(updated)
+    self.created += len(batch) - len(updated)
+
+  def upsert(self, listings):
+    """
+    Upsert the importer's rows of ``listings`` and return ``(rejected
+    lines, written listings, (listing, pk) of the updated ones)``.
+
+    The existing keys are locked while their owners are checked. A listing
+    another user creates with one of the keys after that check would be
+    overwritten by the upsert, so ownership is checked again afterwards and
+    ``KeyTaken`` rolls the chunk back to be tried again.
+    """
+    titles = {title for title, _ in listings}
+    locations = {location for _, location in listings}
+    keys = Listing.objects.filter(title__in=titles, location__in=locations)
+    existing = {
+      (title, location): (pk, owner)
+      for pk, title, location, owner in keys.select_for_update().values_list('pk', 'title', 'location', 'user_id')
+    }
+
+    rejected, batch, updated = [], [], []
+    for key, (line, listing) in listings.items():
+      if key in existing:
+        pk, owner = existing[key]
+        if owner != self.user.pk:
+          rejected.append(line)
+          continue
+        updated.append((listing, pk))
+      batch.append(geocode_listing(listing))
+    if not batch:
+      return rejected, batch, updated
+
+    Listing.objects.bulk_create(
+      batch, update_conflicts=True, unique_fields=['title', 'location'], update_fields=UPSERT_FIELDS
+    )
+    written = {(listing.title, listing.location) for listing in batch}
+    if any(
+      (title, location) in written and owner != self.user.pk
+      for title, location, owner in keys.values_list('title', 'location', 'user_id')
+    ):
+      raise KeyTaken()
+
+    # Conflicting rows kept their stored primary key, not the fresh one
+    for listing, pk in updated:
+      listing.pk = pk
+    ListingAmenity.objects.sync(batch)
+    index_listings(batch)
+    listing_cache.invalidate([pk for _, pk in updated])
+    return rejected, batch, updated
+
+
+def import_listings(stream, user, file_format='jsonl', chunk_size=IMPORT_CHUNK_SIZE):
+  return ListingImport(user, chunk_size=chunk_size).run(ROW_READERS[file_format](stream))
+
+
+def export_listings(queryset, file_format='jsonl', chunk_size=2000):
+  """
+  Yield the serialized listings of ``queryset`` as JSONL lines or CSV rows.
+  Rows are read through ``.iterator()``, so only one chunk is in memory.
+  """
+  serializer = ListingSerializer()
+  rows = (serializer.to_representation(listing) for listing in queryset.iterator(chunk_size=chunk_size))
+
+  if file_format == 'jsonl':
+    for row in rows:
+      yield json.dumps(row, cls=JSONEncoder) + '\n'
+    return
+
+  buffer = io.StringIO()
+  writer = csv.DictWriter(buffer, fieldnames=ListingSerializer.Meta.fields, extrasaction='ignore')
+  writer.writeheader()
+  for row in rows:
+    row['amenities'] = json.dumps(row['amenities'] or [])
+    writer.writerow(row)
+    yield buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+  yield buffer.getvalue()
@@ -1,10 +1,11 @@
 from django.urls import path, include
-from .views import (ListingViewSet, BookingViewSet, PaymentViewSet)
+from .views import (ListingViewSet, ReviewViewSet, BookingViewSet, PaymentViewSet)
 from rest_framework import routers
 
 router = routers.DefaultRouter()
 
 router.register(r'listings', ListingViewSet, basename='listing')
+router.register(r'listings/(?P<listing_pk>[^/.]+)/reviews', ReviewViewSet, basename='listing-review')
 router.register(r'bookings', BookingViewSet, basename='booking')
 router.register(r'payments', PaymentViewSet, basename='payment')
 
@@ -1,20 +1,35 @@
-from datetime import datetime, timezone
 from django.shortcuts import render
 
-from .models import Payment, User, Listing, Booking
+from .models import Payment, User, Listing, Booking, Review
 from .serializers import (
   BookingSerializer, ListingSerializer, CusttomTokenObtainSerializer, 
-  PaymentSerializer, UserRegisterSerializer, PaymentInitiateSerializer, PaymentVerifySerializer
+  PaymentSerializer, UserRegisterSerializer, PaymentInitiateSerializer, PaymentVerifySerializer,
+  AvailabilitySerializer, ReviewSerializer, ReviewBatchSerializer, ListingValuesSerializer, BookingValuesSerializer
   )
-from rest_framework import viewsets, filters, status
+from rest_framework import viewsets, filters, generics, status
 from rest_framework.response import Response
 from rest_framework import serializers
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework_simplejwt.views import TokenObtainPairView
 from rest_framework.exceptions import PermissionDenied
-from .services import ChapaService
+from . import payments, webhooks
+from .tasks import apply_payment_webhooks, initialize_chapa_payment, verify_chapa_payment
+from .pagination import (
+  ListingCursorPagination, ListingRatingCursorPagination, BookingCursorPagination, RankedCursorPagination,
+  ReviewCursorPagination
+  )
+from .filters import ListingFilterBackend, ListingGeoFilter, ListingSearchFilter, listing_facets
+from .cache import detail_scope, listing_cache
+from .conditional import not_modified, queryset_validators, validator_headers
+from .transfer import FILE_FORMATS, export_listings, file_format, import_listings
+from .db import locking_atomic
 from rest_framework.decorators import action
+from rest_framework.reverse import reverse
+from rest_framework.parsers import MultiPartParser
 from django.shortcuts import get_object_or_404
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.http import StreamingHttpResponse
 # from .tasks import send_payment_confirmation_email, send_booking_confirmation_email
 from decimal import Decimal
 # from django_ratelimit.decorators import ratelimit
@@ -87,13 +102,79 @@ class UserRegistrationView(viewsets.ModelViewSet):
                 "error": str(e)
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+class ValuesListMixin:
+  """
+  Serve ``list`` through ``values_serializer_class``: rows are read with
+  ``values_list`` and rendered without building model instances or running
+  the ``ModelSerializer`` per row.
+  """
+
+  values_serializer_class = None
+
+  def list(self, request, *args, **kwargs):
+    values_serializer = self.values_serializer_class() # type: ignore
+    rows = values_serializer.values(self.filter_queryset(self.get_queryset())) # type: ignore
+
+    page = self.paginate_queryset(rows) # type: ignore
+    if page is not None:
+      return self.get_paginated_response(values_serializer.many(page)) # type: ignore
+    return Response(values_serializer.many(rows))
+
 # @method_decorator(ratelimit(key='ip', rate='10/m', method='GET', block=True), name='dispatch')
-class ListingViewSet(viewsets.ModelViewSet):
+class ListingViewSet(ValuesListMixin, viewsets.ModelViewSet):
     """API Endpoint for Listing all properties & other crud operations"""
     
     queryset = Listing.objects.all().order_by('created_at')
     serializer_class = ListingSerializer
+    values_serializer_class = ListingValuesSerializer
     permission_classes = [AllowAny]
+    pagination_class = ListingCursorPagination
+    filter_backends = [ListingFilterBackend, ListingSearchFilter, ListingGeoFilter]
+    sort_paginators = {
+        'created': ListingCursorPagination,
+        'rating': ListingRatingCursorPagination,
+    }
+
+    @property
+    def paginator(self):
+        """
+        Search and proximity results are ordered by rank or distance, not
+        ``created_at``, so they page by offset into the ranked list.
+        ``?sort=rating`` pages by the materialized ``avg_rating``.
+        """
+        if not hasattr(self, '_paginator'):
+            ranked = self.request.query_params.get(ListingSearchFilter.search_param, '').strip()
+            sort = self.request.query_params.get('sort', 'created')
+            if ranked or ListingGeoFilter.is_ranked(self.request):
+                self._paginator = RankedCursorPagination()
+            elif sort in self.sort_paginators:
+                self._paginator = self.sort_paginators[sort]()
+            else:
+                raise serializers.ValidationError({'sort': f"Must be one of: {', '.join(self.sort_paginators)}."})
+        return self._paginator
+
+    def get_queryset(self): # type: ignore
+        """
+        Narrow the catalog to listings free for the whole stay when
+        ``?check_in=&check_out=`` are supplied.
+
+        The result is kept for the rest of the request, so the conditional
+        check and the handler filter the same queryset.
+        """
+        if hasattr(self, '_queryset'):
+            return self._queryset
+        queryset = super().get_queryset()
+        params = self.request.query_params
+        
+        if self.action in ('list', 'facets') and ('check_in' in params or 'check_out' in params):
+            availability = AvailabilitySerializer(data=params)
+            availability.is_valid(raise_exception=True)
+            queryset = queryset.available(
+                availability.validated_data['check_in'], # type: ignore
+                availability.validated_data['check_out'], # type: ignore
+            )
+        self._queryset = queryset
+        return queryset
     
     def perform_create(self, serializer):
         if not self.request.user or not self.request.user.is_authenticated:
@@ -101,12 +182,235 @@ class ListingViewSet(viewsets.ModelViewSet):
         user = self.request.user
         serializer.save(user_id=user)
 
-class BookingViewSet(viewsets.ModelViewSet):
+    def filter_queryset(self, queryset):
+        # Conditional GETs filter before the handler does; run the backends
+        # once per queryset rather than once per call
+        source, filtered = getattr(self, '_filtered_queryset', (None, None))
+        if source is not queryset:
+            filtered = super().filter_queryset(queryset)
+            self._filtered_queryset = (queryset, filtered)
+        return filtered
+
+    def is_conditional(self, request):
+        """
+        List and detail GETs can be cached and revalidated. Date
+        availability depends on bookings, not just listings, so those
+        queries are left out.
+        """
+        if self.action not in ('list', 'retrieve'):
+            return False
+        return 'check_in' not in request.query_params and 'check_out' not in request.query_params
+
+    def response_cache_key(self, request):
+        """
+        Key for the cached JSON body of a list or detail response.
+        """
+        if request.accepted_renderer.format != 'json':
+            return None
+        scope = 'list' if self.action == 'list' else detail_scope(self.kwargs.get('pk'))
+        return scope and listing_cache.key(request, scope)
+
+    def response_validators(self):
+        """
+        ``(etag, last_modified)`` for the filtered listings behind this
+        response, from one ``MAX(updated_at), COUNT(*)`` query.
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+        if self.action == 'retrieve':
+            try:
+                queryset = queryset.filter(pk=self.kwargs.get('pk'))
+            except (ValueError, ValidationError):
+                return None
+        etag, last_modified = queryset_validators(queryset)
+        if self.action == 'retrieve' and last_modified is None:
+            # Not found: let the handler produce the 404
+            return None
+        return etag, last_modified
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(super().retrieve, request, *args, **kwargs)
+
+    def conditional_response(self, handler, request, *args, **kwargs):
+        """
+        Serve from the response cache, else answer conditional requests
+        from the validators with a 304 before anything is serialized.
+        """
+        self.cache_key, self.validators = None, None
+        if not self.is_conditional(request):
+            return handler(request, *args, **kwargs)
+
+        self.cache_key = self.response_cache_key(request)
+        if self.cache_key:
+            cached = listing_cache.respond(request, self.cache_key)
+            if cached is not None:
+                self.cache_key = None
+                return cached
+
+        self.validators = self.response_validators()
+        if self.validators:
+            response = not_modified(request, *self.validators)
+            if response is not None:
+                self.cache_key = None
+                for name, value in validator_headers(*self.validators).items():
+                    response[name] = value
+                return response
+        return handler(request, *args, **kwargs)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if isinstance(response, Response) and response.status_code == 200:
+            if getattr(self, 'validators', None):
+                for name, value in validator_headers(*self.validators).items():
+                    response[name] = value
+            if getattr(self, 'cache_key', None):
+                listing_cache.store(self.cache_key, response)
+        return response
+
+    @action(detail=False, methods=['get'])
+    def facets(self, request):
+        """
+        Facet counts (type, price bucket, bedrooms, location, amenities)
+        for the listings matching the current filters.
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+        return Response(listing_facets(queryset))
+
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=[MultiPartParser])
+    def bulk_import(self, request):
+        """
+        Create or update the caller's listings from an uploaded JSONL or CSV
+        ``file``. The format follows the file extension unless a
+        ``file_format`` field says otherwise. Rows are keyed on
+        ``(title, location)`` and invalid rows are reported by line.
+        """
+        if not request.user or not request.user.is_authenticated:
+            raise PermissionDenied("Unauthorized action")
+
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'detail': 'Upload the listings as a "file" field.'}, status=status.HTTP_400_BAD_REQUEST)
+        fmt = file_format(upload.name, request.data.get('file_format'))
+        if fmt not in FILE_FORMATS:
+            return Response(
+                {'detail': f"file_format must be one of: {', '.join(FILE_FORMATS)}."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        summary = import_listings(upload, request.user, file_format=fmt)
+        return Response(summary, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['get'], url_path='export')
+    def export(self, request):
+        """
+        Stream the listings matching the current filters as JSONL
+        (``?file_format=jsonl``, the default) or CSV.
+        """
+        fmt = request.query_params.get('file_format', 'jsonl')
+        if fmt not in FILE_FORMATS:
+            return Response(
+                {'detail': f"file_format must be one of: {', '.join(FILE_FORMATS)}."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        queryset = self.filter_queryset(self.get_queryset())
+        content_type = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+        response = StreamingHttpResponse(export_listings(queryset, fmt), content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="listings.{fmt}"'
+        return response
+
+class ReviewViewSet(viewsets.ModelViewSet):
+    """API Endpoint for the reviews of one listing, newest first"""
+
+    serializer_class = ReviewSerializer
+    pagination_class = ReviewCursorPagination
+    max_batch_size = 500
+
+    def get_permissions(self):
+        if self.action in ('list', 'retrieve'):
+            return [AllowAny()]
+        return [IsAuthenticated()]
+
+    @property
+    def listing(self):
+        if not hasattr(self, '_listing'):
+            self._listing = generics.get_object_or_404(Listing.objects.only('pk'), pk=self.kwargs['listing_pk'])
+        return self._listing
+
+    def get_queryset(self): # type: ignore
+        return Review.objects.filter(listing_id=self.listing)
+
+    def perform_create(self, serializer):
+        self.reject_repeat_reviews([self.request.user.pk])
+        try:
+            with transaction.atomic():
+                serializer.save(listing_id=self.listing, user_id=self.request.user)
+        except IntegrityError:
+            raise serializers.ValidationError({'detail': 'You have already reviewed this listing.'})
+
+    def reject_repeat_reviews(self, user_pks):
+        """
+        Each user reviews a listing at most once, so one user cannot move its
+        average rating with a stream of reviews.
+        """
+        if len(set(user_pks)) < len(user_pks):
+            raise serializers.ValidationError({'detail': 'A user can review a listing only once.'})
+        if Review.objects.filter(listing_id=self.listing, user_id__in=user_pks).exists():
+            raise serializers.ValidationError({'detail': 'A user in this request has already reviewed this listing.'})
+
+    def perform_update(self, serializer):
+        if serializer.instance.user_id_id != self.request.user.pk:
+            raise PermissionDenied("Unauthorized action")
+        serializer.save()
+
+    def perform_destroy(self, instance):
+        if instance.user_id_id != self.request.user.pk:
+            raise PermissionDenied("Unauthorized action")
+        instance.delete()
+
+    @action(detail=False, methods=['post'])
+    def batch(self, request, listing_pk=None):
+        """
+        Submit many reviews for the listing at once. All of them are inserted
+        in one transaction with a single bulk INSERT, or none are. Only staff
+        may attribute reviews to other users (``user_id``), since each user
+        reviews a listing once.
+        """
+        if not isinstance(request.data, list) or not request.data:
+            return Response({'detail': 'Expected a non-empty list of reviews.'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(request.data) > self.max_batch_size:
+            return Response(
+                {'detail': f'At most {self.max_batch_size} reviews can be submitted at once.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        serializer = ReviewBatchSerializer(data=request.data, many=True, context=self.get_serializer_context())
+        serializer.is_valid(raise_exception=True)
+        reviews = []
+        for data in serializer.validated_data: # type: ignore
+            user = data.pop('user_id', None)
+            if user is None or not request.user.is_staff:
+                user = request.user
+            reviews.append(Review(listing_id=self.listing, user_id=user, **data))
+        self.reject_repeat_reviews([review.user_id_id for review in reviews])
+        try:
+            with transaction.atomic():
+                created = Review.objects.bulk_create(reviews)
+                Review.objects.record_created(created)
+        except IntegrityError:
+            raise serializers.ValidationError({'detail': 'A user in this request has already reviewed this listing.'})
+        return Response(self.get_serializer(created, many=True).data, status=status.HTTP_201_CREATED)
+
+class BookingViewSet(ValuesListMixin, viewsets.ModelViewSet):
     """API Endpoint for Booking a property"""
     
     queryset = Booking.objects.all().order_by('start_date')
     serializer_class = BookingSerializer
+    values_serializer_class = BookingValuesSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = BookingCursorPagination
     
     def perform_create(self, serializer):
         if not self.request.user or not self.request.user.is_authenticated:
@@ -115,6 +419,12 @@ class BookingViewSet(viewsets.ModelViewSet):
         booking = serializer.save(user_id=user)
         
         return booking
+
+    def overlap_response(self):
+        return Response(
+            {'detail': 'Listing is already booked for the selected dates.'},
+            status=status.HTTP_409_CONFLICT
+        )
     
     def retrieve(self, request, *args, **kwargs):
         """
@@ -133,7 +443,7 @@ class BookingViewSet(viewsets.ModelViewSet):
         """
         Override the update method to allow updating a booking.
         """
-        booking_id = kwargs.get('booking_pk')
+        booking_id = kwargs.get('pk')
         try:
             booking = self.queryset.get(booking_id=booking_id)
             
@@ -144,7 +454,18 @@ class BookingViewSet(viewsets.ModelViewSet):
                     )
             serializer = self.get_serializer(booking, data=request.data, partial=True)
             serializer.is_valid(raise_exception=True)
-            updated_booking = serializer.save()
+            start_date = serializer.validated_data.get('start_date', booking.start_date)
+            end_date = serializer.validated_data.get('end_date', booking.end_date)
+            listing = serializer.validated_data.get('listing_id', booking.listing_id)
+
+            # Same lock and overlap check as create, ignoring this booking
+            with locking_atomic():
+                property = Listing.objects.select_for_update().get(listing_id=listing.listing_id)
+                overlapping = Booking.objects.filter(listing_id=property).exclude(booking_id=booking.booking_id)
+                if overlapping.overlapping(start_date, end_date).exists():
+                    return self.overlap_response()
+                serializer.validated_data['total_amount'] = Decimal((end_date - start_date).days) * property.price
+                updated_booking = serializer.save()
             
             return Response(self.get_serializer(updated_booking).data, status=status.HTTP_200_OK)
         
@@ -159,7 +480,7 @@ class BookingViewSet(viewsets.ModelViewSet):
         """
         Override the destroy method to allow deleting a booking.
         """
-        booking_id = kwargs.get('booking_pk')
+        booking_id = kwargs.get('pk')
         try:
             booking = self.queryset.get(booking_id=booking_id)
             
@@ -189,10 +510,15 @@ class BookingViewSet(viewsets.ModelViewSet):
         number_of_nights = (end_date - start_date).days
         listing = serializer.validated_data['listing_id']
 
-        property = Listing.objects.get(listing_id=listing.listing_id)
-        total_amount = Decimal(number_of_nights) * property.price
-        serializer.validated_data['total_amount'] = total_amount
-        self.perform_create(serializer)
+        # Lock the listing row so concurrent requests for the same property
+        # serialize on the overlap check; other listings are unaffected.
+        with locking_atomic():
+            property = Listing.objects.select_for_update().get(listing_id=listing.listing_id)
+            if Booking.objects.filter(listing_id=property).overlapping(start_date, end_date).exists():
+                return self.overlap_response()
+            total_amount = Decimal(number_of_nights) * property.price
+            serializer.validated_data['total_amount'] = total_amount
+            self.perform_create(serializer)
 
         booking_details = {
           'booking_id': serializer.data['booking_id'],
@@ -212,7 +538,9 @@ class PaymentViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self): # type: ignore
-        return Payment.objects.filter(user_id=self.request.user)
+        # booking_details only needs the booking row; its listing and user
+        # ids are read straight off the FK columns.
+        return Payment.objects.filter(user_id=self.request.user).select_related('booking_id')
 
     @action(detail=False, methods=['post'])
     def initiate(self, request):
@@ -249,33 +577,22 @@ class PaymentViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
             
-        payment_data = {
-            'amount': float(payment.amount),
-            'currency': payment.currency,
-            'email': request.user.email,
-            'first_name': request.user.first_name or 'Customer',
-            'last_name': request.user.last_name or 'User',
-            'phone_number': getattr(request.user, 'phone', None),
-            'tx_ref': payment.chapa_tx_ref,
-            'return_url': return_url,
-            'callback_url': callback_url,
-            'title': f'Payment for {booking.listing_id.title}',
-            'description': f'Booking from {booking.start_date} to {booking.end_date}',
-        }
-        chapa_service = ChapaService()
-        chapa_response = chapa_service.initialize_payment(payment_data)
-        
-        if not chapa_response or chapa_response.get('status') != 'success':
+        payment_data = payments.payment_request_data(payment, booking, request.user, return_url, callback_url)
+
+        if payments.gateway_async():
+            if payments.claim_gateway_call(payment, 'initializing') and not payments.enqueue(initialize_chapa_payment, payment, payment_data):
+                return Response(
+                    {'error': payment.gateway_error},
+                    status=status.HTTP_503_SERVICE_UNAVAILABLE
+                )
+            return self.gateway_accepted(request, payment, 'Payment initialization queued')
+
+        payment = payments.initialize_payment(payment.pk, payment_data)
+        if payment.gateway_state == 'error':
             return Response(
-                {'error': 'Failed to initialize payment with Chapa'},
+                {'error': payment.gateway_error},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
-            
-        payment.chapa_checkout_url = chapa_response['data']['checkout_url']
-        payment.chapa_response = chapa_response
-        payment.status = 'pending'
-        payment.save()
-        
         
         return Response({
             'success': True,
@@ -307,49 +624,56 @@ class PaymentViewSet(viewsets.ModelViewSet):
         try:
             payment = Payment.objects.get(
                 chapa_tx_ref=tx_ref, 
-                user=request.user
+                user_id=request.user
             )
         except Payment.DoesNotExist:
             return Response(
                 {'error': 'Payment not found'},
                 status=status.HTTP_404_NOT_FOUND
             )
-        
-        chapa_service = ChapaService()
-        verification_response = chapa_service.verify_payment(tx_ref)
 
-        if not verification_response:
-            return Response(
-                {'error': 'Failed to verify payment with Chapa'},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
-  
-        if verification_response.get('status') == 'success':
-            payment_data = verification_response.get('data', {})
-            
-            if payment_data.get('status') == 'success':
-                payment.status = 'completed'
-                payment.transaction_id = payment_data.get('reference')
-                payment.payment_method = payment_data.get('method')
-                payment.completed_at = datetime.now(timezone.utc)
-                payment.chapa_response.update({'verification': verification_response})
-            else:
-                payment.status = 'failed'
-                payment.chapa_response.update({'verification': verification_response})
-            
-            payment.save()
-            # send_payment_confirmation_email.delay(payment.user_id.email) # type: ignore
-            
-            return Response({
-                'success': True,
-                'message': f'Payment {payment.status}',
-                'data': PaymentSerializer(payment).data
-            })
-        else:
+        if payments.gateway_async():
+            if payments.claim_gateway_call(payment, 'verifying') and not payments.enqueue(verify_chapa_payment, payment):
+                return Response(
+                    {'error': payment.gateway_error},
+                    status=status.HTTP_503_SERVICE_UNAVAILABLE
+                )
+            return self.gateway_accepted(request, payment, 'Payment verification queued')
+
+        payment = payments.verify_payment(payment.pk)
+        if payment.gateway_state == 'error':
             return Response(
-                {'error': 'Payment verification failed'},
-                status=status.HTTP_400_BAD_REQUEST
+                {'error': payment.gateway_error},
+                status=(
+                    status.HTTP_500_INTERNAL_SERVER_ERROR if payment.gateway_error == payments.VERIFY_FAILED
+                    else status.HTTP_400_BAD_REQUEST
+                )
             )
+        # send_payment_confirmation_email.delay(payment.user_id.email) # type: ignore
+
+        return Response({
+            'success': True,
+            'message': f'Payment {payment.status}',
+            'data': PaymentSerializer(payment).data
+        })
+
+    def gateway_accepted(self, request, payment, message):
+        """
+        202 for a gateway call running in a task; clients poll ``status_url``
+        until ``gateway_state`` leaves ``initializing``/``verifying``.
+        """
+        status_url = reverse('payment-status', args=[payment.pk], request=request)
+        return Response({
+            'success': True,
+            'message': message,
+            'data': {
+                'payment_id': payment.payment_id,
+                'tx_ref': payment.chapa_tx_ref,
+                'amount': payment.amount,
+                'gateway_state': payment.gateway_state,
+                'status_url': status_url,
+            }
+        }, status=status.HTTP_202_ACCEPTED, headers={'Location': status_url, 'Retry-After': '1'})
             
     @action(detail=True, methods=['get'])
     def status(self, request, pk=None):
@@ -357,43 +681,47 @@ class PaymentViewSet(viewsets.ModelViewSet):
         Get payment status
         """
         payment = self.get_object()
+        headers = {'Retry-After': '1'} if payment.gateway_state in ('initializing', 'verifying') else None
         return Response({
             'success': True,
             'data': PaymentSerializer(payment).data
-        })
+        }, headers=headers)
         
-    @action(detail=False, methods=['post'])
+    @action(detail=False, methods=['post'], permission_classes=[AllowAny], authentication_classes=[])
     def webhook(self, request):
         """
         Handle Chapa webhook notifications
+
+        Chapa sends no user credentials, so the HMAC signature of the body
+        is what authenticates a delivery; without a configured secret every
+        delivery is refused. Unknown ``tx_ref``s are refused without writing
+        anything. The delivery is stored in the webhook inbox, and
+        redeliveries of an event already stored are dropped. With a worker
+        (``PAYMENT_GATEWAY_ASYNC``) a task applies queued events in batches;
+        otherwise this payment's events are applied before answering. The
+        periodic ``apply_payment_webhooks`` run sweeps up anything left.
         """
+        if not webhooks.valid_signature(request.body, request.headers):
+            return Response({'error': 'Invalid signature'}, status=status.HTTP_403_FORBIDDEN)
+
+        # Form-encoded deliveries arrive as a QueryDict
+        payload = request.data.dict() if hasattr(request.data, 'dict') else request.data
+        if not isinstance(payload, dict):
+            return Response({'error': 'Expected a JSON object'}, status=status.HTTP_400_BAD_REQUEST)
+        tx_ref = payload.get('tx_ref')
         
-        tx_ref = request.data.get('tx_ref')
-        status_from_chapa = request.data.get('status')
-        
-        if not tx_ref:
+        if not tx_ref or not isinstance(tx_ref, str) or len(tx_ref) > 100:
             return Response(
                 {'error': 'tx_ref is required'},
                 status=status.HTTP_400_BAD_REQUEST
             )
+        if not webhooks.known_payment(tx_ref):
+            return Response({'error': 'Payment not found'}, status=status.HTTP_404_NOT_FOUND)
 
-        try:
-            payment = Payment.objects.get(chapa_tx_ref=tx_ref)
-            
-            if status_from_chapa == 'success':
-                payment.status = 'completed'
-                payment.transaction_id = request.data.get('reference')
-                payment.payment_method = request.data.get('method')
-                payment.completed_at = datetime.now(timezone.utc)
-            else:
-                payment.status = 'failed'
-            
-            payment.chapa_response.update({'webhook': request.data})
-            payment.save()
+        webhooks.record_webhook(payload)
+        if payments.gateway_async():
+            webhooks.schedule_drain(apply_payment_webhooks)
+        else:
+            webhooks.apply_webhook_batch(tx_ref=tx_ref)
 
-            return Response({'success': True})
-        except Payment.DoesNotExist:
-            return Response(
-                {'error': 'Payment not found'},
-                status=status.HTTP_404_NOT_FOUND
-            )
\ No newline at end of file
+        return Response({'success': True})
\ No newline at end of file
@@ -0,0 +1,191 @@
+import hashlib
+import hmac
+import json
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .db import locking_atomic
+from .models import Payment, PaymentGatewayEvent, PaymentWebhookEvent
+
+
+logger = logging.getLogger(__name__)
+
+APPLY_BATCH_SIZE = 500
+PRUNE_CHUNK_SIZE = 5000
+# Deliveries within this many seconds share one queued apply task
+DRAIN_DELAY = 1
+DRAIN_KEY = 'payments:webhook-drain-queued'
+
+
+def webhook_event_id(payload):
+  """
+  Identity of a delivery for deduplication. Chapa resends the same body on
+  retry, so without an explicit id the event type, status and Chapa
+  reference identify it, and failing those a digest of the body.
+  """
+  explicit = payload.get('id') or payload.get('event_id')
+  if explicit:
+    return str(explicit)[:255]
+  if payload.get('reference'):
+    return f"{payload.get('event') or 'charge'}:{payload.get('status')}:{payload['reference']}"[:255]
+  body = json.dumps(payload, sort_keys=True, separators=(',', ':'), default=str)
+  return f"sha256:{hashlib.sha256(body.encode('utf-8')).hexdigest()}"
+
+
+def webhook_options():
+  return {
+    'SECRET': None,
+    'RETENTION_DAYS': 7,
+    **getattr(settings, 'PAYMENT_WEBHOOKS', {}),
+  }
+
+
+def valid_signature(body, headers):
+  """
+  Whether ``x-chapa-signature`` is the HMAC-SHA256 of the body keyed by the
+  webhook secret set on the Chapa dashboard. Without a configured secret
+  nothing can be verified, so every delivery is refused.
+  """
+  secret = webhook_options()['SECRET']
+  if not secret:
+    logger.error("Refused a Chapa webhook: PAYMENT_WEBHOOKS['SECRET'] is not set.")
+    return False
+  expected = hmac.new(secret.encode('utf-8'), body, hashlib.sha256).hexdigest()
+  return hmac.compare_digest(headers.get('x-chapa-signature', ''), expected)
+
+
+def known_payment(tx_ref):
+  """
+  Whether ``tx_ref`` belongs to a payment, so deliveries for references
+  we never issued are refused before anything is written.
+  """
+  return Payment.objects.filter(chapa_tx_ref=tx_ref).exists()
+
+
+def record_webhook(payload):
+  """
+  Append ``payload`` to the inbox. One ``INSERT ... ON CONFLICT DO
+  NOTHING`` with no lookup of the payment, so it stays cheap during
+  bursts and a redelivery is a no-op.
+  """
+  event = PaymentWebhookEvent(tx_ref=payload['tx_ref'], event_id=webhook_event_id(payload), payload=payload)
+  PaymentWebhookEvent.objects.bulk_create([event], ignore_conflicts=True)
+  return event
+
+
+def schedule_drain(task):
+  """
+  Queue ``task`` to run ``DRAIN_DELAY`` seconds from now, unless this
+  process already queued one for that window. The task only starts once
+  the window has closed, so it sees every event recorded in it. If the
+  broker is down the events stay in the inbox until the periodic
+  ``apply_payment_webhooks`` run picks them up.
+  """
+  if not cache.add(DRAIN_KEY, 1, timeout=DRAIN_DELAY):
+    return False
+  try:
+    task.apply_async(countdown=DRAIN_DELAY)
+  except Exception as e:
+    cache.delete(DRAIN_KEY)
+    logger.error(f"Could not queue {task.name}: {e}")
+    return False
+  return True
+
+
+def apply_event(payment, payload):
+  """
+  Apply one delivery to ``payment`` in memory and return the changed
+  fields, or ``None`` when it is ignored. A failure reported after the
+  payment completed (an out-of-order or stale delivery) does not undo it.
+  """
+  if payload.get('status') == 'success':
+    payment.status = 'completed'
+    payment.transaction_id = payload.get('reference')
+    payment.payment_method = payload.get('method')
+    payment.completed_at = payment.completed_at or timezone.now()
+    fields = {'status', 'transaction_id', 'payment_method', 'completed_at'}
+  elif payment.status == 'completed':
+    return None
+  else:
+    payment.status = 'failed'
+    fields = {'status'}
+  return fields
+
+
+def apply_webhook_batch(batch_size=APPLY_BATCH_SIZE, tx_ref=None):
+  """
+  Apply up to ``batch_size`` unprocessed events, oldest first, in one
+  transaction, only those of ``tx_ref`` when given. The events and their
+  payments are locked, payments in primary key order so concurrent batches
+  cannot deadlock. Several events for one payment are folded into a single
+  ``save(update_fields=...)``. Returns the number of events processed.
+  """
+  pending = PaymentWebhookEvent.objects.filter(processed_at__isnull=True)
+  if tx_ref is not None:
+    pending = pending.filter(tx_ref=tx_ref)
+  with locking_atomic():
+    events = list(pending.select_for_update(skip_locked=True).order_by('id')[:batch_size])
+    if not events:
+      return 0
+
+    payments = {
+      payment.chapa_tx_ref: payment
+      for payment in Payment.objects.select_for_update().filter(
+        chapa_tx_ref__in={event.tx_ref for event in events}
+      ).order_by('pk')
+    }
+    changed, outcomes, gateway_events = {}, {}, []
+    for event in events:
+      payment = payments.get(event.tx_ref)
+      if payment is None:
+        outcomes.setdefault('unknown_payment', []).append(event.pk)
+        continue
+      fields = apply_event(payment, event.payload)
+      if fields is None:
+        outcomes.setdefault('ignored', []).append(event.pk)
+        continue
+      changed.setdefault(payment.pk, (payment, set()))[1].update(fields)
+      outcomes.setdefault('applied', []).append(event.pk)
+      gateway_events.append(PaymentGatewayEvent(payment=payment, kind='webhook', payload=event.payload))
+
+    for payment, fields in changed.values():
+      payment.save(update_fields=[*fields, 'updated_at'])
+    PaymentGatewayEvent.objects.bulk_create(gateway_events)
+
+    now = timezone.now()
+    for outcome, pks in outcomes.items():
+      PaymentWebhookEvent.objects.filter(pk__in=pks).update(processed_at=now, outcome=outcome)
+  return len(events)
+
+
+def apply_webhook_events(batch_size=APPLY_BATCH_SIZE):
+  """
+  Drain the inbox batch by batch. Returns the number of events processed.
+  """
+  processed = 0
+  while True:
+    applied = apply_webhook_batch(batch_size)
+    if not applied:
+      return processed
+    processed += applied
+
+
+def prune_webhook_events(before, chunk_size=PRUNE_CHUNK_SIZE):
+  """
+  Delete events processed before ``before``, ``chunk_size`` rows per
+  statement, and return how many were deleted. Unprocessed events are
+  always kept. A redelivery after its event was pruned is stored and
+  applied again, which leaves a settled payment as it was.
+  """
+  deleted = 0
+  while True:
+    pks = list(
+      PaymentWebhookEvent.objects.filter(processed_at__lt=before)
+      .order_by('processed_at').values_list('pk', flat=True)[:chunk_size]
+    )
+    if not pks:
+      return deleted
+    deleted += PaymentWebhookEvent.objects.filter(pk__in=pks).delete()[0]